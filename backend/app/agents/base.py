@@ -1,34 +1,95 @@
 import asyncio
 import logging
+from collections.abc import Callable
+
+from pydantic import ValidationError
 
 from app.agents.definitions import AGENTS
 from app.agents.prompts import (
     AGENT_ROUND_PROMPT_NEGOTIATION,
     AGENT_ROUND_PROMPT_OPENING,
-    AGENT_SYSTEM_PROMPT,
+    BRIEF_NOTE,
     CONFEDERATION_PROMPT,
     MEDIATOR_PROMPT,
+    PANEL_CONFEDERATION_NOTE,
+    PANEL_MEMBER,
+    PANEL_SYSTEM_PROMPT,
     format_political_climate,
 )
-from app.models.agents import AgentAction, AgentState, AgentType
+from app.agents.registry import SYSTEM_PROMPTS
+from app.agents.reuse import action_index, negotiation_state
+from app.models.agents import AgentAction, AgentIdentity, AgentState, AgentTier, AgentType, Relationship
 from app.models.scenario import MacroParameters
-from app.models.simulation import Phase, SimulationState
-from app.services.llm import call_agent
+from app.models.simulation import NegotiationPair, Phase, SimulationState
+from app.services.llm import PARSE_FAILURE, call_agent, call_agent_panel
+from app.services.llm_scheduler import NORM_SETTING, OBSERVER, SECTOR
+from app.services.loop_monitor import loop_monitor
 
 logger = logging.getLogger(__name__)
 
+PHASE_NAMES = {
+    Phase.INDUSTRIAVTALET: "Industriavtalet Negotiations",
+    Phase.PRIVATE_SECTOR: "Private Sector Negotiations",
+    Phase.PUBLIC_SECTOR: "Public Sector Negotiations",
+}
+
+
+# Where each tier's calls sit on the critical path: märket gates every later phase
+CRITICAL_CLASS = {
+    AgentTier.NORM_SETTING: NORM_SETTING,
+    AgentTier.PRIVATE_SECTOR: SECTOR,
+    AgentTier.PUBLIC_SECTOR: SECTOR,
+    AgentTier.META: OBSERVER,
+}
+
+# The mediator sits on the critical path of whichever phase it is mediating
+MEDIATED_CLASS = {
+    Phase.INDUSTRIAVTALET: NORM_SETTING,
+    Phase.PRIVATE_SECTOR: SECTOR,
+    Phase.PUBLIC_SECTOR: SECTOR,
+}
+
+
+def critical_class(identity: AgentIdentity, phase: Phase) -> int:
+    if identity.agent_type == AgentType.MEDIATOR:
+        return MEDIATED_CLASS.get(phase, OBSERVER)
+    return CRITICAL_CLASS[identity.tier]
+
+
+def _marke_info(sim: SimulationState) -> str:
+    if sim.marke is None:
+        return ""
+    return f"THE MÄRKET HAS BEEN SET AT {sim.marke}%. All agreements are expected to stay close to this level."
+
 
 class AgentRunner:
     def __init__(self, agent_id: str, parameters: MacroParameters, flavor_text: str = ""):
         self.identity = AGENTS[agent_id]
         self.parameters = parameters
         self.flavor_text = flavor_text
-        self.system_prompt = AGENT_SYSTEM_PROMPT.format(
-            name=self.identity.name,
-            role_description=self.identity.role_description,
-            priorities="\n".join(f"  {i+1}. {p}" for i, p in enumerate(self.identity.priorities)),
-            constraints="\n".join(f"  - {c}" for c in self.identity.constraints),
+        self.system_prompt = SYSTEM_PROMPTS[agent_id]
+        # Set per round by deadline-driven runs: faster model, shorter answers
+        self.fast = False
+        # Answer from a near-identical earlier scenario when one is indexed
+        self.reuse = False
+
+    async def _call(
+        self, prompt: str, on_numbers: Callable[[dict], None] | None, phase: Phase, state: tuple
+    ) -> dict:
+        if self.reuse:
+            result = action_index.lookup(self.identity.id, phase, state, self.fast, self.parameters)
+            if result is not None:
+                return {**result, "reused": True}
+        result = await call_agent(
+            self.system_prompt,
+            prompt + BRIEF_NOTE if self.fast else prompt,
+            on_numbers,
+            self.fast,
+            critical_class(self.identity, phase),
         )
+        if self.reuse and result.get("reasoning") != PARSE_FAILURE:
+            action_index.store(self.identity.id, phase, state, self.fast, self.parameters, result)
+        return result
 
     def _macro_params(self) -> dict:
         return {
@@ -41,21 +102,28 @@ class AgentRunner:
             "previous_agreement": self.parameters.previous_agreement,
         }
 
-    async def get_opening_action(self, round_number: int) -> AgentAction:
+    async def get_opening_action(
+        self, round_number: int, on_numbers: Callable[[dict], None] | None = None
+    ) -> AgentAction:
         prompt = AGENT_ROUND_PROMPT_OPENING.format(
             **self._macro_params(),
             flavor_text=self.flavor_text,
         )
-        result = await call_agent(self.system_prompt, prompt)
-        return AgentAction(
-            agent_id=self.identity.id,
-            round_number=round_number,
-            phase=Phase.OPENING,
-            position=float(result.get("position", 0)),
-            reasoning=result.get("reasoning", ""),
-            public_statement=result.get("public_statement", ""),
-            willingness_to_settle=int(result.get("willingness_to_settle", 50)),
-        )
+        result = await self._call(prompt, on_numbers, Phase.OPENING, (round_number,))
+        return self.to_action(result, round_number, Phase.OPENING)
+
+    def to_action(self, result: dict, round_number: int, phase: Phase) -> AgentAction:
+        with loop_monitor.section("agent.to_action"):
+            return AgentAction(
+                agent_id=self.identity.id,
+                round_number=round_number,
+                phase=phase.value,
+                position=float(result.get("position", 0)),
+                reasoning=result.get("reasoning", ""),
+                public_statement=result.get("public_statement", ""),
+                willingness_to_settle=int(result.get("willingness_to_settle", 50)),
+                reused=result.get("reused", False),
+            )
 
     async def get_negotiation_action(
         self,
@@ -65,16 +133,9 @@ class AgentRunner:
         other_positions: str,
         history: str,
         special_context: str = "",
+        on_numbers: Callable[[dict], None] | None = None,
     ) -> AgentAction:
-        marke_info = ""
-        if sim.marke is not None:
-            marke_info = f"THE MÄRKET HAS BEEN SET AT {sim.marke}%. All agreements are expected to stay close to this level."
-
-        phase_names = {
-            Phase.INDUSTRIAVTALET: "Industriavtalet Negotiations",
-            Phase.PRIVATE_SECTOR: "Private Sector Negotiations",
-            Phase.PUBLIC_SECTOR: "Public Sector Negotiations",
-        }
+        marke_info = _marke_info(sim)
 
         if self.identity.agent_type == AgentType.MEDIATOR:
             prompt = MEDIATOR_PROMPT.format(
@@ -89,7 +150,7 @@ class AgentRunner:
                 unemployment=self.parameters.unemployment,
                 gdp_growth=self.parameters.gdp_growth,
                 round_number=round_number,
-                phase_name=phase_names.get(phase, ""),
+                phase_name=PHASE_NAMES.get(phase, ""),
                 marke_info=marke_info,
                 all_positions=other_positions,
                 name=self.identity.name,
@@ -98,20 +159,159 @@ class AgentRunner:
             prompt = AGENT_ROUND_PROMPT_NEGOTIATION.format(
                 **self._macro_params(),
                 round_number=round_number,
-                phase_name=phase_names.get(phase, ""),
+                phase_name=PHASE_NAMES.get(phase, ""),
                 marke_info=marke_info,
                 other_positions=other_positions,
                 history=history,
                 special_context=special_context,
             )
 
-        result = await call_agent(self.system_prompt, prompt)
-        return AgentAction(
-            agent_id=self.identity.id,
-            round_number=round_number,
-            phase=phase.value,
-            position=float(result.get("position", 0)),
-            reasoning=result.get("reasoning", ""),
-            public_statement=result.get("public_statement", ""),
-            willingness_to_settle=int(result.get("willingness_to_settle", 50)),
+        state = negotiation_state(sim, self.identity.id, round_number, bool(special_context))
+        result = await self._call(prompt, on_numbers, phase, state)
+        return self.to_action(result, round_number, phase)
+
+
+def form_coalitions(agent_ids: list[str], pairs: list[NegotiationPair]) -> list[list[str]]:
+    """Group agents that sit on the same side of the table.
+
+    Unions that sign the same agreement are grouped, as are directly allied
+    organisations, unless that would put opposed parties in one group. The
+    mediator always acts alone. Groups keep the order of `agent_ids`.
+    """
+    group_of = {
+        aid: {aid} for aid in agent_ids if AGENTS[aid].agent_type != AgentType.MEDIATOR
+    }
+
+    def opposed(a: set[str], b: set[str]) -> bool:
+        return any(
+            AGENTS[x].relationships.get(y) == Relationship.OPPOSED
+            or AGENTS[y].relationships.get(x) == Relationship.OPPOSED
+            for x in a for y in b
         )
+
+    def merge(a: str, b: str):
+        ga, gb = group_of[a], group_of[b]
+        if ga is gb or opposed(ga, gb):
+            return
+        ga |= gb
+        for member in gb:
+            group_of[member] = ga
+
+    for pair in pairs:
+        unions = [u for u in pair.union_ids if u in group_of]
+        for other in unions[1:]:
+            merge(unions[0], other)
+    for aid in list(group_of):
+        for other, relationship in AGENTS[aid].relationships.items():
+            if relationship == Relationship.ALLIED and other in group_of:
+                merge(aid, other)
+
+    groups: dict[int, list[str]] = {}
+    for aid in agent_ids:
+        key = id(group_of[aid]) if aid in group_of else id(aid)
+        groups.setdefault(key, []).append(aid)
+    return list(groups.values())
+
+
+class PanelRunner:
+    """Runs a coalition of agents as one LLM call returning an action per member.
+
+    Members honour the same per-round switches as `AgentRunner`: `fast` picks
+    the faster model and brief answers, and with `reuse` each member is looked
+    up first, so only the members without a stored answer go into the call.
+    """
+
+    def __init__(self, runners: list[AgentRunner]):
+        self.runners = runners
+        self._prompts: dict[tuple[str, ...], tuple[str, str]] = {}
+
+    def _prompts_for(self, runners: list[AgentRunner]) -> tuple[str, str]:
+        """System prompt and confederation notes for a panel of `runners`, built once per member set."""
+        key = tuple(r.identity.id for r in runners)
+        if key not in self._prompts:
+            system_prompt = PANEL_SYSTEM_PROMPT.format(
+                count=len(runners),
+                members="\n\n".join(
+                    PANEL_MEMBER.format(
+                        agent_id=r.identity.id,
+                        name=r.identity.name,
+                        agent_type=r.identity.agent_type.value,
+                        role_description=r.identity.role_description,
+                        priorities="\n".join(f"  {i+1}. {p}" for i, p in enumerate(r.identity.priorities)),
+                        constraints="\n".join(f"  - {c}" for c in r.identity.constraints),
+                    )
+                    for r in runners
+                ),
+            )
+            notes = "\n".join(
+                PANEL_CONFEDERATION_NOTE.format(name=r.identity.name)
+                for r in runners if r.identity.agent_type == AgentType.CONFEDERATION
+            )
+            self._prompts[key] = system_prompt, notes
+        return self._prompts[key]
+
+    async def get_negotiation_actions(
+        self,
+        sim: SimulationState,
+        round_number: int,
+        phase: Phase,
+        other_positions: str,
+        history: str,
+        special_context: str = "",
+    ) -> list[AgentAction]:
+        lead = self.runners[0]
+        states = {
+            r.identity.id: negotiation_state(sim, r.identity.id, round_number, bool(special_context))
+            for r in self.runners
+        }
+        results: dict[str, dict] = {}
+        for runner in self.runners:
+            aid = runner.identity.id
+            if runner.reuse:
+                hit = action_index.lookup(aid, phase, states[aid], runner.fast, runner.parameters)
+                if hit is not None:
+                    results[aid] = {**hit, "reused": True}
+
+        pending = [r for r in self.runners if r.identity.id not in results]
+        if pending:
+            system_prompt, notes = self._prompts_for(pending)
+            prompt = AGENT_ROUND_PROMPT_NEGOTIATION.format(
+                **lead._macro_params(),
+                round_number=round_number,
+                phase_name=PHASE_NAMES.get(phase, ""),
+                marke_info=_marke_info(sim),
+                other_positions=other_positions,
+                history=history,
+                special_context="\n\n".join(filter(None, [special_context, notes])),
+            )
+            answers = await call_agent_panel(
+                system_prompt,
+                prompt + BRIEF_NOTE if lead.fast else prompt,
+                len(pending),
+                lead.fast,
+                min(critical_class(r.identity, phase) for r in pending),
+            )
+            pending_ids = {r.identity.id for r in pending}
+            results.update((a["agent_id"], a) for a in answers if a.get("agent_id") in pending_ids)
+
+        actions, missing = [], []
+        for runner in self.runners:
+            result = results.get(runner.identity.id)
+            try:
+                if result is None:
+                    raise ValueError("missing from panel response")
+                actions.append(runner.to_action(result, round_number, phase))
+            except (ValidationError, TypeError, ValueError) as e:
+                logger.warning(f"Panel action for {runner.identity.id} rejected ({type(e).__name__}), calling individually")
+                missing.append(runner)
+                continue
+            if runner.reuse and not result.get("reused") and result.get("reasoning") != PARSE_FAILURE:
+                action_index.store(
+                    runner.identity.id, phase, states[runner.identity.id], runner.fast, runner.parameters, result
+                )
+        if missing:
+            actions += await asyncio.gather(*(
+                r.get_negotiation_action(sim, round_number, phase, other_positions, history, special_context)
+                for r in missing
+            ))
+        return actions
@@ -1,6 +1,9 @@
+from collections.abc import Mapping
+from types import MappingProxyType
+
 from app.models.agents import AgentIdentity, AgentType, AgentTier, Relationship
 
-AGENTS: dict[str, AgentIdentity] = {
+AGENTS: Mapping[str, AgentIdentity] = MappingProxyType({
     "if_metall": AgentIdentity(
         id="if_metall",
         name="IF Metall",
@@ -375,4 +378,4 @@ AGENTS: dict[str, AgentIdentity] = {
         ],
         relationships={},
     ),
-}
+})
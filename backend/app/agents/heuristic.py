@@ -0,0 +1,63 @@
+"""Offline negotiating policy: rule-based, no LLM, microseconds per decision.
+
+Used where calling the LLM for every party is out of the question, such as the
+hundreds of local agreements in sector scale mode. Parties open around the
+anchor (the agreement above them) plus the wage drift the macro environment
+supports, then concede toward each other until the gap closes or the rounds
+run out.
+"""
+import random
+from dataclasses import dataclass
+
+from app.models.agents import AgentIdentity, AgentType, Relationship
+from app.models.scenario import MacroParameters
+
+SETTLE_GAP = 0.1
+
+
+def market_drift(parameters: MacroParameters) -> float:
+    """Percentage points local pay tends to land above the central agreement."""
+    return (
+        0.15 * (parameters.gdp_growth - 2.0)
+        - 0.08 * (parameters.unemployment - 7.0)
+        + 0.05 * (parameters.inflation - 2.0)
+    )
+
+
+def concession_rate(identity: AgentIdentity) -> float:
+    """Share of the remaining gap conceded per round; organisations with more adversaries give less."""
+    opposed = sum(1 for r in identity.relationships.values() if r == Relationship.OPPOSED)
+    return max(0.15, 0.4 - 0.05 * opposed)
+
+
+def opening_position(identity: AgentIdentity, anchor: float, drift: float, rng: random.Random) -> float:
+    if identity.agent_type == AgentType.UNION:
+        return anchor + drift + rng.uniform(0.2, 0.8)
+    return anchor + drift - rng.uniform(0.2, 0.7)
+
+
+@dataclass(slots=True)
+class HeuristicOutcome:
+    level: float
+    rounds: int
+    mediated: bool
+
+
+def negotiate(
+    union: AgentIdentity,
+    employer: AgentIdentity,
+    union_position: float,
+    employer_position: float,
+    max_rounds: int,
+) -> HeuristicOutcome:
+    union_rate, employer_rate = concession_rate(union), concession_rate(employer)
+    for round_number in range(1, max_rounds + 1):
+        gap = union_position - employer_position
+        if gap <= SETTLE_GAP:
+            return HeuristicOutcome(round((union_position + employer_position) / 2, 2), round_number, False)
+        union_position -= union_rate * gap
+        employer_position += employer_rate * gap
+    # Unresolved: split the difference the way a mediator would, weighted toward the harder side
+    total = union_rate + employer_rate
+    level = (union_position * employer_rate + employer_position * union_rate) / total
+    return HeuristicOutcome(round(level, 2), max_rounds, True)
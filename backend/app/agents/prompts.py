@@ -11,9 +11,9 @@ YOUR CONSTRAINTS:
 IMPORTANT: You must respond with ONLY a JSON object (no markdown, no explanation outside the JSON):
 {{
     "position": <your wage demand/offer as a percentage, e.g. 3.5>,
+    "willingness_to_settle": <0-100, how ready you are to accept the current negotiation state>,
     "reasoning": "<your internal strategic reasoning, 2-3 sentences>",
-    "public_statement": "<your public statement to media/other parties, 1-2 sentences in character>",
-    "willingness_to_settle": <0-100, how ready you are to accept the current negotiation state>
+    "public_statement": "<your public statement to media/other parties, 1-2 sentences in character>"
 }}
 """
 
@@ -81,9 +81,9 @@ As Medlingsinstitutet, assess the situation. If negotiations are stalled, you ma
 Respond with JSON:
 {{
     "position": <your proposed compromise figure if any, or 0 if not proposing>,
+    "willingness_to_settle": <0-100, how close you think settlement is>,
     "reasoning": "<your assessment of the situation>",
-    "public_statement": "<your public communication>",
-    "willingness_to_settle": <0-100, how close you think settlement is>
+    "public_statement": "<your public communication>"
 }}"""
 
 CONFEDERATION_PROMPT = """MACRO ENVIRONMENT:
@@ -103,9 +103,9 @@ Assess the situation and issue guidance to your affiliates.
 Respond with JSON:
 {{
     "position": <your recommended target/ceiling as a percentage>,
+    "willingness_to_settle": <0-100, how satisfied you are with the current trajectory>,
     "reasoning": "<your strategic assessment>",
-    "public_statement": "<your public coordination signal>",
-    "willingness_to_settle": <0-100, how satisfied you are with the current trajectory>
+    "public_statement": "<your public coordination signal>"
 }}"""
 
 SUMMARY_PROMPT = """Summarize the following Swedish avtalsrörelse simulation results.
@@ -128,6 +128,27 @@ Write a compelling 3-4 paragraph summary in English covering:
 Write in the style of a concise analytical briefing. Be specific about numbers."""
 
 
+LOCAL_AGREEMENT_PROMPT = """LOCAL NEGOTIATION — Workplace #{workplace} ({employees} employees) at a member company of {employer}.
+
+The branch agreement was settled at {anchor}% (märket: {marke}%). It sets the floor; local talks decide any pay drift above it.
+Macro environment: inflation {inflation}%, unemployment {unemployment}%, GDP growth {gdp_growth}%.
+
+As the local club of your union at this workplace, state your opening demand for the local pay increase.
+
+Respond with JSON:
+{{
+    "position": <your total local pay demand as a percentage, at least the branch level>,
+    "willingness_to_settle": <0-100>,
+    "reasoning": "<one sentence>",
+    "public_statement": "<one sentence>"
+}}"""
+
+
+BRIEF_NOTE = """
+
+Time is short: keep "reasoning" and "public_statement" to one short sentence each."""
+
+
 def format_political_climate(value: int) -> str:
     labels = {
         1: "Strongly left-leaning government (high public spending priority)",
@@ -137,3 +158,30 @@ def format_political_climate(value: int) -> str:
         5: "Strongly right-leaning government (austerity-focused)",
     }
     return labels.get(value, "Centrist/balanced government")
+
+PANEL_SYSTEM_PROMPT = """You are simulating a coalition of {count} organisations on the same side of a Swedish avtalsrörelse (collective bargaining round). They coordinate closely but each keeps its own mandate, priorities and voice.
+
+{members}
+
+For EACH organisation, reason and decide independently and in character.
+
+IMPORTANT: You must respond with ONLY a JSON array (no markdown, no explanation outside the JSON), with exactly one object per organisation:
+[
+    {{
+        "agent_id": "<the organisation's id as given above>",
+        "position": <its wage demand/offer as a percentage, e.g. 3.5>,
+        "willingness_to_settle": <0-100, how ready it is to accept the current negotiation state>,
+        "reasoning": "<its internal strategic reasoning, 2-3 sentences>",
+        "public_statement": "<its public statement to media/other parties, 1-2 sentences in character>"
+    }}
+]
+"""
+
+PANEL_MEMBER = """ORGANISATION id="{agent_id}": {name} ({agent_type})
+{role_description}
+Priorities (ranked):
+{priorities}
+Constraints:
+{constraints}"""
+
+PANEL_CONFEDERATION_NOTE = """{name} is a confederation: it does not negotiate directly. Its "position" is the target/ceiling it recommends to its affiliates and its "willingness_to_settle" is how satisfied it is with the current trajectory."""
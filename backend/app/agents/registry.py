@@ -0,0 +1,21 @@
+from collections.abc import Mapping
+from types import MappingProxyType
+
+from app.agents.definitions import AGENTS
+from app.agents.prompts import AGENT_SYSTEM_PROMPT
+from app.models.agents import AgentIdentity
+
+
+def build_system_prompt(identity: AgentIdentity) -> str:
+    return AGENT_SYSTEM_PROMPT.format(
+        name=identity.name,
+        role_description=identity.role_description,
+        priorities="\n".join(f"  {i+1}. {p}" for i, p in enumerate(identity.priorities)),
+        constraints="\n".join(f"  - {c}" for c in identity.constraints),
+    )
+
+
+# Formatted once per process instead of once per AgentRunner
+SYSTEM_PROMPTS: Mapping[str, str] = MappingProxyType(
+    {agent_id: build_system_prompt(identity) for agent_id, identity in AGENTS.items()}
+)
@@ -0,0 +1,147 @@
+"""Approximate reuse of agent actions across near-identical scenarios.
+
+Parameters that differ from an earlier run's by less than the per-field
+tolerances in ``settings.reuse_tolerances`` give essentially the same move.
+Actions are indexed on a grid whose cells are one tolerance wide, keyed by
+agent, phase, round and the quantized negotiation state, so a lookup only
+inspects the 3^5 cells around the query. A reused position is shifted by how
+much the heuristic policy says the difference in parameters is worth.
+"""
+import itertools
+import math
+from collections import OrderedDict
+from dataclasses import dataclass
+
+from app.agents.heuristic import market_drift
+from app.config import settings
+from app.models.scenario import MacroParameters
+from app.models.simulation import Phase, SimulationState
+
+FIELDS = ("inflation", "unemployment", "gdp_growth", "policy_rate", "previous_agreement")
+
+
+def quantize(value: float | None) -> float | None:
+    if value is None:
+        return None
+    step = settings.reuse_state_step
+    return round(round(value / step) * step, 4)
+
+
+def negotiation_state(sim: SimulationState, agent_id: str, round_number: int, stalled: bool) -> tuple:
+    """What an agent reacts to besides the parameters: märket, its own and everyone else's positions."""
+    others = [
+        s.current_position for aid, s in sim.agent_states.items()
+        if aid != agent_id and s.current_position is not None
+    ]
+    return (
+        round_number,
+        quantize(sim.marke),
+        quantize(sim.agent_states[agent_id].current_position),
+        quantize(sum(others) / len(others)) if others else None,
+        stalled,
+    )
+
+
+@dataclass(slots=True)
+class _Entry:
+    vector: tuple[float, ...]
+    parameters: MacroParameters
+    result: dict
+
+
+@dataclass
+class ReuseStats:
+    lookups: int = 0
+    hits: int = 0
+    stored: int = 0
+    evicted: int = 0
+    total_distance: float = 0.0
+
+    def as_dict(self) -> dict:
+        return {
+            "lookups": self.lookups,
+            "hits": self.hits,
+            "hit_rate": self.hits / self.lookups if self.lookups else None,
+            "stored": self.stored,
+            "evicted": self.evicted,
+            "avg_distance": self.total_distance / self.hits if self.hits else None,
+        }
+
+
+class ActionIndex:
+    def __init__(self):
+        self._cells: dict[tuple, list[_Entry]] = {}
+        # Insertion order of (cell, entry) for evicting the oldest once full
+        self._order: OrderedDict[int, tuple[tuple, _Entry]] = OrderedDict()
+        self.stats = ReuseStats()
+
+    def _tolerances(self) -> tuple[float, ...]:
+        return tuple(settings.reuse_tolerances.get(f, 0.0) for f in FIELDS)
+
+    def _key(self, agent_id: str, phase: Phase, state: tuple, fast: bool, parameters: MacroParameters) -> tuple:
+        # Categorical parameters must match exactly
+        return agent_id, phase.value, state, fast, parameters.political_climate, parameters.export_pressure.value
+
+    @staticmethod
+    def _cell(vector: tuple[float, ...], tolerances: tuple[float, ...]) -> tuple[int, ...]:
+        return tuple(math.floor(v / t) if t > 0 else v for v, t in zip(vector, tolerances))
+
+    def lookup(
+        self, agent_id: str, phase: Phase, state: tuple, fast: bool, parameters: MacroParameters
+    ) -> dict | None:
+        """The closest stored result within tolerance on every field, adjusted to `parameters`, or None."""
+        self.stats.lookups += 1
+        key = self._key(agent_id, phase, state, fast, parameters)
+        tolerances = self._tolerances()
+        vector = tuple(getattr(parameters, f) for f in FIELDS)
+        home = self._cell(vector, tolerances)
+        best, best_distance = None, math.inf
+        offsets = [(-1, 0, 1) if t > 0 else (0,) for t in tolerances]
+        for delta in itertools.product(*offsets):
+            cell = tuple(c + d for c, d in zip(home, delta))
+            for entry in self._cells.get((key, cell), ()):
+                gaps = [abs(a - b) for a, b in zip(vector, entry.vector)]
+                if any(g > t for g, t in zip(gaps, tolerances)):
+                    continue
+                distance = sum(g / t for g, t in zip(gaps, tolerances) if t > 0)
+                if distance < best_distance:
+                    best, best_distance = entry, distance
+        if best is None:
+            return None
+        self.stats.hits += 1
+        self.stats.total_distance += best_distance
+        return self._adjust(best, parameters, phase)
+
+    @staticmethod
+    def _adjust(entry: _Entry, parameters: MacroParameters, phase: Phase) -> dict:
+        shift = market_drift(parameters) - market_drift(entry.parameters)
+        if phase == Phase.OPENING:
+            # Opening bids are anchored on the previous agreement; later ones on märket and the table
+            shift += parameters.previous_agreement - entry.parameters.previous_agreement
+        result = dict(entry.result)
+        result["position"] = round(max(0.0, float(result["position"]) + shift), 2)
+        return result
+
+    def store(
+        self, agent_id: str, phase: Phase, state: tuple, fast: bool, parameters: MacroParameters, result: dict
+    ):
+        tolerances = self._tolerances()
+        vector = tuple(getattr(parameters, f) for f in FIELDS)
+        cell = (self._key(agent_id, phase, state, fast, parameters), self._cell(vector, tolerances))
+        entry = _Entry(vector, parameters, result)
+        self._cells.setdefault(cell, []).append(entry)
+        self._order[id(entry)] = (cell, entry)
+        self.stats.stored += 1
+        while len(self._order) > settings.reuse_max_entries:
+            _, (old_cell, old) = self._order.popitem(last=False)
+            entries = self._cells[old_cell]
+            entries.remove(old)
+            if not entries:
+                del self._cells[old_cell]
+            self.stats.evicted += 1
+
+    def __len__(self) -> int:
+        return len(self._order)
+
+
+action_index = ActionIndex()
@@ -0,0 +1,106 @@
+import gzip
+import logging
+import mimetypes
+import os
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from fastapi import Request, Response
+from fastapi.responses import FileResponse
+
+from app.api.http_cache import IMMUTABLE, REVALIDATE, choose_encoding, etag_matches, make_etag
+
+logger = logging.getLogger(__name__)
+
+VARIANT_SUFFIXES = {".br": "br", ".gz": "gzip"}
+# Vite fingerprints everything under assets/, so those files can be cached forever
+HASHED_PREFIX = "assets/"
+DEFAULT_CACHE_CONTROL = "public, max-age=3600"
+
+
+@dataclass
+class _Variant:
+    path: Path
+    stat: os.stat_result
+    etag: str
+
+
+@dataclass
+class StaticAsset:
+    media_type: str
+    cache_control: str
+    variants: dict[str | None, _Variant] = field(default_factory=dict)
+
+
+class StaticIndex:
+    """Indexes the built frontend once so requests never touch the filesystem to find a file."""
+
+    def __init__(self, root: Path):
+        self.root = root
+        self.assets: dict[str, StaticAsset] = {}
+        self._scan()
+        self._load_index_html()
+        logger.info(f"Indexed {len(self.assets)} static files from {root}")
+
+    def _scan(self):
+        files = {p for p in self.root.rglob("*") if p.is_file()}
+        variants = {p for p in files if p.suffix in VARIANT_SUFFIXES and p.with_suffix("") in files}
+        for path in files - variants:
+            rel = path.relative_to(self.root).as_posix()
+            data = path.read_bytes()
+            asset = StaticAsset(
+                media_type=mimetypes.guess_type(path.name)[0] or "application/octet-stream",
+                cache_control=IMMUTABLE if rel.startswith(HASHED_PREFIX) else DEFAULT_CACHE_CONTROL,
+            )
+            asset.variants[None] = _Variant(path, path.stat(), make_etag(data))
+            self.assets[rel] = asset
+        for path in variants:
+            asset = self.assets[path.with_suffix("").relative_to(self.root).as_posix()]
+            encoding = VARIANT_SUFFIXES[path.suffix]
+            asset.variants[encoding] = _Variant(path, path.stat(), make_etag(path.read_bytes(), encoding))
+
+    def _load_index_html(self):
+        index = self.root / "index.html"
+        self.index_bodies: dict[str | None, bytes] = {}
+        self.index_etags: dict[str | None, str] = {}
+        if not index.is_file():
+            return
+        self.index_bodies[None] = index.read_bytes()
+        for suffix, encoding in VARIANT_SUFFIXES.items():
+            variant = index.with_name(index.name + suffix)
+            if variant.is_file():
+                self.index_bodies[encoding] = variant.read_bytes()
+        if "gzip" not in self.index_bodies:
+            self.index_bodies["gzip"] = gzip.compress(self.index_bodies[None], compresslevel=9)
+        base = make_etag(self.index_bodies[None])
+        for encoding in self.index_bodies:
+            self.index_etags[encoding] = base if encoding is None else base[:-1] + f'-{encoding}"'
+
+    def response(self, request: Request, full_path: str) -> Response:
+        asset = self.assets.get(full_path)
+        if asset is None or full_path == "index.html":
+            if full_path.startswith(HASHED_PREFIX):
+                return Response(status_code=404)
+            return self._index_response(request)
+
+        encoding = choose_encoding(request.headers.get("accept-encoding"), asset.variants)
+        variant = asset.variants[encoding]
+        headers = {"ETag": variant.etag, "Cache-Control": asset.cache_control}
+        if len(asset.variants) > 1:
+            headers["Vary"] = "Accept-Encoding"
+        if etag_matches(request.headers.get("if-none-match"), variant.etag):
+            return Response(status_code=304, headers=headers)
+        if encoding:
+            headers["Content-Encoding"] = encoding
+        return FileResponse(variant.path, stat_result=variant.stat, media_type=asset.media_type, headers=headers)
+
+    def _index_response(self, request: Request) -> Response:
+        if not self.index_bodies:
+            return Response(status_code=404)
+        encoding = choose_encoding(request.headers.get("accept-encoding"), self.index_bodies)
+        headers = {"ETag": self.index_etags[encoding], "Cache-Control": REVALIDATE, "Vary": "Accept-Encoding"}
+        if etag_matches(request.headers.get("if-none-match"), headers["ETag"]):
+            return Response(status_code=304, headers=headers)
+        if encoding:
+            headers["Content-Encoding"] = encoding
+        return Response(self.index_bodies[encoding], media_type="text/html", headers=headers)
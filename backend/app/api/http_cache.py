@@ -0,0 +1,83 @@
+import gzip
+import hashlib
+
+from fastapi import Request, Response
+
+IMMUTABLE = "public, max-age=31536000, immutable"
+REVALIDATE = "no-cache"
+
+# Preferred order when the client accepts several encodings equally
+ENCODING_PREFERENCE = ("br", "gzip")
+
+
+def make_etag(data: bytes, suffix: str = "") -> str:
+    digest = hashlib.blake2b(data, digest_size=16).hexdigest()
+    return f'"{digest}{"-" + suffix if suffix else ""}"'
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    """If-None-Match uses weak comparison, so a W/ prefix is ignored."""
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or candidate.removeprefix("W/") == etag:
+            return True
+    return False
+
+
+def choose_encoding(accept_encoding: str | None, available) -> str | None:
+    """Pick the best encoding from `available` allowed by Accept-Encoding, or None for identity."""
+    if not accept_encoding:
+        return None
+    weights: dict[str, float] = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        weights[name.strip().lower()] = q
+    best, best_q = None, 0.0
+    for encoding in ENCODING_PREFERENCE:
+        if encoding not in available:
+            continue
+        q = weights.get(encoding, weights.get("*", 0.0))
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+
+class CachedJSON:
+    """A JSON body encoded once, served with a content-derived version and ETag.
+
+    Requests that pass `?v=<version>` get an immutable response, since the URL
+    itself changes whenever the content does.
+    """
+
+    def __init__(self, body: bytes, min_gzip_size: int = 1024):
+        self.version = make_etag(body).strip('"')[:16]
+        self.bodies: dict[str | None, bytes] = {None: body}
+        if len(body) >= min_gzip_size:
+            self.bodies["gzip"] = gzip.compress(body, compresslevel=9)
+        self.etags = {
+            encoding: f'"{self.version}{"-" + encoding if encoding else ""}"' for encoding in self.bodies
+        }
+
+    def response(self, request: Request) -> Response:
+        encoding = choose_encoding(request.headers.get("accept-encoding"), self.bodies)
+        pinned = request.query_params.get("v") == self.version
+        headers = {
+            "ETag": self.etags[encoding],
+            "Cache-Control": IMMUTABLE if pinned else REVALIDATE,
+            "Vary": "Accept-Encoding",
+            "X-Catalog-Version": self.version,
+        }
+        if etag_matches(request.headers.get("if-none-match"), headers["ETag"]):
+            return Response(status_code=304, headers=headers)
+        if encoding:
+            headers["Content-Encoding"] = encoding
+        return Response(self.bodies[encoding], media_type="application/json", headers=headers)
@@ -1,33 +1,92 @@
 import json
 import logging
+from typing import Annotated
 
-from fastapi import APIRouter, HTTPException
-from pydantic import BaseModel
+from fastapi import APIRouter, Header, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field, TypeAdapter
 from sse_starlette.sse import EventSourceResponse
+from starlette.background import BackgroundTask
 
 from app.agents.definitions import AGENTS
+from app.agents.reuse import action_index
+from app.api.http_cache import CachedJSON
+from app.engine.admission import QueueFull, Ticket, admission
+from app.engine.analytics import ANY, analytics, iso_week
+from app.engine.export import MEDIA_TYPES, TABLES, ExportFormat, arrow_available, export
+from app.engine.manager import round_batches, simulation_manager, to_sse
+from app.engine.pool import warm_pool
 from app.engine.runner import SimulationRunner
-from app.models.scenario import MacroParameters
+from app.engine.surrogate import surrogate
+from app.engine.speculation import speculation_stats
+from app.models.agents import AgentIdentity, AgentOverride
+from app.models.scenario import MacroParameters, ScenarioPreset
+from app.models.simulation import Framing, Priority, SimulationOptions
 from app.scenarios.presets import PRESETS
+from app.services.llm import llm_stats
+from app.services.llm_scheduler import llm_scheduler
+from app.services.local_llm import local_batcher
+from app.services.loop_monitor import loop_monitor
+from app.startup import startup_profiler
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/api")
 
+# Both catalogs are immutable for the life of the process, so encode them once
+PRESETS_JSON = CachedJSON(TypeAdapter(list[ScenarioPreset]).dump_json(list(PRESETS.values())))
+AGENTS_JSON = CachedJSON(TypeAdapter(list[AgentIdentity]).dump_json(list(AGENTS.values())))
+
 
 class SimulationRequest(BaseModel):
     preset_id: str | None = None
     parameters: MacroParameters | None = None
+    options: SimulationOptions | None = None
+    priority: Priority = Priority.INTERACTIVE
+    framing: Framing = Framing.EVENT
+    replay_speed: float | None = Field(
+        1.0, gt=0, description="Pace of runs served from the warm pool relative to recording; null for no delay"
+    )
+
+
+class ForkRequest(BaseModel):
+    round: int = Field(ge=2, description="First round to recompute; earlier rounds are reused")
+    parameters: MacroParameters | None = None
+    agent_overrides: dict[str, AgentOverride] = {}
+    priority: Priority = Priority.INTERACTIVE
+    framing: Framing = Framing.EVENT
+
+
+@router.get("/presets", response_model=list[ScenarioPreset])
+async def get_presets(request: Request):
+    return PRESETS_JSON.response(request)
 
 
-@router.get("/presets")
-async def get_presets():
-    return list(PRESETS.values())
+@router.get("/agents", response_model=list[AgentIdentity])
+async def get_agents(request: Request):
+    return AGENTS_JSON.response(request)
 
 
-@router.get("/agents")
-async def get_agents():
-    return list(AGENTS.values())
+@router.get("/catalog")
+async def get_catalog_versions():
+    return {"presets": PRESETS_JSON.version, "agents": AGENTS_JSON.version}
+
+
+@router.get("/metrics")
+async def get_metrics():
+    return {
+        "simulations": simulation_manager.stats(),
+        "admission": admission.stats(),
+        "warm_pool": warm_pool.stats(),
+        "memory": simulation_manager.registry.stats(),
+        "llm": llm_stats.as_dict(),
+        "local_llm": local_batcher.stats(),
+        "llm_scheduler": llm_scheduler.stats(),
+        "event_loop": loop_monitor.as_dict(),
+        "speculation": speculation_stats.as_dict(),
+        "reuse": action_index.stats.as_dict(),
+        "startup": startup_profiler.as_dict(),
+    }
 
 
 @router.post("/simulate")
@@ -44,13 +103,173 @@ async def simulate(request: SimulationRequest):
     else:
         raise HTTPException(status_code=400, detail="Must provide preset_id or parameters")
 
-    runner = SimulationRunner(parameters, request.preset_id, flavor_text)
+    if warm_pool.eligible(request.preset_id, request.parameters, request.options):
+        sim_id = await warm_pool.take(request.preset_id, request.replay_speed)
+        if sim_id:
+            return _event_stream(sim_id, framing=request.framing)
+
+    try:
+        ticket = admission.enqueue(request.priority)
+    except QueueFull as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+
+    with loop_monitor.section("routes.simulate"):
+        runner = SimulationRunner(parameters, request.preset_id, flavor_text, request.options)
+    return _admitted_response(ticket, runner, request.framing)
+
+
+def _admitted_response(ticket: Ticket, runner: SimulationRunner, framing: Framing) -> EventSourceResponse:
+    handoff = {"started": False}
+
+    def release_unless_started():
+        # Once started, the run releases the ticket when it finishes; release is idempotent
+        if not handoff["started"]:
+            admission.release(ticket)
+
+    # A client that disconnects before the body is first iterated never runs the generator's
+    # finally, so the response's background task releases the ticket as well
+    return EventSourceResponse(
+        _admitted_stream(ticket, runner, framing, handoff, release_unless_started),
+        headers={"X-Simulation-Id": runner.sim.id},
+        background=BackgroundTask(release_unless_started),
+    )
+
+
+async def _admitted_stream(
+    ticket: Ticket, runner: SimulationRunner, framing: Framing, handoff: dict, release_unless_started
+):
+    """Report queue position as `queued` events, then stream the simulation once admitted."""
+    try:
+        async for position in admission.wait(ticket):
+            yield {"event": "queued", "data": json.dumps({"position": position, "simulation_id": runner.sim.id})}
+        sim_id = await simulation_manager.start(
+            runner, on_finish=lambda: admission.release(ticket), priority=ticket.priority
+        )
+        handoff["started"] = True
+        async for message in _frames(simulation_manager.subscribe(sim_id), framing):
+            yield message
+    finally:
+        release_unless_started()
+
+
+@router.post("/simulations/{sim_id}/fork")
+async def fork_simulation(sim_id: str, request: ForkRequest):
+    """Branch a simulation at a round boundary: the shared prefix is replayed, only later rounds call the LLM."""
+    checkpoint = await simulation_manager.load_checkpoint(sim_id, request.round - 1)
+    if checkpoint is None:
+        raise HTTPException(status_code=404, detail=f"Simulation '{sim_id}' has no checkpoint before round {request.round}")
+    unknown = set(request.agent_overrides) - set(AGENTS)
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown agents: {', '.join(sorted(unknown))}")
+
+    state = checkpoint.state
+    if request.parameters:
+        state.parameters = request.parameters
+    for agent_id, override in request.agent_overrides.items():
+        agent_state = state.agent_states[agent_id]
+        if override.position is not None:
+            agent_state.current_position = override.position
+        if override.willingness_to_settle is not None:
+            agent_state.willingness_to_settle = override.willingness_to_settle
+
+    try:
+        ticket = admission.enqueue(request.priority)
+    except QueueFull as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+
+    runner = SimulationRunner.resume(checkpoint)
+    return _admitted_response(ticket, runner, request.framing)
+
+
+@router.get("/simulations/{sim_id}/events")
+async def simulation_events(
+    sim_id: str,
+    after: int = 0,
+    from_snapshot: bool = False,
+    framing: Framing = Framing.EVENT,
+    last_event_id: str | None = Header(None),
+):
+    """Stream a simulation from any worker; reconnecting clients resume after Last-Event-ID.
+
+    Late joiners can pass `from_snapshot` to start at the latest `state_snapshot` instead of replaying every event.
+    """
+    if not await simulation_manager.exists(sim_id):
+        raise HTTPException(status_code=404, detail=f"Simulation '{sim_id}' not found")
+    if last_event_id and last_event_id.isdigit():
+        after = max(after, int(last_event_id))
+    elif from_snapshot:
+        after = max(after, await simulation_manager.latest_snapshot(sim_id))
+    return _event_stream(sim_id, after, framing)
+
+
+@router.get("/simulations/{sim_id}")
+async def get_simulation(sim_id: str):
+    state = await simulation_manager.load_state(sim_id)
+    if state is None:
+        raise HTTPException(status_code=404, detail=f"Simulation '{sim_id}' not found")
+    return Response(state.model_dump_json(), media_type="application/json")
+
+
+@router.get("/export")
+async def export_simulations(
+    format: ExportFormat = ExportFormat.NDJSON,
+    table: Annotated[list[str] | None, Query()] = None,
+    preset_id: str | None = None,
+    complete_only: bool = True,
+):
+    """Stream stored simulations; NDJSON may mix tables, CSV and Arrow take exactly one."""
+    tables = table or (list(TABLES) if format == ExportFormat.NDJSON else [])
+    unknown = [t for t in tables if t not in TABLES]
+    if unknown or not tables:
+        raise HTTPException(status_code=422, detail=f"Pick tables from {', '.join(TABLES)}")
+    if format != ExportFormat.NDJSON and len(tables) != 1:
+        raise HTTPException(status_code=422, detail=f"{format.value} export holds exactly one table")
+    if format == ExportFormat.ARROW and not arrow_available():
+        raise HTTPException(status_code=501, detail="Arrow export needs pyarrow installed")
+    extension = "arrows" if format == ExportFormat.ARROW else format.value
+    name = "simulations" if len(tables) > 1 else tables[0]
+    return StreamingResponse(
+        export(simulation_manager, format, tables, preset_id, complete_only),
+        media_type=MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="{name}.{extension}"'},
+    )
+
+
+class PreviewQuery(MacroParameters):
+    preset_id: str | None = None
+
+
+@router.get("/preview")
+async def preview(query: Annotated[PreviewQuery, Query()]):
+    """Predicted märket and settlements with 90% bands, without running a simulation."""
+    return surrogate.predict(query, query.preset_id)
+
+
+@router.get("/analytics")
+async def get_analytics(preset_id: str = ANY, week: str = ANY, bucket: str = ANY):
+    """Rollup for one preset/ISO week/parameter bucket; "*" matches all, "current" is this week."""
+    if week == "current":
+        week = iso_week()
+    return analytics.query(preset_id, week, bucket)
+
+
+@router.get("/analytics/keys")
+async def get_analytics_keys():
+    return analytics.keys()
+
+
+@router.get("/memory")
+async def get_memory_report():
+    return simulation_manager.registry.report()
+
+
+def _frames(events, framing: Framing):
+    if framing == Framing.ROUND:
+        return round_batches(events)
+    return (to_sse(event) async for event in events)
 
-    async def event_generator():
-        async for event in runner.run():
-            yield {
-                "event": event["event"],
-                "data": json.dumps(event["data"], ensure_ascii=False),
-            }
 
-    return EventSourceResponse(event_generator())
+def _event_stream(sim_id: str, after: int = 0, framing: Framing = Framing.EVENT) -> EventSourceResponse:
+    return EventSourceResponse(
+        _frames(simulation_manager.subscribe(sim_id, after), framing), headers={"X-Simulation-Id": sim_id}
+    )
@@ -5,7 +5,127 @@ class Settings(BaseSettings):
     anthropic_api_key: str = "dummy-key-for-dev"
     sonnet_model: str = "claude-sonnet-4-5-20250514"
     haiku_model: str = "claude-haiku-4-5-20251001"
+    agent_max_tokens: int = 1024
     cors_origins: list[str] = ["http://localhost:5173", "https://*.up.railway.app"]
+    # Runtime data files (the surrogate's training runs) live here unless given as absolute paths
+    data_dir: str = "data"
+
+    # LLM transport
+    llm_timeout: float = 120.0
+    llm_connect_timeout: float = 10.0
+    llm_max_retries: int = 2
+    llm_max_connections: int = 100
+    llm_max_keepalive_connections: int = 40
+    llm_keepalive_expiry: float = 60.0
+    llm_http2: bool = False
+    llm_warmup: bool = True
+    llm_warmup_connections: int = 4
+    llm_drain_timeout: float = 30.0
+    llm_backend: str = "anthropic"  # "openai" for a local server, "stub" for load tests and offline development
+    llm_stub_latency: float = 1.0
+    llm_stub_jitter: float = 0.5
+
+    # LLM call scheduling across simulations; queued calls are ranked by critical path, priority and age
+    llm_max_concurrent_calls: int = 0  # off by default; set to the provider's rate limit to enable ranking
+    llm_schedule_aging: float = 10.0  # seconds of waiting worth one critical-path class
+    llm_schedule_batch_penalty: float = 4.0  # batch runs rank behind every interactive class
+    llm_schedule_age_horizon: float = 300.0  # run age at which the half-class age bonus is reached
+
+    # Local OpenAI-compatible server (llm_backend="openai"); concurrent calls are micro-batched
+    local_llm_url: str = "http://localhost:8001/v1"
+    local_llm_api_key: str = ""
+    local_llm_model: str = "default"
+    local_llm_fast_model: str = ""  # served in place of Haiku; empty uses local_llm_model
+    local_llm_prompt_template: str = "{system}\n\nUser: {user}\n\nAssistant:"
+    local_llm_batch_window: float = 0.01
+    local_llm_max_batch: int = 64
+    local_llm_max_requests: int = 8
+
+    # Simulation event bus and state: "memory" (single worker) or "sqlite" (all workers on the host)
+    simulation_backend: str = "memory"
+    simulation_db_path: str = "simulations.db"
+    event_bus_poll_interval: float = 0.05
+
+    # Cancel runs (and their in-flight LLM calls) nobody is watching, after a grace period for reconnects
+    cancel_on_disconnect: bool = True
+    disconnect_grace_period: float = 15.0
+    disconnect_check_interval: float = 1.0
+
+    # Retention of simulations held in memory
+    registry_max_simulations: int = 200
+    registry_max_bytes: int = 256 * 1024 * 1024
+    registry_max_age: float = 6 * 3600
+    registry_hot_rounds: int = 3
+    registry_spill_dir: str = "spill"
+    memory_tracing: bool = False
+
+    # Bulk export: simulations loaded from the state backend per page
+    export_page_size: int = 50
+
+    # Approximate reuse of agent actions; a field missing from the tolerances must match exactly
+    reuse_tolerances: dict[str, float] = {
+        "inflation": 0.3, "unemployment": 0.3, "gdp_growth": 0.3, "policy_rate": 0.25, "previous_agreement": 0.2,
+    }
+    reuse_state_step: float = 0.25
+    reuse_max_entries: int = 20_000
+
+    # Analytics rollups
+    analytics_retention_weeks: int = 12
+
+    # Märket preview surrogate; an empty data path keeps observations in memory only
+    surrogate_data_path: str = "surrogate.jsonl"  # relative to data_dir
+    surrogate_ridge: float = 1.0
+    surrogate_min_samples: int = 20
+
+    # Panel mode: one call per coalition
+    panel_tokens_per_member: int = 700
+
+    # State events: a full snapshot every N rounds, deltas in between
+    state_snapshot_interval: int = 3
+
+    # Event-loop monitoring
+    loop_monitor: bool = False  # slow-step tracing works on the asyncio loop only, not uvloop
+    loop_lag_interval: float = 0.25
+    loop_lag_window: int = 2400
+    loop_slow_threshold: float = 0.05
+    loop_slow_trace_limit: int = 50
+
+    # Warm pool of precomputed preset runs
+    warm_pool_size: int = 0  # runs kept per preset; each one is a full LLM simulation, so opt-in
+    warm_pool_token_budget: int = 2_000_000  # per hour
+    warm_pool_check_interval: float = 5.0
+    warm_pool_max_backoff: float = 600.0
+    warm_pool_max_failures: int = 5  # consecutive failed refills before the pool gives up until restart
+
+    # Sector scale mode: local agreements negotiated by the heuristic policy
+    scale_chunk_size: int = 500
+    scale_max_rounds: int = 5
+    scale_llm_sample_rate: float = 0.01
+    scale_max_llm_calls: int = 50
+    scale_llm_concurrency: int = 8
+
+    # Deadline-driven runs
+    deadline_default_round_time: float = 12.0
+    deadline_fast_ratio: float = 0.4  # fast-model round time relative to the full model, until observed
+    deadline_summary_reserve: float = 8.0
+    deadline_fast_max_tokens: int = 400
+
+    # Admission control for /api/simulate
+    admission_max_concurrent: int = 8
+    admission_min_concurrent: int = 1
+    admission_max_queue: int = 32
+    admission_target_latency: float = 20.0
+    admission_aging: float = 60.0
+    admission_poll_interval: float = 1.0
+    admission_default_duration: float = 120.0
+
+    # Speculative execution of the first private-sector round
+    speculation_min_willingness: int = 65
+    speculation_max_spread: float = 0.2
+    speculation_tolerance: float = 0.1
+    # Agents in both phases (Unionen) must not move further than this in the settling round
+    speculation_position_tolerance: float = 0.1
+    speculation_willingness_tolerance: int = 5
 
     model_config = {"env_file": ".env"}
 
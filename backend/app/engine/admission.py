@@ -0,0 +1,128 @@
+import asyncio
+import itertools
+import logging
+import math
+import time
+from dataclasses import dataclass, field
+
+from app.config import settings
+from app.models.simulation import Priority
+from app.services.llm import llm_stats
+
+logger = logging.getLogger(__name__)
+
+PRIORITY_RANK = {Priority.INTERACTIVE: 0, Priority.BATCH: 1}
+
+
+class QueueFull(Exception):
+    def __init__(self, retry_after: int):
+        super().__init__(f"Simulation queue is full, retry in {retry_after}s")
+        self.retry_after = retry_after
+
+
+@dataclass
+class Ticket:
+    priority: Priority
+    seq: int
+    enqueued_at: float = field(default_factory=time.monotonic)
+    admitted: asyncio.Future = field(default_factory=lambda: asyncio.get_running_loop().create_future())
+    released: bool = False
+
+    def rank(self, now: float) -> float:
+        # Waiting `admission_aging` seconds is worth one priority class, so batch work is never starved
+        return PRIORITY_RANK[self.priority] - (now - self.enqueued_at) / settings.admission_aging
+
+
+class AdmissionController:
+    """Caps concurrent simulations and queues the rest, scaled down when the LLM is slow or failing."""
+
+    def __init__(self):
+        self._running = 0
+        self._waiting: list[Ticket] = []
+        self._seq = itertools.count()
+        self.admitted = 0
+        self.rejected = 0
+        self._duration_ewma: float | None = None
+        self._wait_ewma = 0.0
+
+    def capacity(self) -> int:
+        factor = 1.0
+        stats = llm_stats.kinds.get("agent")
+        if stats is not None:
+            if stats.ewma_latency:
+                factor = min(1.0, settings.admission_target_latency / stats.ewma_latency)
+            factor *= max(0.0, 1.0 - 2 * stats.ewma_error)
+        return max(settings.admission_min_concurrent, math.floor(settings.admission_max_concurrent * factor))
+
+    def retry_after(self) -> int:
+        duration = self._duration_ewma or settings.admission_default_duration
+        return max(1, math.ceil(duration * (len(self._waiting) + 1) / self.capacity()))
+
+    def enqueue(self, priority: Priority) -> Ticket:
+        if len(self._waiting) >= settings.admission_max_queue:
+            self.rejected += 1
+            raise QueueFull(self.retry_after())
+        ticket = Ticket(priority, next(self._seq))
+        self._waiting.append(ticket)
+        self._dispatch()
+        return ticket
+
+    def position(self, ticket: Ticket) -> int:
+        """1-based position in admission order, or 0 once admitted."""
+        if ticket.admitted.done():
+            return 0
+        now = time.monotonic()
+        ahead = sum(1 for t in self._waiting if (t.rank(now), t.seq) < (ticket.rank(now), ticket.seq))
+        return ahead + 1
+
+    async def wait(self, ticket: Ticket):
+        """Yield the ticket's queue position whenever it changes, until it is admitted."""
+        last = None
+        while not ticket.admitted.done():
+            position = self.position(ticket)
+            if position != last:
+                last = position
+                yield position
+            try:
+                await asyncio.wait_for(asyncio.shield(ticket.admitted), settings.admission_poll_interval)
+            except TimeoutError:
+                # Capacity follows LLM health, so it may have grown while we waited
+                self._dispatch()
+
+    def _dispatch(self):
+        now = time.monotonic()
+        while self._waiting and self._running < self.capacity():
+            ticket = min(self._waiting, key=lambda t: (t.rank(now), t.seq))
+            self._waiting.remove(ticket)
+            self._running += 1
+            self.admitted += 1
+            self._wait_ewma = 0.9 * self._wait_ewma + 0.1 * (now - ticket.enqueued_at)
+            ticket.admitted.set_result(now)
+
+    def release(self, ticket: Ticket):
+        """Free the ticket's slot, or drop it from the queue if it was never admitted."""
+        if ticket.released:
+            return
+        ticket.released = True
+        if ticket.admitted.done():
+            self._running -= 1
+            duration = time.monotonic() - ticket.admitted.result()
+            self._duration_ewma = duration if self._duration_ewma is None else 0.8 * self._duration_ewma + 0.2 * duration
+        else:
+            self._waiting.remove(ticket)
+            ticket.admitted.cancel()
+        self._dispatch()
+
+    def stats(self) -> dict:
+        return {
+            "capacity": self.capacity(),
+            "running": self._running,
+            "queued": {p.value: sum(1 for t in self._waiting if t.priority == p) for p in Priority},
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "avg_wait": self._wait_ewma,
+            "avg_duration": self._duration_ewma,
+        }
+
+
+admission = AdmissionController()
@@ -0,0 +1,173 @@
+"""Rollups over completed simulations, updated incrementally at simulation_end.
+
+Every completed run is folded into a fixed set of rollups (by preset, ISO week
+and parameter bucket, plus every combination of their wildcards), so a query
+is a dictionary lookup regardless of how many runs have been recorded.
+Rollups are per worker.
+"""
+import itertools
+import math
+from collections import Counter
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+
+from app.config import settings
+from app.models.scenario import MacroParameters
+from app.models.simulation import NegotiationPair, SimulationState
+
+ANY = "*"
+
+
+class QuantileSketch:
+    """Fixed-width histogram: merges are exact and quantiles cost O(bins), independent of sample count.
+
+    Settlement levels are rounded to 0.1, so bins centred on that grid lose nothing.
+    """
+
+    def __init__(self, lo: float = -2.0, hi: float = 16.0, width: float = 0.1):
+        self.lo = lo
+        self.width = width
+        self.bins = [0] * (math.ceil((hi - lo) / width) + 1)
+        self.count = 0
+        self.total = 0.0
+
+    def add(self, value: float):
+        index = min(max(round((value - self.lo) / self.width), 0), len(self.bins) - 1)
+        self.bins[index] += 1
+        self.count += 1
+        self.total += value
+
+    def merge(self, other: "QuantileSketch"):
+        for i, n in enumerate(other.bins):
+            self.bins[i] += n
+        self.count += other.count
+        self.total += other.total
+
+    def quantile(self, q: float) -> float | None:
+        if not self.count:
+            return None
+        target = q * self.count
+        seen = 0
+        for i, n in enumerate(self.bins):
+            seen += n
+            if n and seen >= target:
+                return round(self.lo + i * self.width, 3)
+        return round(self.lo + (len(self.bins) - 1) * self.width, 3)
+
+    def as_dict(self) -> dict:
+        return {
+            "count": self.count,
+            "mean": round(self.total / self.count, 3) if self.count else None,
+            **{f"p{int(q * 100)}": self.quantile(q) for q in (0.1, 0.25, 0.5, 0.75, 0.9)},
+        }
+
+
+@dataclass
+class PairRollup:
+    level: QuantileSketch = field(default_factory=QuantileSketch)
+    rounds: Counter = field(default_factory=Counter)
+    mediated: int = 0
+
+    def as_dict(self) -> dict:
+        runs = sum(self.rounds.values())
+        return {
+            "level": self.level.as_dict(),
+            "mean_round": sum(r * n for r, n in self.rounds.items()) / runs if runs else None,
+            "rounds": dict(sorted(self.rounds.items())),
+            "mediation_rate": self.mediated / runs if runs else None,
+        }
+
+
+@dataclass
+class Rollup:
+    runs: int = 0
+    marke: QuantileSketch = field(default_factory=QuantileSketch)
+    pairs: dict[str, PairRollup] = field(default_factory=dict)
+    pairs_settled: int = 0
+    pairs_mediated: int = 0
+    conflict_events: Counter = field(default_factory=Counter)
+
+    def as_dict(self) -> dict:
+        return {
+            "runs": self.runs,
+            "marke": self.marke.as_dict(),
+            "mediation_rate": self.pairs_mediated / self.pairs_settled if self.pairs_settled else None,
+            "conflict_events_per_run": {
+                kind: n / self.runs for kind, n in self.conflict_events.items()
+            } if self.runs else {},
+            "pairs": {key: pair.as_dict() for key, pair in self.pairs.items()},
+        }
+
+
+def pair_key(pair: NegotiationPair) -> str:
+    return f"{'+'.join(pair.union_ids)}/{pair.employer_id}"
+
+
+def _band(value: float, edges: tuple[float, ...]) -> int:
+    return sum(value >= edge for edge in edges)
+
+
+def parameter_bucket(parameters: MacroParameters) -> str:
+    """Coarse bands of the parameters that move märket the most."""
+    return (
+        f"inf{_band(parameters.inflation, (2, 4, 7))}"
+        f"-unemp{_band(parameters.unemployment, (5, 8))}"
+        f"-gdp{_band(parameters.gdp_growth, (0, 2))}"
+        f"-{parameters.export_pressure.value}"
+    )
+
+
+def iso_week(moment: datetime | None = None) -> str:
+    year, week, _ = (moment or datetime.now(timezone.utc)).isocalendar()
+    return f"{year}-W{week:02d}"
+
+
+class Analytics:
+    def __init__(self):
+        self._rollups: dict[tuple[str, str, str], Rollup] = {}
+
+    def record(self, sim: SimulationState, completed_at: datetime | None = None):
+        preset = sim.preset_id or "custom"
+        week = iso_week(completed_at)
+        bucket = parameter_bucket(sim.parameters)
+        for key in itertools.product((preset, ANY), (week, ANY), (bucket, ANY)):
+            self._apply(self._rollups.setdefault(key, Rollup()), sim)
+        self._prune()
+
+    def _apply(self, rollup: Rollup, sim: SimulationState):
+        rollup.runs += 1
+        if sim.marke is not None:
+            rollup.marke.add(sim.marke)
+        for pair in sim.negotiation_pairs:
+            if not pair.is_settled:
+                continue
+            stats = rollup.pairs.setdefault(pair_key(pair), PairRollup())
+            stats.level.add(pair.settlement_level)
+            stats.rounds[pair.settlement_round] += 1
+            stats.mediated += pair.mediated
+            rollup.pairs_settled += 1
+            rollup.pairs_mediated += pair.mediated
+        for rnd in sim.rounds:
+            for event in rnd.conflict_events:
+                rollup.conflict_events[event.event_type] += 1
+
+    def _prune(self):
+        weeks = sorted({week for _, week, _ in self._rollups if week != ANY})
+        stale = set(weeks[:max(len(weeks) - settings.analytics_retention_weeks, 0)])
+        for key in [k for k in self._rollups if k[1] in stale]:
+            del self._rollups[key]
+
+    def query(self, preset_id: str = ANY, week: str = ANY, bucket: str = ANY) -> dict:
+        rollup = self._rollups.get((preset_id, week, bucket))
+        return {
+            "preset_id": preset_id,
+            "week": week,
+            "bucket": bucket,
+            **(rollup or Rollup()).as_dict(),
+        }
+
+    def keys(self) -> list[dict]:
+        return [{"preset_id": p, "week": w, "bucket": b} for p, w, b in sorted(self._rollups)]
+
+
+analytics = Analytics()
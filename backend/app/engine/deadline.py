@@ -0,0 +1,94 @@
+"""Deadline-driven runs: fit a simulation into a wall-clock target.
+
+Before every negotiation round the planner compares the time left with what
+the remaining rounds are expected to cost and picks, in order of preference:
+the full plan; fewer rounds per phase (mediation settles what is left); the
+fast model with shorter answers; a single round per remaining phase.
+Round-time estimates start from recent LLM latency and follow observed rounds.
+"""
+import time
+from dataclasses import dataclass, field
+
+from app.config import settings
+from app.models.simulation import Phase
+from app.services.llm import llm_stats
+
+# Weight of the latest observed round in the round-time estimates
+ALPHA = 0.5
+
+
+@dataclass(frozen=True)
+class RoundPlan:
+    max_rounds: int
+    stall_round: int
+    fast: bool
+
+
+@dataclass
+class DeadlinePlanner:
+    target: float
+    started: float = field(default_factory=time.monotonic)
+    round_time: dict[bool, float | None] = field(default_factory=lambda: {False: None, True: None})
+    rounds: int = 0
+    fast_rounds: int = 0
+    shortened: list[str] = field(default_factory=list)
+    _round_started: float | None = None
+
+    def elapsed(self) -> float:
+        return time.monotonic() - self.started
+
+    def _estimate(self, fast: bool) -> float:
+        observed = self.round_time[fast]
+        if observed is not None:
+            return observed
+        slow = self.round_time[False] or llm_stats.kinds["agent"].ewma_latency or settings.deadline_default_round_time
+        return slow * settings.deadline_fast_ratio if fast else slow
+
+    def _summary_reserve(self) -> float:
+        return llm_stats.kinds["summary"].ewma_latency or settings.deadline_summary_reserve
+
+    def plan(
+        self, phase: Phase, done: int, max_rounds: int, stall_round: int, later_rounds: list[int]
+    ) -> RoundPlan:
+        """Plan the rest of `phase`, which has had `done` rounds; `later_rounds` are the max rounds of later phases."""
+        remaining = self.target - self.elapsed() - self._summary_reserve()
+        planned = (max_rounds - done) + sum(later_rounds)
+        # Every phase gets at least one round
+        first = 0 if done else 1
+        needed = first + len(later_rounds)
+        for fast in (False, True):
+            affordable = int(remaining // self._estimate(fast))
+            if affordable >= planned:
+                return RoundPlan(max_rounds, stall_round, fast)
+            if affordable >= needed:
+                # Share what we can afford in proportion to the rounds each phase was planned to get
+                share = max(first, affordable * (max_rounds - done) // planned)
+                return self._shortened(phase, done + share, stall_round, fast)
+        return self._shortened(phase, done + first, stall_round, True)
+
+    def _shortened(self, phase: Phase, max_rounds: int, stall_round: int, fast: bool) -> RoundPlan:
+        if phase.name not in self.shortened:
+            self.shortened.append(phase.name)
+        # Put the stalling pressure on the last round we can afford
+        return RoundPlan(max_rounds, min(stall_round, max_rounds - 1), fast)
+
+    def round_started(self):
+        self._round_started = time.monotonic()
+
+    def round_finished(self, fast: bool):
+        duration = time.monotonic() - self._round_started
+        previous = self.round_time[fast]
+        self.round_time[fast] = duration if previous is None else (1 - ALPHA) * previous + ALPHA * duration
+        self.rounds += 1
+        self.fast_rounds += fast
+
+    def report(self) -> dict:
+        elapsed = self.elapsed()
+        return {
+            "target": self.target,
+            "elapsed": round(elapsed, 2),
+            "met": elapsed <= self.target,
+            "rounds": self.rounds,
+            "fast_rounds": self.fast_rounds,
+            "shortened_phases": self.shortened,
+        }
@@ -0,0 +1,43 @@
+from app.models.simulation import SimulationState
+
+SCALAR_FIELDS = ("current_round", "current_phase", "marke", "is_complete")
+
+
+def state_view(sim: SimulationState) -> dict:
+    """The part of a simulation that clients mirror: everything but the round history."""
+    view = {name: getattr(sim, name) for name in SCALAR_FIELDS}
+    view["current_phase"] = sim.current_phase.value
+    view["agent_states"] = {aid: state.model_dump() for aid, state in sim.agent_states.items()}
+    # Pairs never move within the list, so their index is a stable key
+    view["negotiation_pairs"] = {str(i): pair.model_dump(mode="json") for i, pair in enumerate(sim.negotiation_pairs)}
+    return view
+
+
+def _changed(old: dict, new: dict) -> dict:
+    return {key: value for key, value in new.items() if old.get(key, object()) != value}
+
+
+class StateDiffer:
+    """Remembers the last state published for one simulation and reports only what changed since."""
+
+    def __init__(self):
+        self._last: dict = {}
+
+    def snapshot(self, sim: SimulationState) -> dict:
+        self._last = state_view(sim)
+        return self._last
+
+    def delta(self, sim: SimulationState) -> dict | None:
+        view = state_view(sim)
+        delta = _changed(self._last, {name: view[name] for name in SCALAR_FIELDS})
+        for collection in ("agent_states", "negotiation_pairs"):
+            old = self._last.get(collection, {})
+            changes = {}
+            for key, item in view[collection].items():
+                fields = _changed(old.get(key, {}), item)
+                if fields:
+                    changes[key] = fields
+            if changes:
+                delta[collection] = changes
+        self._last = view
+        return delta or None
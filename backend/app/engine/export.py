@@ -0,0 +1,194 @@
+"""Bulk export of stored simulations as NDJSON, typed CSV or Arrow IPC.
+
+Simulations are read from the state backend a page at a time and turned into
+rows of flat tables, so memory stays constant however many runs are exported.
+Arrow needs the optional ``pyarrow`` package.
+"""
+import csv
+import importlib.util
+import io
+import json
+from collections.abc import AsyncIterator, Iterator
+from enum import Enum
+
+from app.config import settings
+from app.engine.manager import SimulationManager
+from app.models.simulation import SimulationState
+
+
+class ExportFormat(str, Enum):
+    NDJSON = "ndjson"
+    CSV = "csv"
+    ARROW = "arrow"
+
+
+MEDIA_TYPES = {
+    ExportFormat.NDJSON: "application/x-ndjson",
+    ExportFormat.CSV: "text/csv",
+    ExportFormat.ARROW: "application/vnd.apache.arrow.stream",
+}
+
+TABLES: dict[str, list[tuple[str, type]]] = {
+    "simulations": [
+        ("simulation_id", str), ("preset_id", str), ("is_complete", bool), ("marke", float), ("rounds", int),
+        ("inflation", float), ("unemployment", float), ("gdp_growth", float), ("policy_rate", float),
+        ("political_climate", int), ("export_pressure", str), ("previous_agreement", float),
+    ],
+    "actions": [
+        ("simulation_id", str), ("round_number", int), ("phase", int), ("agent_id", str), ("position", float),
+        ("willingness_to_settle", int), ("reasoning", str), ("public_statement", str),
+    ],
+    "settlements": [
+        ("simulation_id", str), ("union_ids", str), ("employer_id", str), ("phase", int), ("level", float),
+        ("round", int), ("mediated", bool),
+    ],
+    "conflict_events": [
+        ("simulation_id", str), ("round_number", int), ("event_type", str), ("agent_id", str), ("description", str),
+    ],
+}
+
+TYPE_NAMES = {str: "string", int: "int", float: "float", bool: "bool"}
+
+
+def arrow_available() -> bool:
+    return importlib.util.find_spec("pyarrow") is not None
+
+
+def rows(table: str, sim: SimulationState) -> Iterator[tuple]:
+    if table == "simulations":
+        p = sim.parameters
+        yield (
+            sim.id, sim.preset_id, sim.is_complete, sim.marke, len(sim.rounds), p.inflation, p.unemployment,
+            p.gdp_growth, p.policy_rate, p.political_climate, p.export_pressure.value, p.previous_agreement,
+        )
+    elif table == "actions":
+        for rnd in sim.rounds:
+            for a in rnd.actions:
+                yield (
+                    sim.id, a.round_number, int(a.phase), a.agent_id, a.position, a.willingness_to_settle,
+                    a.reasoning, a.public_statement,
+                )
+    elif table == "settlements":
+        for pair in sim.negotiation_pairs:
+            yield (
+                sim.id, "+".join(pair.union_ids), pair.employer_id, pair.phase.value, pair.settlement_level,
+                pair.settlement_round, pair.mediated,
+            )
+    elif table == "conflict_events":
+        for rnd in sim.rounds:
+            for e in rnd.conflict_events:
+                yield sim.id, e.round_number, e.event_type, e.agent_id, e.description
+
+
+async def simulations(
+    manager: SimulationManager, preset_id: str | None = None, complete_only: bool = True
+) -> AsyncIterator[list[SimulationState]]:
+    """Stored simulations, a page at a time."""
+    after = ""
+    while ids := await manager.states.list_states(after, settings.export_page_size):
+        after = ids[-1]
+        page = []
+        for sim_id in ids:
+            sim = await manager.load_state(sim_id)
+            if sim is None or (complete_only and not sim.is_complete):
+                continue
+            if preset_id is None or sim.preset_id == preset_id:
+                page.append(sim)
+        yield page
+
+
+async def export(
+    manager: SimulationManager,
+    fmt: ExportFormat,
+    tables: list[str],
+    preset_id: str | None = None,
+    complete_only: bool = True,
+) -> AsyncIterator[bytes]:
+    """Encode the given tables; CSV and Arrow hold a single table, NDJSON tags each record with its table."""
+    if fmt == ExportFormat.NDJSON:
+        encoder = _NDJSONEncoder(tables)
+    elif fmt == ExportFormat.CSV:
+        encoder = _CSVEncoder(tables[0])
+    else:
+        encoder = _ArrowEncoder(tables[0])
+    yield encoder.header()
+    async for page in simulations(manager, preset_id, complete_only):
+        chunk = encoder.encode(page)
+        if chunk:
+            yield chunk
+    yield encoder.footer()
+
+
+class _NDJSONEncoder:
+    def __init__(self, tables: list[str]):
+        self.tables = tables
+
+    def header(self) -> bytes:
+        return b""
+
+    def encode(self, page: list[SimulationState]) -> bytes:
+        lines = []
+        for sim in page:
+            for table in self.tables:
+                names = [name for name, _ in TABLES[table]]
+                for row in rows(table, sim):
+                    lines.append(json.dumps({"table": table, **dict(zip(names, row))}, ensure_ascii=False))
+        return "".join(line + "\n" for line in lines).encode()
+
+    def footer(self) -> bytes:
+        return b""
+
+
+class _CSVEncoder:
+    def __init__(self, table: str):
+        self.table = table
+
+    def _write(self, records) -> bytes:
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows(records)
+        return buffer.getvalue().encode()
+
+    def header(self) -> bytes:
+        # Typed header cells ("name:type") let readers restore column types without a schema file
+        return self._write([[f"{name}:{TYPE_NAMES[kind]}" for name, kind in TABLES[self.table]]])
+
+    def encode(self, page: list[SimulationState]) -> bytes:
+        return self._write(
+            ["" if v is None else str(v).lower() if isinstance(v, bool) else v for v in row]
+            for sim in page for row in rows(self.table, sim)
+        )
+
+    def footer(self) -> bytes:
+        return b""
+
+
+class _ArrowEncoder:
+    def __init__(self, table: str):
+        import pyarrow as pa
+
+        self.pa = pa
+        types = {str: pa.string(), int: pa.int64(), float: pa.float64(), bool: pa.bool_()}
+        self.table = table
+        self.schema = pa.schema([(name, types[kind]) for name, kind in TABLES[table]])
+        self.sink = io.BytesIO()
+        self.writer = pa.ipc.new_stream(self.sink, self.schema)
+
+    def _drain(self) -> bytes:
+        data = self.sink.getvalue()
+        self.sink.seek(0)
+        self.sink.truncate()
+        return data
+
+    def header(self) -> bytes:
+        return self._drain()
+
+    def encode(self, page: list[SimulationState]) -> bytes:
+        columns = list(zip(*(row for sim in page for row in rows(self.table, sim))))
+        if not columns:
+            return b""
+        self.writer.write_batch(self.pa.record_batch([list(c) for c in columns], schema=self.schema))
+        return self._drain()
+
+    def footer(self) -> bytes:
+        self.writer.close()
+        return self._drain()
@@ -0,0 +1,288 @@
+import asyncio
+import json
+import logging
+import time
+import uuid
+from collections.abc import AsyncIterator, Callable
+from contextlib import aclosing
+
+from app.config import settings
+from app.engine.analytics import analytics
+from app.engine.deltas import StateDiffer
+from app.engine.surrogate import surrogate
+from app.engine.registry import SimulationRegistry, select_evictions, simulation_registry
+from app.engine.runner import SimulationRunner
+from app.models.simulation import Checkpoint, Priority, SimulationState
+from app.services.bus import BusEvent, EventBus, StateBackend, event_bus, state_backend
+from app.services.llm_scheduler import SimulationContext, simulation_context
+from app.services.loop_monitor import loop_monitor
+
+logger = logging.getLogger(__name__)
+
+
+class SimulationManager:
+    """Runs simulations in the background and publishes their events to the bus.
+
+    The worker that starts a simulation owns its runner; any worker sharing the
+    bus can stream it by id.
+    """
+
+    def __init__(self, bus: EventBus, states: StateBackend, registry: SimulationRegistry):
+        self.bus = bus
+        self.states = states
+        self.registry = registry
+        self._tasks: dict[str, asyncio.Task] = {}
+        self._watchers: set[asyncio.Task] = set()
+        self.cancelled_simulations = 0
+
+    async def start(
+        self,
+        runner: SimulationRunner,
+        on_finish: Callable[[], None] | None = None,
+        priority: Priority = Priority.INTERACTIVE,
+    ) -> str:
+        sim_id = runner.sim.id
+        self.registry.register(runner.sim)
+        await self.bus.open(sim_id)
+        origin = runner.forked_from
+        await self._publish(sim_id, "simulation_start", {
+            "simulation_id": sim_id,
+            "preset_id": runner.sim.preset_id,
+            "parameters": runner.sim.parameters.model_dump(mode="json"),
+            "forked_from": {"simulation_id": origin.simulation_id, "round": origin.round_number} if origin else None,
+        })
+        if origin:
+            await self._copy_log(sim_id, origin.simulation_id, origin.round_number, origin.seq)
+        differ = StateDiffer()
+        await self._publish(sim_id, "state_snapshot", differ.snapshot(runner.sim))
+        # The run's tasks copy the context when created, so the LLM scheduler sees its priority and age
+        reset = simulation_context.set(SimulationContext(priority))
+        try:
+            task = asyncio.create_task(self._drive(runner, differ))
+        finally:
+            simulation_context.reset(reset)
+        if on_finish:
+            task.add_done_callback(lambda _: on_finish())
+        self._track(sim_id, task)
+        return sim_id
+
+    async def replay(self, source_id: str, delays: list[float] | None = None) -> str | None:
+        """Serve a finished simulation as a new one without calling the LLM.
+
+        `delays[i]` is the pause before event seq i + 1; without it events are published back to back.
+        """
+        state = await self.load_state(source_id)
+        if state is None or not state.is_complete:
+            return None
+        sim = state.model_copy(update={"id": str(uuid.uuid4())})
+        self.registry.register(sim)
+        await self.bus.open(sim.id)
+        await self._publish(sim.id, "simulation_start", {
+            "simulation_id": sim.id,
+            "preset_id": sim.preset_id,
+            "parameters": sim.parameters.model_dump(mode="json"),
+            "forked_from": None,
+        })
+        self._track(sim.id, asyncio.create_task(self._drive_replay(sim, source_id, delays)))
+        return sim.id
+
+    def _track(self, sim_id: str, task: asyncio.Task):
+        self._tasks[sim_id] = task
+        if settings.cancel_on_disconnect:
+            watcher = asyncio.create_task(self._watch_viewers(sim_id, task))
+            self._watchers.add(watcher)
+            watcher.add_done_callback(self._watchers.discard)
+
+    async def _watch_viewers(self, sim_id: str, task: asyncio.Task):
+        """Cancel a run, and with it every in-flight LLM call, once nobody has watched it for the grace period."""
+        abandoned_since = None
+        while not task.done():
+            await asyncio.sleep(settings.disconnect_check_interval)
+            if await self.bus.viewers(sim_id):
+                abandoned_since = None
+                continue
+            now = time.monotonic()
+            abandoned_since = abandoned_since or now
+            if now - abandoned_since >= settings.disconnect_grace_period and not task.done():
+                logger.info(f"Cancelling simulation {sim_id}: no viewers for {now - abandoned_since:.0f}s")
+                self.cancelled_simulations += 1
+                task.cancel()
+                return
+
+    async def _publish(self, sim_id: str, event: str, data: dict) -> BusEvent:
+        bus_event = await self.bus.publish(sim_id, event, data)
+        if self.bus.in_memory:
+            self.registry.record_event(sim_id, len(bus_event.data))
+        return bus_event
+
+    async def _copy_log(
+        self, sim_id: str, source_id: str, rounds: int, upto_seq: int | None = None, delays: list[float] | None = None
+    ):
+        """Copy another simulation's events (up to `upto_seq`) and checkpoints (up to `rounds`) into this one."""
+        async with aclosing(self.bus.subscribe(source_id)) as events:
+            async for event in events:
+                if delays and event.seq <= len(delays):
+                    await asyncio.sleep(delays[event.seq - 1])
+                if event.event != "simulation_start":
+                    await self._publish(sim_id, event.event, json.loads(event.data))
+                if upto_seq is not None and event.seq >= upto_seq:
+                    break
+        # Sequence numbers line up with the source's, so its checkpoints are valid for the copy as well
+        for round_number in range(1, rounds + 1):
+            data = await self.states.load_checkpoint(source_id, round_number)
+            if data:
+                checkpoint = Checkpoint.model_validate_json(data)
+                checkpoint.simulation_id = sim_id
+                await self.states.save_checkpoint(sim_id, round_number, checkpoint.model_dump_json())
+
+    async def _save_checkpoint(self, runner: SimulationRunner, seq: int):
+        sim = runner.sim
+        checkpoint = Checkpoint(
+            simulation_id=sim.id,
+            round_number=sim.current_round,
+            seq=seq,
+            flavor_text=runner.flavor_text,
+            options=runner.options,
+            state=sim.model_copy(update={"rounds": []}),
+        )
+        with loop_monitor.section("manager.checkpoint"):
+            data = checkpoint.model_dump_json()
+        await self.states.save_checkpoint(sim.id, sim.current_round, data)
+        if self.bus.in_memory:
+            self.registry.record_event(sim.id, len(data))
+
+    async def load_checkpoint(self, sim_id: str, round_number: int) -> Checkpoint | None:
+        """The checkpoint taken at the end of `round_number`, with its round history restored."""
+        data = await self.states.load_checkpoint(sim_id, round_number)
+        state = await self.load_state(sim_id)
+        if data is None or state is None:
+            return None
+        checkpoint = Checkpoint.model_validate_json(data)
+        checkpoint.state.rounds = state.rounds[:round_number]
+        return checkpoint
+
+    async def _drive(self, runner: SimulationRunner, differ: StateDiffer):
+        sim_id = runner.sim.id
+        rounds_since_snapshot = 0
+        round_end_seqs: dict[int, int] = {}
+        try:
+            async for event in runner.run():
+                last = await self._publish(sim_id, event["event"], event["data"])
+                with loop_monitor.section("manager.state_delta"):
+                    delta = differ.delta(runner.sim)
+                if delta:
+                    last = await self._publish(sim_id, "state_delta", delta)
+                if event["event"] == "round_end":
+                    rounds_since_snapshot += 1
+                    if rounds_since_snapshot >= settings.state_snapshot_interval:
+                        rounds_since_snapshot = 0
+                        last = await self._publish(sim_id, "state_snapshot", differ.snapshot(runner.sim))
+                    await self._save_checkpoint(runner, last.seq)
+                    round_end_seqs[runner.sim.current_round] = last.seq
+                    spilled = await self.registry.record_round(runner.sim)
+                    if spilled:
+                        # The events of spilled rounds carry the same actions, so they leave memory too
+                        freed = await self.bus.spill(sim_id, round_end_seqs.get(max(spilled), 0))
+                        self.registry.record_event(sim_id, -freed)
+                elif event["event"] == "simulation_end":
+                    analytics.record(runner.sim)
+                    await surrogate.observe(runner.sim)
+                if event["event"] in ("round_end", "simulation_end"):
+                    await self.states.save_state(sim_id, runner.sim.model_dump_json())
+        except asyncio.CancelledError:
+            await self._publish(sim_id, "error", {"detail": "Simulation cancelled"})
+            raise
+        except Exception:
+            logger.exception(f"Simulation {sim_id} failed")
+            await self._publish(sim_id, "error", {"detail": "Simulation failed"})
+        finally:
+            await self.bus.complete(sim_id)
+            self._tasks.pop(sim_id, None)
+            await self._retire(sim_id)
+
+    async def _drive_replay(self, sim: SimulationState, source_id: str, delays: list[float] | None):
+        try:
+            await self._copy_log(sim.id, source_id, sim.current_round, delays=delays)
+            await self.registry.record_round(sim)
+            await self.states.save_state(sim.id, sim.model_dump_json())
+        except asyncio.CancelledError:
+            await self._publish(sim.id, "error", {"detail": "Simulation cancelled"})
+            raise
+        finally:
+            await self.bus.complete(sim.id)
+            self._tasks.pop(sim.id, None)
+            await self._retire(sim.id)
+
+    async def _retire(self, sim_id: str):
+        """Apply the retention policy once a simulation finishes.
+
+        In-process logs are evicted by this worker's registry; a shared backend
+        is checked as a whole, so whichever worker finishes a run evicts for all.
+        """
+        evicted = self.registry.complete(sim_id)
+        if not self.bus.in_memory:
+            completed, running = await self.bus.footprint()
+            evicted = select_evictions(completed, running, time.time())
+        for evicted_id in evicted:
+            await self.bus.drop(evicted_id)
+            await self.states.delete_state(evicted_id)
+            self.registry.delete_segment(evicted_id)
+
+    async def load_state(self, sim_id: str) -> SimulationState | None:
+        data = await self.states.load_state(sim_id)
+        if data is None:
+            return None
+        return await self.registry.hydrate(SimulationState.model_validate_json(data))
+
+    async def subscribe(self, sim_id: str, after: int = 0):
+        await self.bus.add_viewer(sim_id, 1)
+        try:
+            async for event in self.bus.subscribe(sim_id, after):
+                yield event
+        finally:
+            await self.bus.add_viewer(sim_id, -1)
+
+    async def latest_snapshot(self, sim_id: str) -> int:
+        """Sequence number to resume after so that the stream starts at the latest state snapshot."""
+        return max(await self.bus.last_seq(sim_id, "state_snapshot") - 1, 0)
+
+    async def exists(self, sim_id: str) -> bool:
+        return await self.bus.exists(sim_id)
+
+    def stats(self) -> dict:
+        return {"running": len(self._tasks), "cancelled_on_disconnect": self.cancelled_simulations}
+
+    async def shutdown(self):
+        tasks = [*self._tasks.values(), *self._watchers]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+def to_sse(event: BusEvent) -> dict:
+    return {"id": str(event.seq), "event": event.event, "data": event.data}
+
+
+# Events that close a batch in round framing
+BATCH_BOUNDARIES = {"round_end", "simulation_end", "error"}
+
+
+async def round_batches(events: AsyncIterator[BusEvent]) -> AsyncIterator[dict]:
+    """Frame a stream as one `round_batch` message per round; its id is the last event's seq, so resuming works."""
+    batch: list[BusEvent] = []
+    async for event in events:
+        batch.append(event)
+        if event.event in BATCH_BOUNDARIES:
+            yield _batch_to_sse(batch)
+            batch = []
+    if batch:
+        yield _batch_to_sse(batch)
+
+
+def _batch_to_sse(batch: list[BusEvent]) -> dict:
+    # Event data is already encoded JSON, so splice it in rather than decoding it again
+    items = ",".join(f'{{"seq":{e.seq},"event":{json.dumps(e.event)},"data":{e.data}}}' for e in batch)
+    return {"id": str(batch[-1].seq), "event": "round_batch", "data": f"[{items}]"}
+
+
+simulation_manager = SimulationManager(event_bus, state_backend, simulation_registry)
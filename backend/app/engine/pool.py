@@ -0,0 +1,176 @@
+"""Warm pool of finished simulations for the presets.
+
+Most requests are a preset with its default parameters, so the pool keeps
+`warm_pool_size` independent, fully computed runs per preset and serves each
+one once, replayed from its event log. Refills run one at a time as batch
+work, only while admission has spare capacity and the hourly token budget
+allows. Failed refills back off exponentially, and after
+`warm_pool_max_failures` in a row the pool stops refilling.
+"""
+import asyncio
+import logging
+import time
+from collections import deque
+from dataclasses import dataclass
+
+from app.config import settings
+from app.engine.admission import admission
+from app.engine.manager import simulation_manager
+from app.engine.runner import SimulationRunner
+from app.models.simulation import Priority, SimulationOptions
+from app.scenarios.presets import PRESETS
+from app.services.llm import TokenMeter, token_meter
+
+logger = logging.getLogger(__name__)
+
+TOKEN_WINDOW = 3600.0
+
+
+@dataclass
+class PooledRun:
+    sim_id: str
+    delays: list[float]  # pause before each event, as recorded
+    tokens: int
+
+
+class WarmPool:
+    def __init__(self):
+        self._runs: dict[str, deque[PooledRun]] = {preset_id: deque() for preset_id in PRESETS}
+        self._spent: deque[tuple[float, int]] = deque()
+        self._task: asyncio.Task | None = None
+        self.hits = 0
+        self.misses = 0
+        self.refills = 0
+        self.failed_refills = 0
+        self.consecutive_failures = 0
+        self.disabled = False
+
+    def eligible(self, preset_id: str | None, parameters, options: SimulationOptions | None) -> bool:
+        """Only a preset run with its own parameters and default options can be served from the pool."""
+        preset = PRESETS.get(preset_id) if preset_id else None
+        return (
+            preset is not None
+            and (parameters is None or parameters == preset.parameters)
+            and (options is None or options == SimulationOptions())
+        )
+
+    async def take(self, preset_id: str, replay_speed: float | None) -> str | None:
+        """Start a pooled run as a new simulation and return its id, or None on a miss."""
+        runs = self._runs[preset_id]
+        while runs:
+            run = runs.popleft()
+            delays = [d / replay_speed for d in run.delays] if replay_speed else None
+            sim_id = await simulation_manager.replay(run.sim_id, delays)
+            # The source may have been evicted by the retention policy while it waited
+            if sim_id:
+                self.hits += 1
+                return sim_id
+        self.misses += 1
+        return None
+
+    def start(self):
+        if settings.warm_pool_size > 0 and self._task is None:
+            self._task = asyncio.create_task(self._refill_loop())
+
+    def stop(self):
+        if self._task:
+            self._task.cancel()
+            self._task = None
+
+    def tokens_spent(self) -> int:
+        cutoff = time.monotonic() - TOKEN_WINDOW
+        while self._spent and self._spent[0][0] < cutoff:
+            self._spent.popleft()
+        return sum(tokens for _, tokens in self._spent)
+
+    def _next_preset(self) -> str | None:
+        preset_id = min(self._runs, key=lambda p: len(self._runs[p]))
+        return preset_id if len(self._runs[preset_id]) < settings.warm_pool_size else None
+
+    def _idle(self) -> bool:
+        stats = admission.stats()
+        return not any(stats["queued"].values()) and stats["running"] < stats["capacity"]
+
+    async def _refill_loop(self):
+        while True:
+            await asyncio.sleep(min(
+                settings.warm_pool_check_interval * 2 ** self.consecutive_failures, settings.warm_pool_max_backoff
+            ))
+            preset_id = self._next_preset()
+            if preset_id is None or not self._idle() or self.tokens_spent() >= settings.warm_pool_token_budget:
+                continue
+            try:
+                ok = await self._refill(preset_id)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                ok = False
+                logger.exception(f"Warm pool refill for {preset_id} failed")
+            if ok:
+                self.consecutive_failures = 0
+                continue
+            self.failed_refills += 1
+            self.consecutive_failures += 1
+            if self.consecutive_failures >= settings.warm_pool_max_failures:
+                self.disabled = True
+                self._task = None
+                logger.warning(f"Warm pool disabled after {self.consecutive_failures} failed refills in a row")
+                return
+
+    async def _refill(self, preset_id: str) -> bool:
+        """Compute one run for the preset; False if it did not complete."""
+        preset = PRESETS[preset_id]
+        ticket = admission.enqueue(Priority.BATCH)
+        try:
+            async for _ in admission.wait(ticket):
+                pass
+        except BaseException:
+            admission.release(ticket)
+            raise
+
+        meter = TokenMeter()
+        runner = SimulationRunner(preset.parameters, preset_id, preset.flavor_text)
+        # The run's tasks copy the context when created, so their LLM calls are charged to this meter
+        reset = token_meter.set(meter)
+        try:
+            sim_id = await simulation_manager.start(
+                runner, on_finish=lambda: admission.release(ticket), priority=Priority.BATCH
+            )
+        finally:
+            token_meter.reset(reset)
+
+        # The first events are published before anyone can subscribe; they are served immediately
+        delays = []
+        last = time.monotonic()
+        complete = False
+        async for event in simulation_manager.subscribe(sim_id):
+            now = time.monotonic()
+            delays.append(now - last)
+            last = now
+            complete = complete or event.event == "simulation_end"
+        self._spent.append((time.monotonic(), meter.total))
+        if not complete:
+            logger.warning(f"Warm pool refill for {preset_id} did not complete")
+            return False
+        self._runs[preset_id].append(PooledRun(sim_id, delays, meter.total))
+        self.refills += 1
+        logger.info(f"Warm pool: added {preset_id} run {sim_id} ({meter.total} tokens)")
+        return True
+
+    def stats(self) -> dict:
+        served = self.hits + self.misses
+        return {
+            "depth": {preset_id: len(runs) for preset_id, runs in self._runs.items()},
+            "target_depth": settings.warm_pool_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / served if served else None,
+            "refills": self.refills,
+            "failed_refills": self.failed_refills,
+            "disabled": self.disabled,
+            "tokens_last_hour": self.tokens_spent(),
+            "token_budget": settings.warm_pool_token_budget,
+        }
+
+
+warm_pool = WarmPool()
@@ -0,0 +1,208 @@
+import asyncio
+import json
+import logging
+import time
+import tracemalloc
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from pydantic import BaseModel
+
+from app.config import settings
+from app.models.agents import AgentAction
+from app.models.simulation import RoundResult, SimulationState
+from app.services.segments import append_gzip, read_gzip
+
+logger = logging.getLogger(__name__)
+
+# _format_history reads the last three rounds, so those must stay in memory
+MIN_HOT_ROUNDS = 3
+
+
+def _traced_size(obj: BaseModel) -> int | None:
+    """Bytes a model occupies, measured by rebuilding a copy under tracemalloc.
+
+    Rebuilding happens synchronously, so no other task's allocations are counted.
+    """
+    if not tracemalloc.is_tracing():
+        return None
+    data = obj.model_dump_json()
+    start = tracemalloc.get_traced_memory()[0]
+    clone = type(obj).model_validate_json(data)
+    size = tracemalloc.get_traced_memory()[0] - start
+    del clone
+    return size
+
+
+@dataclass
+class _Entry:
+    sim: SimulationState | None
+    created_at: float = field(default_factory=time.monotonic)
+    completed_at: float | None = None
+    event_bytes: int = 0
+    round_bytes: dict[int, int] = field(default_factory=dict)
+    traced_round_bytes: dict[int, int] = field(default_factory=dict)
+    spilled_rounds: int = 0
+
+    @property
+    def bytes(self) -> int:
+        return self.event_bytes + sum(self.round_bytes.values())
+
+
+def select_evictions(completed: list[tuple[float, str, int]], running_bytes: int, now: float) -> list[str]:
+    """Ids to evict from `(completed_at, sim_id, bytes)` of finished simulations, oldest first.
+
+    Simulations older than ``registry_max_age`` go first, then the oldest until
+    both ``registry_max_simulations`` and ``registry_max_bytes`` hold.
+    """
+    completed = sorted(completed)
+    evict = [sim_id for done, sim_id, _ in completed if now - done > settings.registry_max_age]
+    remaining = [(sim_id, nbytes) for done, sim_id, nbytes in completed if now - done <= settings.registry_max_age]
+    total = running_bytes + sum(nbytes for _, nbytes in remaining)
+    while remaining and (len(remaining) > settings.registry_max_simulations or total > settings.registry_max_bytes):
+        oldest, nbytes = remaining.pop(0)
+        total -= nbytes
+        evict.append(oldest)
+    if total > settings.registry_max_bytes:
+        logger.warning(f"Running simulations alone hold {total} bytes, above registry_max_bytes")
+    return evict
+
+
+class SimulationRegistry:
+    """Tracks every simulation this worker holds in memory and enforces the retention policy.
+
+    Running simulations keep only their most recent rounds in full; older rounds
+    have their actions appended to a gzip segment under ``registry_spill_dir``.
+    Completed simulations are evicted by age, count and total bytes.
+    """
+
+    def __init__(self, spill_dir: Path):
+        self.spill_dir = spill_dir
+        self._entries: dict[str, _Entry] = {}
+        self.evicted = 0
+        if settings.memory_tracing and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    def register(self, sim: SimulationState):
+        self._entries[sim.id] = _Entry(sim)
+
+    def record_event(self, sim_id: str, nbytes: int):
+        entry = self._entries.get(sim_id)
+        if entry:
+            entry.event_bytes += nbytes
+
+    async def record_round(self, sim: SimulationState) -> list[int]:
+        """Account for the latest round and spill rounds that fell out of the hot window; returns their numbers."""
+        entry = self._entries.get(sim.id)
+        if entry is None or not sim.rounds:
+            return []
+        latest = sim.rounds[-1]
+        entry.round_bytes[latest.round_number] = len(latest.model_dump_json())
+        traced = _traced_size(latest)
+        if traced is not None:
+            entry.traced_round_bytes[latest.round_number] = traced
+
+        hot = max(settings.registry_hot_rounds, MIN_HOT_ROUNDS)
+        spilled = []
+        for i, rnd in enumerate(sim.rounds[:-hot]):
+            if not rnd.spilled:
+                sim.rounds[i] = await self._spill(sim.id, rnd)
+                entry.round_bytes[rnd.round_number] = len(sim.rounds[i].model_dump_json())
+                entry.spilled_rounds += 1
+                spilled.append(rnd.round_number)
+        return spilled
+
+    def _segment_path(self, sim_id: str) -> Path:
+        return self.spill_dir / f"{sim_id}.ndjson.gz"
+
+    async def _spill(self, sim_id: str, rnd: RoundResult) -> RoundResult:
+        line = json.dumps({
+            "round_number": rnd.round_number,
+            "actions": [a.model_dump() for a in rnd.actions],
+        }, ensure_ascii=False)
+        await asyncio.to_thread(append_gzip, self._segment_path(sim_id), [line])
+        return rnd.model_copy(update={"actions": [], "spilled": True})
+
+    async def hydrate(self, sim: SimulationState) -> SimulationState:
+        """Return `sim` with the actions of spilled rounds read back from its segment."""
+        if not any(rnd.spilled for rnd in sim.rounds):
+            return sim
+        path = self._segment_path(sim.id)
+        lines = await asyncio.to_thread(read_gzip, path)
+        if lines is None:
+            logger.warning(f"Spill segment for simulation {sim.id} is missing")
+            return sim
+        spilled: dict[int, list[AgentAction]] = {}
+        for line in lines:
+            record = json.loads(line)
+            spilled[record["round_number"]] = [AgentAction(**a) for a in record["actions"]]
+        rounds = [
+            rnd.model_copy(update={"actions": spilled.get(rnd.round_number, []), "spilled": False})
+            if rnd.spilled else rnd
+            for rnd in sim.rounds
+        ]
+        return sim.model_copy(update={"rounds": rounds})
+
+    def complete(self, sim_id: str) -> list[str]:
+        """Mark a simulation finished and return the ids evicted by the retention policy."""
+        entry = self._entries.get(sim_id)
+        if entry:
+            entry.completed_at = time.monotonic()
+            entry.sim = None
+        return self.enforce()
+
+    def enforce(self) -> list[str]:
+        completed, running = [], 0
+        for sim_id, e in self._entries.items():
+            if e.completed_at is None:
+                running += e.bytes
+            else:
+                completed.append((e.completed_at, sim_id, e.bytes))
+        evict = select_evictions(completed, running, time.monotonic())
+        for sim_id in evict:
+            self._entries.pop(sim_id, None)
+        self.evicted += len(evict)
+        return evict
+
+    def delete_segment(self, sim_id: str):
+        self._segment_path(sim_id).unlink(missing_ok=True)
+
+    def stats(self) -> dict:
+        return {
+            "simulations": len(self._entries),
+            "running": sum(1 for e in self._entries.values() if e.completed_at is None),
+            "bytes": sum(e.bytes for e in self._entries.values()),
+            "spilled_rounds": sum(e.spilled_rounds for e in self._entries.values()),
+            "evicted": self.evicted,
+        }
+
+    def report(self) -> dict:
+        now = time.monotonic()
+        report = {
+            "global": self.stats(),
+            "limits": {
+                "max_simulations": settings.registry_max_simulations,
+                "max_bytes": settings.registry_max_bytes,
+                "max_age": settings.registry_max_age,
+            },
+            "simulations": {
+                sim_id: {
+                    "complete": e.completed_at is not None,
+                    "age": now - e.created_at,
+                    "bytes": e.bytes,
+                    "event_bytes": e.event_bytes,
+                    "round_bytes": e.round_bytes,
+                    "traced_round_bytes": e.traced_round_bytes or None,
+                    "spilled_rounds": e.spilled_rounds,
+                }
+                for sim_id, e in self._entries.items()
+            },
+        }
+        if tracemalloc.is_tracing():
+            current, peak = tracemalloc.get_traced_memory()
+            report["global"]["traced_current"] = current
+            report["global"]["traced_peak"] = peak
+        return report
+
+
+simulation_registry = SimulationRegistry(Path(settings.registry_spill_dir))
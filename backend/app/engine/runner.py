@@ -1,46 +1,99 @@
 import asyncio
 import logging
+import time
 import uuid
-from collections.abc import AsyncGenerator
+from collections.abc import AsyncGenerator, Awaitable, Callable, Collection
+from dataclasses import dataclass
 
-from app.agents.base import AgentRunner
+from app.agents.base import AgentRunner, PanelRunner, form_coalitions
 from app.agents.definitions import AGENTS
+from app.config import settings
+from app.engine.deadline import DeadlinePlanner
+from app.engine.scale import SectorScale
 from app.engine.settlement import (
     calculate_settlement_level,
     check_conflict_events,
     check_settlement,
     update_agent_state,
 )
+from app.engine.speculation import (
+    agent_inputs,
+    inputs_unchanged,
+    predict_marke,
+    settlement_is_imminent,
+    speculation_stats,
+)
 from app.models.agents import AgentAction, AgentState, AgentType
 from app.models.scenario import MacroParameters
 from app.models.simulation import (
+    Checkpoint,
     ConflictEvent,
     NegotiationPair,
     Phase,
     RoundResult,
+    SimulationOptions,
     SimulationState,
 )
 from app.services.llm import call_summary
+from app.services.loop_monitor import loop_monitor
 from app.agents.prompts import SUMMARY_PROMPT
 
 logger = logging.getLogger(__name__)
 
 
+# (phase, max_rounds, stall_round) in the order they are negotiated
+NEGOTIATION_PHASES = (
+    (Phase.INDUSTRIAVTALET, 6, 4),
+    (Phase.PRIVATE_SECTOR, 4, 3),
+    (Phase.PUBLIC_SECTOR, 4, 3),
+)
+
+
+@dataclass
+class _Speculation:
+    task: asyncio.Task
+    phase: Phase
+    predicted_marke: float
+    agent_ids: list[str]
+    inputs: dict[str, tuple[float | None, int]]
+
+
 class SimulationRunner:
-    def __init__(self, parameters: MacroParameters, preset_id: str | None = None, flavor_text: str = ""):
+    def __init__(
+        self,
+        parameters: MacroParameters,
+        preset_id: str | None = None,
+        flavor_text: str = "",
+        options: SimulationOptions | None = None,
+    ):
         self.sim = SimulationState(
             id=str(uuid.uuid4()),
             parameters=parameters,
             preset_id=preset_id,
         )
         self.flavor_text = flavor_text
+        self.options = options or SimulationOptions()
         self.runners: dict[str, AgentRunner] = {}
+        self._panels: dict[tuple[str, ...], PanelRunner] = {}
+        self._speculation: _Speculation | None = None
+        self.forked_from: Checkpoint | None = None
+        self.planner = DeadlinePlanner(self.options.deadline) if self.options.deadline else None
         self._init_agents()
         self._init_negotiation_pairs()
 
+    @classmethod
+    def resume(cls, checkpoint: Checkpoint) -> "SimulationRunner":
+        """Continue from a round-boundary checkpoint under a new id; completed rounds are not re-run."""
+        state = checkpoint.state
+        runner = cls(state.parameters, state.preset_id, checkpoint.flavor_text, checkpoint.options)
+        runner.sim = state.model_copy(update={"id": runner.sim.id})
+        runner.forked_from = checkpoint
+        return runner
+
     def _init_agents(self):
         for agent_id, identity in AGENTS.items():
             self.runners[agent_id] = AgentRunner(agent_id, self.sim.parameters, self.flavor_text)
+            self.runners[agent_id].reuse = self.options.approximate_reuse
             self.sim.agent_states[agent_id] = AgentState(agent_id=agent_id)
 
     def _init_negotiation_pairs(self):
@@ -64,45 +117,216 @@ class SimulationRunner:
         active.extend(aid for aid, a in AGENTS.items() if a.tier.value == 4)
         return active
 
-    def _format_positions(self, agent_ids: list[str]) -> str:
+    def _format_positions(self, agent_ids: list[str], sim: SimulationState | None = None) -> str:
+        sim = sim or self.sim
         lines = []
-        for aid in agent_ids:
-            agent = AGENTS[aid]
-            state = self.sim.agent_states[aid]
-            pos = f"{state.current_position}%" if state.current_position is not None else "not yet declared"
-            settled = " [SETTLED]" if state.is_settled else ""
-            lines.append(f"- {agent.name} ({agent.agent_type.value}): {pos}{settled}")
+        with loop_monitor.section("runner.format_positions"):
+            for aid in agent_ids:
+                agent = AGENTS[aid]
+                state = sim.agent_states[aid]
+                pos = f"{state.current_position}%" if state.current_position is not None else "not yet declared"
+                settled = " [SETTLED]" if state.is_settled else ""
+                lines.append(f"- {agent.name} ({agent.agent_type.value}): {pos}{settled}")
         return "\n".join(lines)
 
-    def _format_history(self, agent_id: str) -> str:
+    def _format_history(self, agent_ids: str | Collection[str], sim: SimulationState | None = None) -> str:
+        sim = sim or self.sim
+        own = {agent_ids} if isinstance(agent_ids, str) else set(agent_ids)
         lines = []
-        for rnd in self.sim.rounds[-3:]:
-            for action in rnd.actions:
-                if action.agent_id != agent_id:
-                    agent = AGENTS[action.agent_id]
-                    lines.append(f"Round {rnd.round_number}: {agent.name} — {action.public_statement}")
+        with loop_monitor.section("runner.format_history"):
+            for rnd in sim.rounds[-3:]:
+                for action in rnd.actions:
+                    if action.agent_id not in own:
+                        agent = AGENTS[action.agent_id]
+                        lines.append(f"Round {rnd.round_number}: {agent.name} — {action.public_statement}")
         return "\n".join(lines) if lines else "No history yet."
 
     def _check_phase_complete(self, phase: Phase) -> bool:
         pairs = [p for p in self.sim.negotiation_pairs if p.phase == phase]
         return all(p.is_settled for p in pairs)
 
+    async def _collect_actions(
+        self,
+        sim: SimulationState,
+        phase: Phase,
+        round_num: int,
+        active_agents: list[str],
+        special_context: str = "",
+    ) -> list[AgentAction]:
+        all_positions = self._format_positions(active_agents, sim)
+        if self.options.panel_mode:
+            return await self._collect_panel_actions(sim, phase, round_num, active_agents, all_positions, special_context)
+        tasks = []
+        for aid in active_agents:
+            history = self._format_history(aid, sim)
+            tasks.append(
+                self.runners[aid].get_negotiation_action(
+                    sim, round_num, phase, all_positions, history, special_context
+                )
+            )
+        return await asyncio.gather(*tasks)
+
+    async def _collect_panel_actions(
+        self,
+        sim: SimulationState,
+        phase: Phase,
+        round_num: int,
+        active_agents: list[str],
+        all_positions: str,
+        special_context: str,
+    ) -> list[AgentAction]:
+        pairs = [p for p in sim.negotiation_pairs if p.phase == phase]
+        tasks = []
+        for group in form_coalitions(active_agents, pairs):
+            history = self._format_history(group, sim)
+            if len(group) == 1:
+                tasks.append(self.runners[group[0]].get_negotiation_action(
+                    sim, round_num, phase, all_positions, history, special_context
+                ))
+                continue
+            key = tuple(group)
+            if key not in self._panels:
+                self._panels[key] = PanelRunner([self.runners[aid] for aid in group])
+            tasks.append(self._panels[key].get_negotiation_actions(
+                sim, round_num, phase, all_positions, history, special_context
+            ))
+        results = await asyncio.gather(*tasks)
+        # Keep the per-agent order of the non-panel path so events look the same
+        by_agent = {a.agent_id: a for result in results for a in (result if isinstance(result, list) else [result])}
+        return [by_agent[aid] for aid in active_agents]
+
+    async def _stream_actions(
+        self,
+        calls: dict[str, Callable[[Callable[[dict], None]], Awaitable[AgentAction]]],
+        round_num: int,
+        phase: Phase,
+        actions: list[AgentAction],
+    ) -> AsyncGenerator[dict, None]:
+        """Run streamed agent calls, yielding each agent's numbers as a provisional agent_action
+        and its text as agent_action_update. Fills `actions` in the order of `calls`."""
+        queue: asyncio.Queue = asyncio.Queue()
+
+        async def run(aid: str) -> AgentAction:
+            action = await calls[aid](lambda numbers: queue.put_nowait((aid, numbers)))
+            queue.put_nowait((aid, action))
+            return action
+
+        tasks = [asyncio.create_task(run(aid)) for aid in calls]
+        gathered = asyncio.gather(*tasks)
+        gathered.add_done_callback(lambda _: queue.put_nowait(None))
+        provisional = set()
+        try:
+            while (item := await queue.get()) is not None:
+                aid, result = item
+                state = self.sim.agent_states[aid]
+                if isinstance(result, dict):
+                    try:
+                        state.current_position = float(result["position"])
+                        state.willingness_to_settle = min(max(int(result["willingness_to_settle"]), 0), 100)
+                    except (TypeError, ValueError):
+                        continue
+                    provisional.add(aid)
+                    yield {
+                        "event": "agent_action",
+                        "data": {
+                            "agent_id": aid,
+                            "round_number": round_num,
+                            "phase": phase.value,
+                            "position": state.current_position,
+                            "willingness_to_settle": state.willingness_to_settle,
+                            "reasoning": "",
+                            "public_statement": "",
+                            "provisional": True,
+                        },
+                    }
+                else:
+                    update_agent_state(state, result)
+                    event = "agent_action_update" if aid in provisional else "agent_action"
+                    yield {"event": event, "data": result.model_dump()}
+            actions.extend(await gathered)
+        finally:
+            # A finished gather no longer cancels anything, so stop the sibling calls one by one
+            for task in tasks:
+                task.cancel()
+
+    def _maybe_speculate(self, phase: Phase):
+        """Start the first private-sector round early if märket is about to be set."""
+        if not self.options.speculative or phase != Phase.INDUSTRIAVTALET or self._speculation:
+            return
+        pair = next(p for p in self.sim.negotiation_pairs if p.phase == phase)
+        if pair.is_settled or not settlement_is_imminent(pair, self.sim.agent_states):
+            return
+
+        predicted = predict_marke(pair, self.sim.agent_states)
+        spec_sim = self.sim.model_copy(deep=True)
+        spec_sim.marke = predicted
+        spec_sim.current_phase = Phase.PRIVATE_SECTOR
+        agent_ids = [
+            aid for aid in self._get_active_agents(Phase.PRIVATE_SECTOR)
+            if not spec_sim.agent_states[aid].is_settled
+        ]
+        # Assume settlement in the next round, so the private sector starts the round after
+        task = asyncio.create_task(self._collect_actions(
+            spec_sim, Phase.PRIVATE_SECTOR, self.sim.current_round + 2, agent_ids
+        ))
+        self._speculation = _Speculation(
+            task, Phase.PRIVATE_SECTOR, predicted, agent_ids, agent_inputs(spec_sim.agent_states, agent_ids)
+        )
+        speculation_stats.launched += 1
+        logger.info(f"Speculating on märket {predicted}% for simulation {self.sim.id}")
+
+    def _resolve_speculation(self, phase: Phase, active_agents: list[str]) -> asyncio.Task | None:
+        """Return the speculative round's task if its prediction held, otherwise discard it."""
+        spec = self._speculation
+        if spec is None or spec.phase != phase:
+            return None
+        self._speculation = None
+        committed = (
+            self.sim.marke is not None
+            and abs(self.sim.marke - spec.predicted_marke) <= settings.speculation_tolerance
+            and spec.agent_ids == active_agents
+            and inputs_unchanged(spec.inputs, self.sim.agent_states)
+            and not (spec.task.done() and spec.task.exception())
+        )
+        speculation_stats.record(spec.predicted_marke, self.sim.marke, committed, len(spec.agent_ids))
+        if not committed:
+            spec.task.cancel()
+            return None
+        return spec.task
+
+    def _cancel_speculation(self):
+        if self._speculation:
+            self._speculation.task.cancel()
+            self._speculation = None
+
     async def run(self) -> AsyncGenerator[dict, None]:
-        async for event in self._run_opening():
-            yield event
-        async for event in self._run_negotiation_phase(Phase.INDUSTRIAVTALET, max_rounds=6, stall_round=4):
-            yield event
-        async for event in self._run_negotiation_phase(Phase.PRIVATE_SECTOR, max_rounds=4, stall_round=3):
-            yield event
-        async for event in self._run_negotiation_phase(Phase.PUBLIC_SECTOR, max_rounds=4, stall_round=3):
-            yield event
-        async for event in self._run_summary():
-            yield event
+        if self.planner:
+            # Time spent queued for admission does not count against the deadline
+            self.planner.started = time.monotonic()
+        try:
+            if self.sim.current_round == 0:
+                async for event in self._run_opening():
+                    yield event
+            for phase, max_rounds, stall_round in NEGOTIATION_PHASES:
+                # A resumed simulation skips the phases its checkpoint had already finished
+                if phase < self.sim.current_phase:
+                    continue
+                async for event in self._run_negotiation_phase(phase, max_rounds, stall_round):
+                    yield event
+            if self.options.local_agreements:
+                async for event in self._run_local_agreements():
+                    yield event
+            async for event in self._run_summary():
+                yield event
+        finally:
+            self._cancel_speculation()
 
     async def _run_opening(self) -> AsyncGenerator[dict, None]:
         self.sim.current_phase = Phase.OPENING
         self.sim.current_round += 1
         round_num = self.sim.current_round
+        if self.planner:
+            self.planner.round_started()
 
         yield {
             "event": "round_start",
@@ -114,12 +338,18 @@ class SimulationRunner:
             },
         }
 
-        tasks = [self.runners[aid].get_opening_action(round_num) for aid in AGENTS]
-        actions: list[AgentAction] = await asyncio.gather(*tasks)
+        if self.options.streaming:
+            actions: list[AgentAction] = []
+            calls = {aid: lambda on_numbers, aid=aid: self.runners[aid].get_opening_action(round_num, on_numbers) for aid in AGENTS}
+            async for event in self._stream_actions(calls, round_num, Phase.OPENING, actions):
+                yield event
+        else:
+            tasks = [self.runners[aid].get_opening_action(round_num) for aid in AGENTS]
+            actions = await asyncio.gather(*tasks)
 
-        for action in actions:
-            update_agent_state(self.sim.agent_states[action.agent_id], action)
-            yield {"event": "agent_action", "data": action.model_dump()}
+            for action in actions:
+                update_agent_state(self.sim.agent_states[action.agent_id], action)
+                yield {"event": "agent_action", "data": action.model_dump()}
 
         round_result = RoundResult(
             round_number=round_num,
@@ -132,6 +362,8 @@ class SimulationRunner:
             "event": "round_end",
             "data": {"round_number": round_num, "summary": "All parties have declared their opening positions."},
         }
+        if self.planner:
+            self.planner.round_finished(fast=False)
 
     async def _run_negotiation_phase(
         self, phase: Phase, max_rounds: int, stall_round: int
@@ -143,7 +375,22 @@ class SimulationRunner:
             Phase.PUBLIC_SECTOR: "Offentlig sektor",
         }
 
-        for r in range(max_rounds):
+        completed = sum(1 for rnd in self.sim.rounds if rnd.phase == phase)
+        if completed and self._check_phase_complete(phase):
+            return
+        fast = False
+        for r in range(completed, max_rounds):
+            if self.planner:
+                later = [m for p, m, _ in NEGOTIATION_PHASES if p > phase]
+                plan = self.planner.plan(phase, r, max_rounds, stall_round, later)
+                if r >= plan.max_rounds:
+                    logger.info(f"Simulation {self.sim.id}: ending {phase.name} after {r} rounds to meet its deadline")
+                    break
+                stall_round = plan.stall_round
+                fast = plan.fast
+                for runner in self.runners.values():
+                    runner.fast = fast
+                self.planner.round_started()
             self.sim.current_round += 1
             round_num = self.sim.current_round
 
@@ -156,6 +403,8 @@ class SimulationRunner:
             if not active_agents:
                 break
 
+            speculative = self._resolve_speculation(phase, active_agents)
+
             yield {
                 "event": "round_start",
                 "data": {
@@ -163,10 +412,10 @@ class SimulationRunner:
                     "phase": phase.value,
                     "phase_name": phase_names.get(phase, ""),
                     "active_agents": active_agents,
+                    "speculative": speculative is not None,
                 },
             }
 
-            all_positions = self._format_positions(active_agents)
             special_context = ""
             if r >= stall_round:
                 special_context = (
@@ -174,20 +423,34 @@ class SimulationRunner:
                     "Pressure to settle is mounting from all sides."
                 )
 
-            tasks = []
-            for aid in active_agents:
-                history = self._format_history(aid)
-                tasks.append(
-                    self.runners[aid].get_negotiation_action(
-                        self.sim, round_num, phase, all_positions, history, special_context
+            streamed = speculative is None and self.options.streaming and not self.options.panel_mode
+            if streamed:
+                actions: list[AgentAction] = []
+                all_positions = self._format_positions(active_agents)
+                calls = {
+                    aid: lambda on_numbers, aid=aid, history=self._format_history(aid): (
+                        self.runners[aid].get_negotiation_action(
+                            self.sim, round_num, phase, all_positions, history, special_context, on_numbers
+                        )
                     )
+                    for aid in active_agents
+                }
+                async for event in self._stream_actions(calls, round_num, phase, actions):
+                    yield event
+            elif speculative is not None:
+                actions = [
+                    a.model_copy(update={"round_number": round_num}) for a in await speculative
+                ]
+            else:
+                actions = await self._collect_actions(
+                    self.sim, phase, round_num, active_agents, special_context
                 )
-            actions: list[AgentAction] = await asyncio.gather(*tasks)
 
             conflict_events = []
-            for action in actions:
-                update_agent_state(self.sim.agent_states[action.agent_id], action)
-                yield {"event": "agent_action", "data": action.model_dump()}
+            if not streamed:
+                for action in actions:
+                    update_agent_state(self.sim.agent_states[action.agent_id], action)
+                    yield {"event": "agent_action", "data": action.model_dump()}
 
             negotiating_ids = [
                 aid for aid in active_agents
@@ -238,15 +501,19 @@ class SimulationRunner:
                 "event": "round_end",
                 "data": {"round_number": round_num, "summary": f"Round {round_num} complete."},
             }
+            if self.planner:
+                self.planner.round_finished(fast)
 
             if self._check_phase_complete(phase):
                 break
+            self._maybe_speculate(phase)
 
         # Force settlement for remaining unsettled pairs
         for pair in self.sim.negotiation_pairs:
             if pair.phase == phase and not pair.is_settled:
                 level = calculate_settlement_level(pair, self.sim.agent_states)
                 pair.is_settled = True
+                pair.mediated = True
                 pair.settlement_level = round(level, 1)
                 pair.settlement_round = self.sim.current_round
                 for uid in pair.union_ids:
@@ -266,6 +533,20 @@ class SimulationRunner:
                     },
                 }
 
+    async def _run_local_agreements(self) -> AsyncGenerator[dict, None]:
+        scale = SectorScale(self.sim, self.options.local_agreements)
+        async for stats in scale.run():
+            self.sim.sector_stats = stats
+            yield {
+                "event": "local_agreements",
+                "data": {
+                    "done": scale.done,
+                    "total": scale.count,
+                    "llm_calls": scale.llm_calls,
+                    "sectors": [s.model_dump() for s in stats],
+                },
+            }
+
     async def _run_summary(self) -> AsyncGenerator[dict, None]:
         self.sim.current_phase = Phase.SUMMARY
         self.sim.is_complete = True
@@ -275,6 +556,11 @@ class SimulationRunner:
             union_names = ", ".join(AGENTS[uid].name for uid in pair.union_ids)
             emp_name = AGENTS[pair.employer_id].name
             outcomes.append(f"- {union_names} vs {emp_name}: settled at {pair.settlement_level}% (round {pair.settlement_round})")
+        for stats in self.sim.sector_stats:
+            outcomes.append(
+                f"- Local agreements ({stats.sector}): {stats.agreements} settled, mean {stats.mean_level}%, "
+                f"median drift {stats.drift['p50']:+}pp"
+            )
 
         events_text = []
         for rnd in self.sim.rounds:
@@ -305,5 +591,6 @@ class SimulationRunner:
                     for p in self.sim.negotiation_pairs
                 ],
                 "marke": self.sim.marke,
+                "timing": self.planner.report() if self.planner else None,
             },
         }
@@ -0,0 +1,164 @@
+"""Sector scale mode: many synthetic local agreements under the central ones.
+
+Each negotiated pair anchors a stream of local agreements between one of its
+unions and its employer side, with parties' behaviour derived from their
+`AgentIdentity`. Agreements are generated lazily and negotiated in chunks by
+the heuristic policy; a small sample opens with an LLM-drafted union demand.
+Only mergeable aggregates are kept, so memory is bounded regardless of count.
+"""
+import asyncio
+import logging
+import math
+import random
+from collections.abc import AsyncIterator, Iterator
+from dataclasses import dataclass, field
+
+from app.agents.definitions import AGENTS
+from app.agents.heuristic import market_drift, negotiate, opening_position
+from app.agents.prompts import LOCAL_AGREEMENT_PROMPT
+from app.agents.registry import SYSTEM_PROMPTS
+from app.config import settings
+from app.engine.analytics import QuantileSketch
+from app.models.simulation import NegotiationPair, SectorStats, SimulationState
+from app.services.llm import call_agent
+from app.services.llm_scheduler import OBSERVER
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True, slots=True)
+class LocalAgreement:
+    workplace: int
+    union_id: str
+    employer_id: str
+    sector: str
+    anchor: float
+    employees: int
+
+
+def local_agreements(sim: SimulationState, count: int, rng: random.Random) -> Iterator[LocalAgreement]:
+    """Spread `count` agreements evenly over the settled pairs, anchored on each pair's level."""
+    parents = [p for p in sim.negotiation_pairs if p.is_settled and p.settlement_level is not None]
+    for i in range(count if parents else 0):
+        pair: NegotiationPair = parents[i % len(parents)]
+        yield LocalAgreement(
+            workplace=i + 1,
+            union_id=rng.choice(pair.union_ids),
+            employer_id=pair.employer_id,
+            sector=pair.phase.name.lower(),
+            anchor=pair.settlement_level,
+            employees=max(5, int(rng.lognormvariate(3.5, 1.2))),
+        )
+
+
+@dataclass
+class _SectorAggregate:
+    level: QuantileSketch = field(default_factory=QuantileSketch)
+    drift: QuantileSketch = field(default_factory=QuantileSketch)
+    employees: int = 0
+    weighted_level: float = 0.0
+    mediated: int = 0
+    llm_sampled: int = 0
+
+    def add(self, agreement: LocalAgreement, level: float, mediated: bool, sampled: bool):
+        self.level.add(level)
+        self.drift.add(level - agreement.anchor)
+        self.employees += agreement.employees
+        self.weighted_level += level * agreement.employees
+        self.mediated += mediated
+        self.llm_sampled += sampled
+
+    def stats(self, sector: str) -> SectorStats:
+        return SectorStats(
+            sector=sector,
+            agreements=self.level.count,
+            employees=self.employees,
+            mean_level=round(self.weighted_level / self.employees, 3) if self.employees else None,
+            level=self.level.as_dict(),
+            drift=self.drift.as_dict(),
+            mediated=self.mediated,
+            llm_sampled=self.llm_sampled,
+        )
+
+
+class SectorScale:
+    def __init__(self, sim: SimulationState, count: int):
+        self.sim = sim
+        self.count = count
+        self.rng = random.Random(sim.id)
+        self.drift = market_drift(sim.parameters)
+        self.sectors: dict[str, _SectorAggregate] = {}
+        self.done = 0
+        self.llm_calls = 0
+        self._semaphore = asyncio.Semaphore(settings.scale_llm_concurrency)
+        # Sample rate and cap together bound the LLM cost of a run
+        self._llm_budget = min(settings.scale_max_llm_calls, math.ceil(count * settings.scale_llm_sample_rate))
+
+    async def run(self) -> AsyncIterator[list[SectorStats]]:
+        """Negotiate every agreement, yielding the running aggregates after each chunk."""
+        chunk: list[LocalAgreement] = []
+        for agreement in local_agreements(self.sim, self.count, self.rng):
+            chunk.append(agreement)
+            if len(chunk) == settings.scale_chunk_size:
+                await self._negotiate_chunk(chunk)
+                chunk = []
+                yield self.stats()
+        if chunk:
+            await self._negotiate_chunk(chunk)
+            yield self.stats()
+
+    async def _negotiate_chunk(self, chunk: list[LocalAgreement]):
+        sampled = {}
+        remaining = self._llm_budget - self.llm_calls
+        if remaining > 0:
+            picks = [a for a in chunk if self.rng.random() < settings.scale_llm_sample_rate][:remaining]
+            self.llm_calls += len(picks)
+            demands = await asyncio.gather(*(self._llm_demand(a) for a in picks))
+            sampled = {a.workplace: d for a, d in zip(picks, demands) if d is not None}
+        for agreement in chunk:
+            union, employer = AGENTS[agreement.union_id], AGENTS[agreement.employer_id]
+            union_position = sampled.get(agreement.workplace)
+            if union_position is None:
+                union_position = opening_position(union, agreement.anchor, self.drift, self.rng)
+            employer_position = opening_position(employer, agreement.anchor, self.drift, self.rng)
+            outcome = negotiate(union, employer, union_position, employer_position, settings.scale_max_rounds)
+            aggregate = self.sectors.setdefault(agreement.sector, _SectorAggregate())
+            aggregate.add(agreement, outcome.level, outcome.mediated, agreement.workplace in sampled)
+        self.done += len(chunk)
+        # Heuristic chunks are pure CPU; give the loop back between them
+        await asyncio.sleep(0)
+
+    async def _llm_demand(self, agreement: LocalAgreement) -> float | None:
+        prompt = LOCAL_AGREEMENT_PROMPT.format(
+            workplace=agreement.workplace,
+            employees=agreement.employees,
+            employer=AGENTS[agreement.employer_id].name,
+            anchor=agreement.anchor,
+            marke=self.sim.marke,
+            inflation=self.sim.parameters.inflation,
+            unemployment=self.sim.parameters.unemployment,
+            gdp_growth=self.sim.parameters.gdp_growth,
+        )
+        async with self._semaphore:
+            try:
+                # Local agreements follow the central ones and gate nothing
+                result = await call_agent(SYSTEM_PROMPTS[agreement.union_id], prompt, critical_class=OBSERVER)
+            except Exception as e:
+                logger.warning(f"Local agreement LLM call failed, using heuristic: {type(e).__name__}")
+                return None
+        try:
+            position = float(result.get("position"))
+        except (TypeError, ValueError):
+            return None
+        return position if position > 0 else None
+
+    def stats(self) -> list[SectorStats]:
+        total = _SectorAggregate()
+        for aggregate in self.sectors.values():
+            total.level.merge(aggregate.level)
+            total.drift.merge(aggregate.drift)
+            total.employees += aggregate.employees
+            total.weighted_level += aggregate.weighted_level
+            total.mediated += aggregate.mediated
+            total.llm_sampled += aggregate.llm_sampled
+        return [aggregate.stats(sector) for sector, aggregate in self.sectors.items()] + [total.stats("all")]
@@ -0,0 +1,81 @@
+from dataclasses import dataclass
+
+from app.config import settings
+from app.engine.settlement import calculate_settlement_level
+from app.models.agents import AgentState
+from app.models.simulation import NegotiationPair
+
+
+def settlement_is_imminent(
+    pair: NegotiationPair,
+    agent_states: dict[str, AgentState],
+) -> bool:
+    """Check if a pair is close enough to settling that its level can be predicted."""
+    ids = [*pair.union_ids, pair.employer_id]
+    if any(agent_states[aid].current_position is None for aid in ids):
+        return False
+    if any(agent_states[aid].willingness_to_settle < settings.speculation_min_willingness for aid in ids):
+        return False
+    positions = [agent_states[aid].current_position for aid in ids]
+    return max(positions) - min(positions) <= settings.speculation_max_spread
+
+
+def agent_inputs(agent_states: dict[str, AgentState], agent_ids: list[str]) -> dict[str, tuple[float | None, int]]:
+    """The position and willingness of each agent that a speculative round was computed from."""
+    return {aid: (agent_states[aid].current_position, agent_states[aid].willingness_to_settle) for aid in agent_ids}
+
+
+def inputs_unchanged(
+    inputs: dict[str, tuple[float | None, int]], agent_states: dict[str, AgentState]
+) -> bool:
+    """Whether every agent is still where it was when the speculation started, within tolerance.
+
+    Agents that also negotiate in the settling phase move in its last round.
+    """
+    for aid, (position, willingness) in inputs.items():
+        state = agent_states[aid]
+        if (position is None) != (state.current_position is None):
+            return False
+        if position is not None and abs(state.current_position - position) > settings.speculation_position_tolerance:
+            return False
+        if abs(state.willingness_to_settle - willingness) > settings.speculation_willingness_tolerance:
+            return False
+    return True
+
+
+def predict_marke(pair: NegotiationPair, agent_states: dict[str, AgentState]) -> float:
+    return round(calculate_settlement_level(pair, agent_states), 1)
+
+
+@dataclass
+class SpeculationStats:
+    launched: int = 0
+    committed: int = 0
+    discarded: int = 0
+    wasted_calls: int = 0
+    total_abs_error: float = 0.0
+    resolved: int = 0
+
+    def record(self, predicted: float, actual: float | None, committed: bool, calls: int):
+        if committed:
+            self.committed += 1
+        else:
+            self.discarded += 1
+            self.wasted_calls += calls
+        if actual is not None:
+            self.resolved += 1
+            self.total_abs_error += abs(actual - predicted)
+
+    def as_dict(self) -> dict:
+        finished = self.committed + self.discarded
+        return {
+            "launched": self.launched,
+            "committed": self.committed,
+            "discarded": self.discarded,
+            "wasted_calls": self.wasted_calls,
+            "hit_rate": self.committed / finished if finished else None,
+            "mean_abs_error": self.total_abs_error / self.resolved if self.resolved else None,
+        }
+
+
+speculation_stats = SpeculationStats()
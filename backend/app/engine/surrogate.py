@@ -0,0 +1,182 @@
+"""Instant märket preview from a ridge regression trained on completed runs.
+
+The model fits the residual between each outcome and a simple prior
+(previous märket nudged by the inflation gap), so it gives a sensible answer
+before any simulation has completed and converges to the data as runs accumulate.
+Training keeps only sufficient statistics (XᵀX, Xᵀy, yᵀy) per target, over the
+runs where that target settled, so each completed run is an O(d²) update plus
+an O(d³) solve over ~15 features.
+"""
+import asyncio
+import json
+import logging
+import math
+import threading
+from pathlib import Path
+
+from app.config import settings
+from app.engine.analytics import pair_key
+from app.models.scenario import ExportPressure, MacroParameters
+from app.models.simulation import SimulationState
+from app.scenarios.presets import PRESETS
+
+logger = logging.getLogger(__name__)
+
+MARKE = "marke"
+PRESET_IDS = tuple(PRESETS)
+# Pseudo-observations backing the prior's variance until real residuals dominate
+PRIOR_WEIGHT = 5
+PRIOR_SIGMA = 1.0
+Z_90 = 1.645
+
+
+def features(parameters: MacroParameters, preset_id: str | None) -> list[float]:
+    return [
+        1.0,
+        parameters.inflation,
+        parameters.unemployment,
+        parameters.gdp_growth,
+        parameters.policy_rate,
+        float(parameters.political_climate),
+        parameters.previous_agreement,
+        float(parameters.export_pressure == ExportPressure.LOW),
+        float(parameters.export_pressure == ExportPressure.HIGH),
+        *(float(preset_id == p) for p in PRESET_IDS),
+    ]
+
+
+def prior(parameters: MacroParameters) -> float:
+    return max(parameters.previous_agreement + 0.35 * (parameters.inflation - 2.0), 0.0)
+
+
+def _solve(a: list[list[float]], b: list[float]) -> list[float]:
+    """Gaussian elimination with partial pivoting; `a` is small and symmetric positive definite."""
+    n = len(b)
+    m = [row[:] + [b[i]] for i, row in enumerate(a)]
+    for col in range(n):
+        pivot = max(range(col, n), key=lambda r: abs(m[r][col]))
+        m[col], m[pivot] = m[pivot], m[col]
+        for r in range(col + 1, n):
+            factor = m[r][col] / m[col][col]
+            for c in range(col, n + 1):
+                m[r][c] -= factor * m[col][c]
+    x = [0.0] * n
+    for r in range(n - 1, -1, -1):
+        x[r] = (m[r][n] - sum(m[r][c] * x[c] for c in range(r + 1, n))) / m[r][r]
+    return x
+
+
+class _Target:
+    def __init__(self, dim: int):
+        self.n = 0
+        self.xtx = [[0.0] * dim for _ in range(dim)]
+        self.xty = [0.0] * dim
+        self.yty = 0.0
+        self.weights = [0.0] * dim
+        self.sigma = PRIOR_SIGMA
+
+
+class Surrogate:
+    """Training and file IO run in worker threads, serialized by a lock; `predict` reads the latest fit."""
+
+    def __init__(self, data_path: Path | None):
+        self.data_path = data_path
+        self.dim = len(features(MacroParameters(), None))
+        self._targets: dict[str, _Target] = {}
+        self._lock = threading.Lock()
+
+    async def load(self):
+        """Train on the runs recorded in the data file; called once at startup."""
+        if self.data_path and self.data_path.exists():
+            await asyncio.to_thread(self._load)
+
+    def _load(self):
+        with self._lock, open(self.data_path, encoding="utf-8") as f:
+            for line in f:
+                record = json.loads(line)
+                self._update(MacroParameters(**record["parameters"]), record["preset_id"], record["outcomes"])
+            self._fit()
+        logger.info(f"Surrogate loaded {self.samples} runs from {self.data_path}")
+
+    @property
+    def samples(self) -> int:
+        target = self._targets.get(MARKE)
+        return target.n if target else 0
+
+    async def observe(self, sim: SimulationState):
+        outcomes = {pair_key(p): p.settlement_level for p in sim.negotiation_pairs if p.settlement_level is not None}
+        if sim.marke is not None:
+            outcomes[MARKE] = sim.marke
+        await asyncio.to_thread(self._observe, sim.parameters, sim.preset_id, outcomes)
+
+    def _observe(self, parameters: MacroParameters, preset_id: str | None, outcomes: dict[str, float]):
+        with self._lock:
+            self._update(parameters, preset_id, outcomes)
+            self._fit()
+            if self.data_path:
+                self.data_path.parent.mkdir(parents=True, exist_ok=True)
+                with open(self.data_path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps({
+                        "preset_id": preset_id,
+                        "parameters": parameters.model_dump(mode="json"),
+                        "outcomes": outcomes,
+                    }) + "\n")
+
+    def _update(self, parameters: MacroParameters, preset_id: str | None, outcomes: dict[str, float]):
+        x = features(parameters, preset_id)
+        base = prior(parameters)
+        for name, value in outcomes.items():
+            target = self._targets.setdefault(name, _Target(self.dim))
+            residual = value - base
+            target.n += 1
+            target.yty += residual * residual
+            for i in range(self.dim):
+                target.xty[i] += x[i] * residual
+                for j in range(self.dim):
+                    target.xtx[i][j] += x[i] * x[j]
+
+    def _fit(self):
+        for target in self._targets.values():
+            # Ridge penalty on everything but the intercept
+            a = [row[:] for row in target.xtx]
+            for i in range(1, self.dim):
+                a[i][i] += settings.surrogate_ridge
+            a[0][0] += 1e-6
+            w = _solve(a, target.xty)
+            # Residual sum of squares from sufficient statistics: yᵀy − 2wᵀXᵀy + wᵀXᵀXw
+            xtx_w = [sum(target.xtx[i][j] * w[j] for j in range(self.dim)) for i in range(self.dim)]
+            sse = target.yty - 2 * sum(wi * b for wi, b in zip(w, target.xty)) + sum(wi * v for wi, v in zip(w, xtx_w))
+            target.weights = w
+            target.sigma = math.sqrt(
+                (max(sse, 0.0) + PRIOR_WEIGHT * PRIOR_SIGMA**2) / (target.n + PRIOR_WEIGHT)
+            )
+
+    def _estimate(self, name: str, x: list[float], base: float) -> dict:
+        target = self._targets.get(name)
+        # Too few runs to trust the fit: a single run would otherwise be absorbed by the free intercept
+        if target and target.n < settings.surrogate_min_samples:
+            target = None
+        mean = base + (sum(w * v for w, v in zip(target.weights, x)) if target else 0.0)
+        sigma = target.sigma if target else PRIOR_SIGMA
+        return {
+            "mean": round(mean, 2),
+            "low": round(mean - Z_90 * sigma, 2),
+            "high": round(mean + Z_90 * sigma, 2),
+        }
+
+    def predict(self, parameters: MacroParameters, preset_id: str | None = None) -> dict:
+        x = features(parameters, preset_id)
+        base = prior(parameters)
+        fitted = self.samples >= settings.surrogate_min_samples
+        return {
+            "marke": self._estimate(MARKE, x, base),
+            "settlements": {
+                # Copied first: training may add a target from its thread while this runs
+                name: self._estimate(name, x, base) for name in list(self._targets) if name != MARKE
+            },
+            "samples": self.samples,
+            "source": "model" if fitted else "prior",
+        }
+
+
+surrogate = Surrogate(Path(settings.data_dir, settings.surrogate_data_path) if settings.surrogate_data_path else None)
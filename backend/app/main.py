@@ -1,13 +1,51 @@
+from app.startup import startup_profiler
+
+startup_profiler.install()
+
+import asyncio
+from contextlib import asynccontextmanager
 from pathlib import Path
 
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse
-from fastapi.staticfiles import StaticFiles
 
+from app.api.frontend import StaticIndex
 from app.config import settings
+from app.engine.manager import simulation_manager
+from app.engine.pool import warm_pool
+from app.engine.surrogate import surrogate
+from app.services.llm import llm_pool
+from app.services.loop_monitor import loop_monitor
+
+
+async def _warm_up():
+    """Load the LLM SDK in a worker thread and open connections once the server is answering /health.
+
+    FastAPI, the engine and the API routes are still imported with this module;
+    only the SDK and connection setup are deferred.
+    """
+    with startup_profiler.step("llm_pool.start"):
+        await llm_pool.start()
+    startup_profiler.report()
 
-app = FastAPI(title="Avtalsrörelsen Simulator")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    loop_monitor.start()
+    await surrogate.load()
+    warm_up = asyncio.create_task(_warm_up())
+    warm_pool.start()
+    yield
+    warm_pool.stop()
+    warm_up.cancel()
+    loop_monitor.stop()
+    # Let in-flight calls finish before their runs are cancelled; runs fail fast on their next call
+    await llm_pool.drain()
+    await simulation_manager.shutdown()
+    await llm_pool.close()
+
+
+app = FastAPI(title="Avtalsrörelsen Simulator", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -18,7 +56,8 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-from app.api.routes import router
+with startup_profiler.step("import app.api.routes"):
+    from app.api.routes import router
 
 app.include_router(router)
 
@@ -32,15 +71,10 @@ async def health():
 # The build script copies frontend/dist/ to backend/static/
 static_dir = Path(__file__).parent.parent / "static"
 if static_dir.exists():
-    # Mount /assets first so static files are served directly
-    assets_dir = static_dir / "assets"
-    if assets_dir.exists():
-        app.mount("/assets", StaticFiles(directory=assets_dir), name="assets")
-
-    # Catch-all: serve index.html for SPA routing (must be last)
-    @app.get("/{full_path:path}")
-    async def serve_frontend(full_path: str):
-        file_path = static_dir / full_path
-        if file_path.is_file():
-            return FileResponse(file_path)
-        return FileResponse(static_dir / "index.html")
+    with startup_profiler.step("index static files"):
+        static_index = StaticIndex(static_dir)
+
+    # Catch-all: static files, falling back to index.html for SPA routing (must be last)
+    @app.get("/{full_path:path}", include_in_schema=False)
+    async def serve_frontend(full_path: str, request: Request):
+        return static_index.response(request, full_path)
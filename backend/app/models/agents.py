@@ -23,14 +23,16 @@ class Relationship(str, Enum):
 
 
 class AgentIdentity(BaseModel):
+    model_config = {"frozen": True}
+
     id: str
     name: str
     short_name: str
     agent_type: AgentType
     tier: AgentTier
     role_description: str
-    priorities: list[str]
-    constraints: list[str]
+    priorities: tuple[str, ...]
+    constraints: tuple[str, ...]
     relationships: dict[str, Relationship] = {}
 
 
@@ -44,6 +46,11 @@ class AgentState(BaseModel):
     settlement_level: float | None = None
 
 
+class AgentOverride(BaseModel):
+    position: float | None = None
+    willingness_to_settle: int | None = Field(None, ge=0, le=100)
+
+
 class AgentAction(BaseModel):
     agent_id: str
     round_number: int
@@ -52,3 +59,4 @@ class AgentAction(BaseModel):
     reasoning: str
     public_statement: str
     willingness_to_settle: int = Field(ge=0, le=100)
+    reused: bool = Field(False, description="Taken from a near-identical earlier scenario instead of the LLM")
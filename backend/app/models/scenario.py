@@ -19,6 +19,8 @@ class MacroParameters(BaseModel):
 
 
 class ScenarioPreset(BaseModel):
+    model_config = {"frozen": True}
+
     id: str
     name: str
     description: str
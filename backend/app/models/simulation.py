@@ -13,6 +13,16 @@ class Phase(int, Enum):
     SUMMARY = 5
 
 
+class Priority(str, Enum):
+    INTERACTIVE = "interactive"
+    BATCH = "batch"
+
+
+class Framing(str, Enum):
+    EVENT = "event"
+    ROUND = "round"
+
+
 class NegotiationPair(BaseModel):
     union_ids: list[str]
     employer_id: str
@@ -20,6 +30,7 @@ class NegotiationPair(BaseModel):
     is_settled: bool = False
     settlement_level: float | None = None
     settlement_round: int | None = None
+    mediated: bool = False
 
 
 class ConflictEvent(BaseModel):
@@ -36,6 +47,33 @@ class RoundResult(BaseModel):
     settlements: list[NegotiationPair] = []
     conflict_events: list[ConflictEvent] = []
     summary: str = ""
+    spilled: bool = Field(False, description="Actions were moved to an on-disk segment")
+
+
+class SimulationOptions(BaseModel):
+    speculative: bool = Field(False, description="Start the private sector on a predicted märket")
+    panel_mode: bool = Field(False, description="One LLM call per coalition instead of per agent")
+    streaming: bool = Field(
+        False, description="Emit each agent's numbers as a provisional agent_action before its text arrives"
+    )
+    deadline: float | None = Field(
+        None, gt=0, le=3600, description="Target run time in seconds; rounds, model and verbosity adapt to meet it"
+    )
+    local_agreements: int = Field(0, ge=0, le=100_000, description="Synthetic local agreements to negotiate after the central ones")
+    approximate_reuse: bool = Field(
+        False, description="Reuse agent actions from earlier runs with parameters within the reuse tolerances"
+    )
+
+
+class SectorStats(BaseModel):
+    sector: str
+    agreements: int
+    employees: int
+    mean_level: float | None = Field(description="Employee-weighted mean settlement %")
+    level: dict
+    drift: dict = Field(description="Settlement minus the central agreement it follows, in percentage points")
+    mediated: int
+    llm_sampled: int
 
 
 class SimulationState(BaseModel):
@@ -48,5 +86,16 @@ class SimulationState(BaseModel):
     rounds: list[RoundResult] = []
     negotiation_pairs: list[NegotiationPair] = []
     marke: float | None = None
+    sector_stats: list[SectorStats] = []
     is_complete: bool = False
     final_summary: str = ""
+
+
+class Checkpoint(BaseModel):
+    """A simulation at a round boundary, with the inputs needed to continue it."""
+    simulation_id: str
+    round_number: int
+    seq: int = Field(description="Last event published for the round")
+    flavor_text: str = ""
+    options: SimulationOptions
+    state: SimulationState = Field(description="Round history is omitted; it is restored from the saved state")
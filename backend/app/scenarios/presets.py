@@ -1,6 +1,9 @@
+from collections.abc import Mapping
+from types import MappingProxyType
+
 from app.models.scenario import ExportPressure, MacroParameters, ScenarioPreset
 
-PRESETS: dict[str, ScenarioPreset] = {
+PRESETS: Mapping[str, ScenarioPreset] = MappingProxyType({
     "stabil_tillvaxt": ScenarioPreset(
         id="stabil_tillvaxt",
         name="Stabil tillväxt (2017)",
@@ -99,4 +102,4 @@ PRESETS: dict[str, ScenarioPreset] = {
             political_climate=3, export_pressure=ExportPressure.LOW, previous_agreement=2.0,
         ),
     ),
-}
+})
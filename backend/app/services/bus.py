@@ -0,0 +1,432 @@
+"""Event bus and state backend for simulation output.
+
+A simulation's events are an append-only log keyed by simulation id, so any
+subscriber — on any worker, when the backend is shared — can replay it from
+the start or resume after a given sequence number.
+
+- ``memory``: in-process only. Also the stand-in to use in tests.
+- ``sqlite``: a WAL-mode database file shared by all workers on the host.
+"""
+import asyncio
+import json
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections.abc import AsyncIterator
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from app.config import settings
+from app.services.segments import append_gzip, read_gzip
+
+
+@dataclass(frozen=True)
+class BusEvent:
+    seq: int
+    event: str
+    data: str  # JSON, encoded once at publish time
+
+
+class EventBus(ABC):
+    # Whether event logs live in this process's memory (and so count against its budget)
+    in_memory: bool = False
+
+    @abstractmethod
+    async def open(self, sim_id: str) -> None: ...
+
+    @abstractmethod
+    async def publish(self, sim_id: str, event: str, data: dict) -> BusEvent: ...
+
+    @abstractmethod
+    async def complete(self, sim_id: str) -> None: ...
+
+    @abstractmethod
+    async def exists(self, sim_id: str) -> bool: ...
+
+    @abstractmethod
+    async def drop(self, sim_id: str) -> None: ...
+
+    @abstractmethod
+    def subscribe(self, sim_id: str, after: int = 0) -> AsyncIterator[BusEvent]:
+        """Yield events with seq > `after` until the stream is complete."""
+
+    @abstractmethod
+    async def last_seq(self, sim_id: str, event: str) -> int:
+        """Sequence number of the latest `event` published for the simulation, or 0 if there is none."""
+
+    @abstractmethod
+    async def add_viewer(self, sim_id: str, delta: int) -> int:
+        """Adjust the number of connected viewers across all workers and return the new count."""
+
+    @abstractmethod
+    async def viewers(self, sim_id: str) -> int:
+        """Number of connected viewers across all workers."""
+
+    async def footprint(self) -> tuple[list[tuple[float, str, int]], int]:
+        """`(completed_at, sim_id, bytes)` of every completed stream, and the bytes of running ones.
+
+        Bytes cover the stream's events, state and checkpoints. Only shared
+        backends report anything; in-process logs are accounted by the registry.
+        """
+        return [], 0
+
+    async def spill(self, sim_id: str, upto_seq: int) -> int:
+        """Move events up to `upto_seq` out of memory, returning the bytes freed; only in-memory logs need to."""
+        return 0
+
+
+class StateBackend(ABC):
+    @abstractmethod
+    async def save_state(self, sim_id: str, data: str) -> None: ...
+
+    @abstractmethod
+    async def load_state(self, sim_id: str) -> str | None: ...
+
+    @abstractmethod
+    async def delete_state(self, sim_id: str) -> None:
+        """Delete the state and every checkpoint of the simulation."""
+
+    @abstractmethod
+    async def list_states(self, after: str = "", limit: int = 100) -> list[str]:
+        """Ids of stored simulations in id order, starting after `after`, for paging through all of them."""
+
+    @abstractmethod
+    async def save_checkpoint(self, sim_id: str, round_number: int, data: str) -> None: ...
+
+    @abstractmethod
+    async def load_checkpoint(self, sim_id: str, round_number: int) -> str | None: ...
+
+
+def _encode(data: dict) -> str:
+    return json.dumps(data, ensure_ascii=False)
+
+
+@dataclass
+class _Stream:
+    events: list[BusEvent] = field(default_factory=list)
+    # Leading events moved to the on-disk segment; events[0] has seq spilled + 1
+    spilled: int = 0
+    complete: bool = False
+    viewers: int = 0
+    changed: asyncio.Event = field(default_factory=asyncio.Event)
+
+    def notify(self):
+        # Wake everyone waiting on the current event, then start a fresh one
+        self.changed.set()
+        self.changed = asyncio.Event()
+
+
+class InMemoryEventBus(EventBus):
+    in_memory = True
+
+    def __init__(self, spill_dir: Path):
+        self.spill_dir = spill_dir
+        self._streams: dict[str, _Stream] = {}
+
+    def _segment_path(self, sim_id: str) -> Path:
+        return self.spill_dir / f"{sim_id}.events.ndjson.gz"
+
+    async def _read_spilled(self, sim_id: str) -> list[BusEvent]:
+        lines = await asyncio.to_thread(read_gzip, self._segment_path(sim_id)) or []
+        return [BusEvent(**json.loads(line)) for line in lines]
+
+    async def open(self, sim_id: str) -> None:
+        self._streams.setdefault(sim_id, _Stream())
+
+    async def publish(self, sim_id: str, event: str, data: dict) -> BusEvent:
+        stream = self._streams.setdefault(sim_id, _Stream())
+        bus_event = BusEvent(stream.spilled + len(stream.events) + 1, event, _encode(data))
+        stream.events.append(bus_event)
+        stream.notify()
+        return bus_event
+
+    async def complete(self, sim_id: str) -> None:
+        stream = self._streams.get(sim_id)
+        if stream:
+            stream.complete = True
+            stream.notify()
+
+    async def exists(self, sim_id: str) -> bool:
+        return sim_id in self._streams
+
+    async def drop(self, sim_id: str) -> None:
+        stream = self._streams.pop(sim_id, None)
+        if stream:
+            stream.complete = True
+            stream.notify()
+            if stream.spilled:
+                self._segment_path(sim_id).unlink(missing_ok=True)
+
+    async def spill(self, sim_id: str, upto_seq: int) -> int:
+        stream = self._streams.get(sim_id)
+        if stream is None or upto_seq <= stream.spilled:
+            return 0
+        moved = stream.events[:upto_seq - stream.spilled]
+        await asyncio.to_thread(
+            append_gzip, self._segment_path(sim_id), [json.dumps(e.__dict__, ensure_ascii=False) for e in moved]
+        )
+        # Events published while the segment was written sit after `moved`, so slicing by count stays correct
+        del stream.events[:len(moved)]
+        stream.spilled += len(moved)
+        return sum(len(e.data) for e in moved)
+
+    async def subscribe(self, sim_id: str, after: int = 0) -> AsyncIterator[BusEvent]:
+        stream = self._streams.get(sim_id)
+        if stream is None:
+            return
+        position = after
+        while True:
+            if position < stream.spilled:
+                # Behind the in-memory window: catch up from the segment first
+                boundary = stream.spilled
+                for event in await self._read_spilled(sim_id):
+                    if position < event.seq <= stream.spilled:
+                        position = event.seq
+                        yield event
+                position = max(position, boundary)
+                continue
+            while position < stream.spilled + len(stream.events):
+                position += 1
+                yield stream.events[position - stream.spilled - 1]
+                if position < stream.spilled:
+                    break
+            else:
+                if stream.complete:
+                    return
+                await stream.changed.wait()
+
+    async def last_seq(self, sim_id: str, event: str) -> int:
+        stream = self._streams.get(sim_id)
+        if stream is None:
+            return 0
+        seq = next((e.seq for e in reversed(stream.events) if e.event == event), 0)
+        if not seq and stream.spilled:
+            seq = next((e.seq for e in reversed(await self._read_spilled(sim_id)) if e.event == event), 0)
+        return seq
+
+    async def add_viewer(self, sim_id: str, delta: int) -> int:
+        stream = self._streams.get(sim_id)
+        if stream is None:
+            return 0
+        stream.viewers = max(stream.viewers + delta, 0)
+        return stream.viewers
+
+    async def viewers(self, sim_id: str) -> int:
+        stream = self._streams.get(sim_id)
+        return stream.viewers if stream else 0
+
+
+class InMemoryStateBackend(StateBackend):
+    def __init__(self):
+        self._states: dict[str, str] = {}
+        self._checkpoints: dict[str, dict[int, str]] = {}
+
+    async def save_state(self, sim_id: str, data: str) -> None:
+        self._states[sim_id] = data
+
+    async def load_state(self, sim_id: str) -> str | None:
+        return self._states.get(sim_id)
+
+    async def delete_state(self, sim_id: str) -> None:
+        self._states.pop(sim_id, None)
+        self._checkpoints.pop(sim_id, None)
+
+    async def list_states(self, after: str = "", limit: int = 100) -> list[str]:
+        return sorted(sim_id for sim_id in self._states if sim_id > after)[:limit]
+
+    async def save_checkpoint(self, sim_id: str, round_number: int, data: str) -> None:
+        self._checkpoints.setdefault(sim_id, {})[round_number] = data
+
+    async def load_checkpoint(self, sim_id: str, round_number: int) -> str | None:
+        return self._checkpoints.get(sim_id, {}).get(round_number)
+
+
+class _SQLite:
+    """One connection per process, serialized by a lock and used from worker threads."""
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS streams (
+            sim_id TEXT PRIMARY KEY,
+            complete INTEGER NOT NULL DEFAULT 0,
+            viewers INTEGER NOT NULL DEFAULT 0,
+            created_at REAL NOT NULL,
+            completed_at REAL
+        );
+        CREATE TABLE IF NOT EXISTS events (
+            sim_id TEXT NOT NULL,
+            seq INTEGER NOT NULL,
+            event TEXT NOT NULL,
+            data TEXT NOT NULL,
+            PRIMARY KEY (sim_id, seq)
+        );
+        CREATE TABLE IF NOT EXISTS states (
+            sim_id TEXT PRIMARY KEY,
+            data TEXT NOT NULL,
+            updated_at REAL NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS checkpoints (
+            sim_id TEXT NOT NULL,
+            round_number INTEGER NOT NULL,
+            data TEXT NOT NULL,
+            PRIMARY KEY (sim_id, round_number)
+        );
+    """
+
+    # Columns added after a table was first shipped; CREATE TABLE IF NOT EXISTS leaves older files without them
+    MIGRATIONS = [
+        ("streams", "viewers", "INTEGER NOT NULL DEFAULT 0"),
+        ("streams", "completed_at", "REAL"),
+    ]
+
+    def __init__(self, path: str):
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.executescript(self.SCHEMA)
+            self._migrate()
+
+    def _migrate(self):
+        for table, column, definition in self.MIGRATIONS:
+            columns = {row[1] for row in self._conn.execute(f"PRAGMA table_info({table})")}
+            if column not in columns:
+                self._conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+
+    def _execute(self, sql: str, params: tuple = ()) -> list[tuple]:
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    async def execute(self, sql: str, params: tuple = ()) -> list[tuple]:
+        return await asyncio.to_thread(self._execute, sql, params)
+
+
+class SQLiteEventBus(EventBus):
+    def __init__(self, db: _SQLite, poll_interval: float):
+        self._db = db
+        self._poll_interval = poll_interval
+
+    async def open(self, sim_id: str) -> None:
+        await self._db.execute(
+            "INSERT OR IGNORE INTO streams (sim_id, created_at) VALUES (?, ?)", (sim_id, time.time())
+        )
+
+    async def publish(self, sim_id: str, event: str, data: dict) -> BusEvent:
+        encoded = _encode(data)
+        rows = await self._db.execute(
+            "INSERT INTO events (sim_id, seq, event, data) "
+            "SELECT ?, COALESCE(MAX(seq), 0) + 1, ?, ? FROM events WHERE sim_id = ? RETURNING seq",
+            (sim_id, event, encoded, sim_id),
+        )
+        return BusEvent(rows[0][0], event, encoded)
+
+    async def complete(self, sim_id: str) -> None:
+        await self._db.execute(
+            "UPDATE streams SET complete = 1, completed_at = ? WHERE sim_id = ?", (time.time(), sim_id)
+        )
+
+    async def exists(self, sim_id: str) -> bool:
+        return bool(await self._db.execute("SELECT 1 FROM streams WHERE sim_id = ?", (sim_id,)))
+
+    async def drop(self, sim_id: str) -> None:
+        await self._db.execute("DELETE FROM events WHERE sim_id = ?", (sim_id,))
+        await self._db.execute("DELETE FROM streams WHERE sim_id = ?", (sim_id,))
+
+    async def subscribe(self, sim_id: str, after: int = 0) -> AsyncIterator[BusEvent]:
+        position = after
+        while True:
+            # Read completion first: if it was set, every event is already committed
+            status = await self._db.execute("SELECT complete FROM streams WHERE sim_id = ?", (sim_id,))
+            if not status:
+                return
+            rows = await self._db.execute(
+                "SELECT seq, event, data FROM events WHERE sim_id = ? AND seq > ? ORDER BY seq",
+                (sim_id, position),
+            )
+            for seq, event, data in rows:
+                position = seq
+                yield BusEvent(seq, event, data)
+            if status[0][0]:
+                return
+            if not rows:
+                await asyncio.sleep(self._poll_interval)
+
+    async def last_seq(self, sim_id: str, event: str) -> int:
+        rows = await self._db.execute(
+            "SELECT MAX(seq) FROM events WHERE sim_id = ? AND event = ?", (sim_id, event)
+        )
+        return rows[0][0] or 0
+
+    async def add_viewer(self, sim_id: str, delta: int) -> int:
+        rows = await self._db.execute(
+            "UPDATE streams SET viewers = MAX(viewers + ?, 0) WHERE sim_id = ? RETURNING viewers",
+            (delta, sim_id),
+        )
+        return rows[0][0] if rows else 0
+
+    async def viewers(self, sim_id: str) -> int:
+        rows = await self._db.execute("SELECT viewers FROM streams WHERE sim_id = ?", (sim_id,))
+        return rows[0][0] if rows else 0
+
+    async def footprint(self) -> tuple[list[tuple[float, str, int]], int]:
+        rows = await self._db.execute("""
+            SELECT s.sim_id, s.complete, COALESCE(s.completed_at, s.created_at),
+                   COALESCE(e.bytes, 0) + COALESCE(st.bytes, 0) + COALESCE(c.bytes, 0)
+            FROM streams s
+            LEFT JOIN (SELECT sim_id, SUM(LENGTH(data)) AS bytes FROM events GROUP BY sim_id) e USING (sim_id)
+            LEFT JOIN (SELECT sim_id, LENGTH(data) AS bytes FROM states) st USING (sim_id)
+            LEFT JOIN (SELECT sim_id, SUM(LENGTH(data)) AS bytes FROM checkpoints GROUP BY sim_id) c USING (sim_id)
+        """)
+        completed = [(done, sim_id, nbytes) for sim_id, complete, done, nbytes in rows if complete]
+        return completed, sum(nbytes for _, complete, _, nbytes in rows if not complete)
+
+
+class SQLiteStateBackend(StateBackend):
+    def __init__(self, db: _SQLite):
+        self._db = db
+
+    async def save_state(self, sim_id: str, data: str) -> None:
+        await self._db.execute(
+            "INSERT INTO states (sim_id, data, updated_at) VALUES (?, ?, ?) "
+            "ON CONFLICT(sim_id) DO UPDATE SET data = excluded.data, updated_at = excluded.updated_at",
+            (sim_id, data, time.time()),
+        )
+
+    async def load_state(self, sim_id: str) -> str | None:
+        rows = await self._db.execute("SELECT data FROM states WHERE sim_id = ?", (sim_id,))
+        return rows[0][0] if rows else None
+
+    async def delete_state(self, sim_id: str) -> None:
+        await self._db.execute("DELETE FROM states WHERE sim_id = ?", (sim_id,))
+        await self._db.execute("DELETE FROM checkpoints WHERE sim_id = ?", (sim_id,))
+
+    async def list_states(self, after: str = "", limit: int = 100) -> list[str]:
+        rows = await self._db.execute(
+            "SELECT sim_id FROM states WHERE sim_id > ? ORDER BY sim_id LIMIT ?", (after, limit)
+        )
+        return [row[0] for row in rows]
+
+    async def save_checkpoint(self, sim_id: str, round_number: int, data: str) -> None:
+        await self._db.execute(
+            "INSERT OR REPLACE INTO checkpoints (sim_id, round_number, data) VALUES (?, ?, ?)",
+            (sim_id, round_number, data),
+        )
+
+    async def load_checkpoint(self, sim_id: str, round_number: int) -> str | None:
+        rows = await self._db.execute(
+            "SELECT data FROM checkpoints WHERE sim_id = ? AND round_number = ?", (sim_id, round_number)
+        )
+        return rows[0][0] if rows else None
+
+
+def create_backends() -> tuple[EventBus, StateBackend]:
+    if settings.simulation_backend == "memory":
+        return InMemoryEventBus(Path(settings.registry_spill_dir)), InMemoryStateBackend()
+    if settings.simulation_backend == "sqlite":
+        db = _SQLite(settings.simulation_db_path)
+        return SQLiteEventBus(db, settings.event_bus_poll_interval), SQLiteStateBackend(db)
+    raise ValueError(f"Unknown simulation_backend '{settings.simulation_backend}'")
+
+
+event_bus, state_backend = create_backends()
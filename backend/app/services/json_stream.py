@@ -0,0 +1,71 @@
+import json
+
+
+class JSONFieldScanner:
+    """Extracts the top-level fields of a streamed JSON object as soon as each value is complete.
+
+    Text before the object (such as a code fence) is skipped. Numbers are only
+    complete at the following delimiter, so put them before long strings to
+    get them early.
+    """
+
+    def __init__(self):
+        self.fields: dict = {}
+        self._buffer = ""
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._expect = "key"
+        self._key: str | None = None
+        self._start = 0
+
+    def feed(self, chunk: str) -> dict:
+        """Consume the next piece of text and return the fields it completed."""
+        completed = {}
+        self._buffer += chunk
+        buf = self._buffer
+        for i in range(self._pos, len(buf)):
+            c = buf[i]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif c == "\\":
+                    self._escape = True
+                elif c == '"':
+                    self._in_string = False
+                    if self._depth == 1 and self._expect == "key":
+                        self._key = json.loads(buf[self._start:i + 1])
+                        self._expect = "colon"
+                continue
+            if c == '"':
+                self._in_string = True
+                if self._depth == 1 and self._expect == "key":
+                    self._start = i
+            elif c in "{[":
+                self._depth += 1
+            elif c in "}]":
+                if self._depth == 1 and self._expect == "value":
+                    self._complete(buf[self._start:i], completed)
+                self._depth -= 1
+            elif self._depth == 1:
+                if c == ":" and self._expect == "colon":
+                    self._expect = "value"
+                    self._start = i + 1
+                elif c == "," and self._expect == "value":
+                    self._complete(buf[self._start:i], completed)
+                    self._expect = "key"
+        self._pos = len(buf)
+        return completed
+
+    def _complete(self, text: str, completed: dict):
+        try:
+            value = json.loads(text)
+        except ValueError:
+            return
+        self.fields[self._key] = value
+        completed[self._key] = value
+
+    @property
+    def text(self) -> str:
+        return self._buffer
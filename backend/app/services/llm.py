@@ -1,46 +1,384 @@
+import asyncio
+import importlib.util
 import json
 import logging
-
-import anthropic
+import time
+from collections import defaultdict
+from collections.abc import Callable
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import TYPE_CHECKING
 
 from app.config import settings
+from app.services.json_stream import JSONFieldScanner
+from app.services.llm_scheduler import SECTOR, SUMMARY, llm_scheduler
+from app.services.llm_stub import stub_message, stub_stream
+from app.services.local_llm import local_batcher
+from app.services.loop_monitor import loop_monitor
+
+# The SDK (and httpx under it) is the slowest import in the app; load it on first use
+if TYPE_CHECKING:
+    import anthropic
+    import httpx
 
 logger = logging.getLogger(__name__)
 
-client = anthropic.AsyncAnthropic(api_key=settings.anthropic_api_key)
+
+class LLMClientPool:
+    """One AsyncAnthropic client per model, each with its own tuned connection pool."""
+
+    def __init__(self):
+        self._clients: dict[str, "anthropic.AsyncAnthropic"] = {}
+        self._http_clients: dict[str, "httpx.AsyncClient"] = {}
+        self._in_flight = 0
+        self._idle = asyncio.Event()
+        self._idle.set()
+        self._closing = False
+
+    def _build(self, model: str) -> tuple["anthropic.AsyncAnthropic", "httpx.AsyncClient"]:
+        import anthropic
+        import httpx
+
+        http2 = settings.llm_http2
+        if http2 and importlib.util.find_spec("h2") is None:
+            logger.warning("llm_http2 is enabled but the 'h2' package is not installed, using HTTP/1.1")
+            http2 = False
+        http_client = anthropic.DefaultAsyncHttpxClient(
+            http2=http2,
+            timeout=httpx.Timeout(settings.llm_timeout, connect=settings.llm_connect_timeout),
+            limits=httpx.Limits(
+                max_connections=settings.llm_max_connections,
+                max_keepalive_connections=settings.llm_max_keepalive_connections,
+                keepalive_expiry=settings.llm_keepalive_expiry,
+            ),
+        )
+        client = anthropic.AsyncAnthropic(
+            api_key=settings.anthropic_api_key,
+            http_client=http_client,
+            max_retries=settings.llm_max_retries,
+        )
+        return client, http_client
+
+    def get(self, model: str) -> "anthropic.AsyncAnthropic":
+        if model not in self._clients:
+            self._clients[model], self._http_clients[model] = self._build(model)
+        return self._clients[model]
+
+    @asynccontextmanager
+    async def acquire(self, model: str):
+        if self._closing:
+            raise RuntimeError("LLM client pool is shutting down")
+        self._in_flight += 1
+        self._idle.clear()
+        try:
+            yield self.get(model)
+        finally:
+            self._in_flight -= 1
+            if self._in_flight == 0:
+                self._idle.set()
+
+    async def _warm(self, model: str):
+        client = self.get(model)
+        http_client = self._http_clients[model]
+        # Any response will do — the point is to complete DNS and TLS before the first real call
+        requests = [
+            http_client.head(str(client.base_url), timeout=settings.llm_connect_timeout)
+            for _ in range(settings.llm_warmup_connections)
+        ]
+        results = await asyncio.gather(*requests, return_exceptions=True)
+        failures = [r for r in results if isinstance(r, Exception)]
+        if failures:
+            logger.warning(f"Warm-up for {model} failed on {len(failures)} connection(s): {failures[0]!r}")
+
+    async def start(self):
+        self._closing = False
+        if settings.llm_backend != "anthropic":
+            return
+        models = [settings.sonnet_model, settings.haiku_model]
+        for model in models:
+            # Importing the SDK and creating SSL contexts takes a few hundred ms; keep it off the event loop
+            built = await asyncio.to_thread(self._build, model)
+            if model not in self._clients:  # unless a call already built one meanwhile
+                self._clients[model], self._http_clients[model] = built
+        if settings.llm_warmup:
+            await asyncio.gather(*(self._warm(m) for m in models))
+
+    async def drain(self):
+        """Stop accepting calls and wait up to `llm_drain_timeout` for in-flight ones to finish."""
+        self._closing = True
+        if self._in_flight:
+            logger.info(f"Draining {self._in_flight} in-flight LLM call(s)")
+            try:
+                await asyncio.wait_for(self._idle.wait(), settings.llm_drain_timeout)
+            except TimeoutError:
+                logger.warning(f"{self._in_flight} LLM call(s) still in flight after {settings.llm_drain_timeout}s")
+
+    async def close(self):
+        """Drain, then close connections."""
+        await self.drain()
+        for client in self._clients.values():
+            await client.close()
+        self._clients.clear()
+        await local_batcher.close()
+        self._http_clients.clear()
+
+
+llm_pool = LLMClientPool()
+
+
+@dataclass
+class _CallStats:
+    calls: int = 0
+    failures: int = 0
+    cancelled: int = 0
+    input_tokens: int = 0
+    output_tokens: int = 0
+    total_latency: float = 0.0
+    ewma_latency: float | None = None
+    ewma_error: float = 0.0
+    early_fields: int = 0
+    early_fields_latency: float = 0.0
+
+    @property
+    def avg_tokens(self) -> float:
+        return (self.input_tokens + self.output_tokens) / self.calls if self.calls else 0.0
+
+    def as_dict(self) -> dict:
+        return {
+            "calls": self.calls,
+            "failures": self.failures,
+            "cancelled": self.cancelled,
+            "input_tokens": self.input_tokens,
+            "output_tokens": self.output_tokens,
+            "avg_latency": self.total_latency / self.calls if self.calls else None,
+            "recent_latency": self.ewma_latency,
+            "recent_error_rate": self.ewma_error,
+            "avg_time_to_numbers": self.early_fields_latency / self.early_fields if self.early_fields else None,
+            # Cancelled calls are assumed to have cost what an average completed call does
+            "estimated_tokens_saved": round(self.cancelled * self.avg_tokens),
+        }
+
+
+# Weight of the newest call in the recent latency and error rate
+EWMA_ALPHA = 0.1
+
+
+class LLMStats:
+    def __init__(self):
+        self.kinds: dict[str, _CallStats] = defaultdict(_CallStats)
+        self.parse_failures = 0
+
+    def record(self, kind: str, latency: float, usage):
+        stats = self.kinds[kind]
+        stats.calls += 1
+        stats.total_latency += latency
+        stats.ewma_latency = latency if stats.ewma_latency is None else (
+            (1 - EWMA_ALPHA) * stats.ewma_latency + EWMA_ALPHA * latency
+        )
+        stats.ewma_error *= 1 - EWMA_ALPHA
+        stats.input_tokens += usage.input_tokens
+        stats.output_tokens += usage.output_tokens
+
+    def record_failure(self, kind: str):
+        stats = self.kinds[kind]
+        stats.failures += 1
+        stats.ewma_error = (1 - EWMA_ALPHA) * stats.ewma_error + EWMA_ALPHA
+
+    def as_dict(self) -> dict:
+        return {
+            "parse_failures": self.parse_failures,
+            **{kind: stats.as_dict() for kind, stats in self.kinds.items()},
+        }
+
+
+llm_stats = LLMStats()
 
 
-async def call_agent(system_prompt: str, user_prompt: str) -> dict:
-    """Call Sonnet for agent reasoning. Returns parsed JSON."""
-    response = await client.messages.create(
-        model=settings.sonnet_model,
-        max_tokens=1024,
-        system=system_prompt,
-        messages=[{"role": "user", "content": user_prompt}],
-    )
-    text = response.content[0].text
+@dataclass
+class TokenMeter:
+    """Tokens spent by one unit of work; tasks started while it is set inherit it."""
+    input_tokens: int = 0
+    output_tokens: int = 0
+    calls: int = 0
+
+    @property
+    def total(self) -> int:
+        return self.input_tokens + self.output_tokens
+
+
+token_meter: ContextVar[TokenMeter | None] = ContextVar("token_meter", default=None)
+
+
+async def _create_message(kind: str, model: str, **kwargs):
+    start = time.perf_counter()
+    try:
+        if settings.llm_backend == "stub":
+            response = await stub_message(kind, model, **kwargs)
+        elif settings.llm_backend == "openai":
+            response = await local_batcher.create(model, **kwargs)
+        else:
+            async with llm_pool.acquire(model) as client:
+                response = await client.messages.create(model=model, **kwargs)
+    except asyncio.CancelledError:
+        llm_stats.kinds[kind].cancelled += 1
+        raise
+    except Exception:
+        llm_stats.record_failure(kind)
+        raise
+    _account(kind, start, response.usage)
+    return response
+
+
+async def _stream_message(kind: str, model: str, on_text: Callable[[str], None], **kwargs) -> str:
+    """Like `_create_message`, but hands each piece of text to `on_text` as it arrives; returns the full text."""
+    start = time.perf_counter()
+    parts = []
+
+    def receive(text: str):
+        parts.append(text)
+        on_text(text)
+
+    try:
+        if settings.llm_backend == "stub":
+            usage = (await stub_stream(kind, model, receive, **kwargs)).usage
+        elif settings.llm_backend == "openai":
+            # Batched completions come back whole, so the text arrives as one piece
+            response = await local_batcher.create(model, **kwargs)
+            receive(response.content[0].text)
+            usage = response.usage
+        else:
+            async with llm_pool.acquire(model) as client:
+                async with client.messages.stream(model=model, **kwargs) as stream:
+                    async for text in stream.text_stream:
+                        receive(text)
+                    usage = (await stream.get_final_message()).usage
+    except asyncio.CancelledError:
+        llm_stats.kinds[kind].cancelled += 1
+        raise
+    except Exception:
+        llm_stats.record_failure(kind)
+        raise
+    _account(kind, start, usage)
+    return "".join(parts)
+
+
+def _account(kind: str, start: float, usage):
+    llm_stats.record(kind, time.perf_counter() - start, usage)
+    meter = token_meter.get()
+    if meter is not None:
+        meter.input_tokens += usage.input_tokens
+        meter.output_tokens += usage.output_tokens
+        meter.calls += 1
+
+
+def _strip_code_fence(text: str) -> str:
     # Extract JSON from response — handle markdown code blocks
     if "```json" in text:
         text = text.split("```json")[1].split("```")[0]
     elif "```" in text:
         text = text.split("```")[1].split("```")[0]
+    return text.strip()
+
+
+# Fields an agent's move can be acted on with, before its prose has been generated
+EARLY_FIELDS = ("position", "willingness_to_settle")
+
+PARSE_FAILURE = "Failed to parse response"
+
+
+async def call_agent(
+    system_prompt: str,
+    user_prompt: str,
+    on_numbers: Callable[[dict], None] | None = None,
+    fast: bool = False,
+    critical_class: int = SECTOR,
+) -> dict:
+    """Call Sonnet (Haiku with a shorter answer budget if `fast`) for agent reasoning. Returns parsed JSON.
+
+    With `on_numbers` the response is streamed and the callback gets the
+    numeric fields as soon as both have been generated. `critical_class`
+    orders the call in the scheduler when calls are queued.
+    """
+    model = settings.haiku_model if fast else settings.sonnet_model
+    kwargs = {
+        "max_tokens": settings.deadline_fast_max_tokens if fast else settings.agent_max_tokens,
+        "system": system_prompt,
+        "messages": [{"role": "user", "content": user_prompt}],
+    }
+    async with llm_scheduler.slot(critical_class):
+        if on_numbers is None:
+            text = (await _create_message("agent", model, **kwargs)).content[0].text
+        else:
+            text = await _stream_early_fields(model, kwargs, on_numbers)
     try:
-        return json.loads(text.strip())
+        with loop_monitor.section("llm.parse_agent"):
+            text = _strip_code_fence(text)
+            return json.loads(text)
     except json.JSONDecodeError:
         logger.error(f"Failed to parse agent response: {text[:200]}")
+        llm_stats.parse_failures += 1
         return {
             "position": 0.0,
-            "reasoning": "Failed to parse response",
+            "reasoning": PARSE_FAILURE,
             "public_statement": "No comment.",
             "willingness_to_settle": 50,
         }
 
 
+async def _stream_early_fields(model: str, kwargs: dict, on_numbers: Callable[[dict], None]) -> str:
+    scanner = JSONFieldScanner()
+    start = time.perf_counter()
+    notified = False
+
+    def on_text(text: str):
+        nonlocal notified
+        scanner.feed(text)
+        if not notified and all(f in scanner.fields for f in EARLY_FIELDS):
+            notified = True
+            stats = llm_stats.kinds["agent"]
+            stats.early_fields += 1
+            stats.early_fields_latency += time.perf_counter() - start
+            on_numbers({f: scanner.fields[f] for f in EARLY_FIELDS})
+
+    return await _stream_message("agent", model, on_text, **kwargs)
+
+
+async def call_agent_panel(
+    system_prompt: str, user_prompt: str, members: int, fast: bool = False, critical_class: int = SECTOR
+) -> list[dict]:
+    """Call Sonnet (Haiku with a shorter answer budget if `fast`) once for a whole coalition.
+
+    Returns the parsed JSON array, or [] if unparseable.
+    """
+    per_member = settings.panel_tokens_per_member
+    if fast:
+        per_member = min(per_member, settings.deadline_fast_max_tokens)
+    async with llm_scheduler.slot(critical_class):
+        response = await _create_message(
+            "panel",
+            settings.haiku_model if fast else settings.sonnet_model,
+            max_tokens=min(per_member * members, 4096),
+            system=system_prompt,
+            messages=[{"role": "user", "content": user_prompt}],
+        )
+    text = _strip_code_fence(response.content[0].text)
+    try:
+        result = json.loads(text)
+    except json.JSONDecodeError:
+        logger.error(f"Failed to parse panel response: {text[:200]}")
+        llm_stats.parse_failures += 1
+        return []
+    return [item for item in result if isinstance(item, dict)] if isinstance(result, list) else []
+
+
 async def call_summary(prompt: str) -> str:
     """Call Haiku for summaries."""
-    response = await client.messages.create(
-        model=settings.haiku_model,
-        max_tokens=2048,
-        messages=[{"role": "user", "content": prompt}],
-    )
+    async with llm_scheduler.slot(SUMMARY):
+        response = await _create_message(
+            "summary",
+            settings.haiku_model,
+            max_tokens=2048,
+            messages=[{"role": "user", "content": prompt}],
+        )
     return response.content[0].text
@@ -0,0 +1,131 @@
+"""Priority scheduling of LLM calls across simulations.
+
+When ``llm_max_concurrent_calls`` is set, at most that many calls are in
+flight; the rest wait and are served by rank rather than arrival. A call
+ranks by its place on the critical path (the norm-setting negotiators gate
+märket and with it every later phase, observers and summaries gate nothing),
+then by whether its simulation is interactive or a batch job, and a little by
+how long the simulation has been running, so runs near their end finish
+first. Waiting improves a call's rank, so batch work is never starved.
+"""
+import asyncio
+import itertools
+import time
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+
+from app.config import settings
+from app.models.simulation import Priority
+
+# Critical-path classes, most urgent first
+NORM_SETTING, SECTOR, OBSERVER, SUMMARY = range(4)
+CLASS_NAMES = ("norm_setting", "sector", "observer", "summary")
+
+
+@dataclass(frozen=True)
+class SimulationContext:
+    priority: Priority
+    started_at: float = field(default_factory=time.monotonic)
+
+
+# Set by the simulation manager around each run; calls outside a run count as interactive and new
+simulation_context: ContextVar[SimulationContext | None] = ContextVar("simulation_context", default=None)
+
+
+@dataclass
+class _Waiter:
+    critical_class: int
+    base: float
+    seq: int
+    enqueued_at: float = field(default_factory=time.monotonic)
+    granted: asyncio.Future = field(default_factory=lambda: asyncio.get_running_loop().create_future())
+
+    def rank(self, now: float) -> float:
+        # Waiting `llm_schedule_aging` seconds is worth one critical-path class
+        return self.base - (now - self.enqueued_at) / settings.llm_schedule_aging
+
+
+def base_rank(critical_class: int, context: SimulationContext | None, now: float) -> float:
+    rank = float(critical_class)
+    if context is not None:
+        if context.priority == Priority.BATCH:
+            rank += settings.llm_schedule_batch_penalty
+        rank -= 0.5 * min((now - context.started_at) / settings.llm_schedule_age_horizon, 1.0)
+    return rank
+
+
+class LLMScheduler:
+    def __init__(self):
+        self._running = 0
+        self._waiting: list[_Waiter] = []
+        self._seq = itertools.count()
+        self.granted = [0] * len(CLASS_NAMES)
+        self.queued_total = [0] * len(CLASS_NAMES)
+        self._wait_ewma = [0.0] * len(CLASS_NAMES)
+        self.max_wait = [0.0] * len(CLASS_NAMES)
+
+    @asynccontextmanager
+    async def slot(self, critical_class: int):
+        """Hold one of the concurrent call slots for the duration of the block."""
+        limit = settings.llm_max_concurrent_calls
+        if limit <= 0:
+            yield
+            return
+        if self._running < limit and not self._waiting:
+            self._running += 1
+            self._record(critical_class, 0.0)
+        else:
+            now = time.monotonic()
+            waiter = _Waiter(critical_class, base_rank(critical_class, simulation_context.get(), now), next(self._seq))
+            self._waiting.append(waiter)
+            self.queued_total[critical_class] += 1
+            try:
+                await waiter.granted
+            except asyncio.CancelledError:
+                if waiter.granted.done() and not waiter.granted.cancelled():
+                    self._release()
+                else:
+                    self._waiting.remove(waiter)
+                raise
+        try:
+            yield
+        finally:
+            self._release()
+
+    def _record(self, critical_class: int, waited: float):
+        self.granted[critical_class] += 1
+        self._wait_ewma[critical_class] = 0.9 * self._wait_ewma[critical_class] + 0.1 * waited
+        self.max_wait[critical_class] = max(self.max_wait[critical_class], waited)
+
+    def _release(self):
+        self._running -= 1
+        self._dispatch()
+
+    def _dispatch(self):
+        now = time.monotonic()
+        while self._waiting and self._running < settings.llm_max_concurrent_calls:
+            waiter = min(self._waiting, key=lambda w: (w.rank(now), w.seq))
+            self._waiting.remove(waiter)
+            self._running += 1
+            self._record(waiter.critical_class, now - waiter.enqueued_at)
+            waiter.granted.set_result(None)
+
+    def stats(self) -> dict:
+        return {
+            "limit": settings.llm_max_concurrent_calls,
+            "running": self._running,
+            **{
+                name: {
+                    "queued": sum(1 for w in self._waiting if w.critical_class == i),
+                    "granted": self.granted[i],
+                    "had_to_wait": self.queued_total[i],
+                    "recent_wait": self._wait_ewma[i],
+                    "max_wait": self.max_wait[i],
+                }
+                for i, name in enumerate(CLASS_NAMES)
+            },
+        }
+
+
+llm_scheduler = LLMScheduler()
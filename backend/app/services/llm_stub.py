@@ -0,0 +1,85 @@
+"""Offline stand-in for the Anthropic API (LLM_BACKEND=stub).
+
+Answers every call after a configurable latency with well-formed JSON whose
+positions converge and whose willingness to settle rises round by round, so
+simulations run their full course. Meant for load tests and local
+development; the text is filler.
+"""
+import asyncio
+import json
+import random
+import re
+from collections.abc import Callable
+from dataclasses import dataclass
+
+from app.config import settings
+
+ROUND_RE = re.compile(r"Round (\d+)")
+MEMBER_RE = re.compile(r'ORGANISATION id="([^"]+)"')
+STREAM_CHUNK = 12  # characters, a few tokens
+
+
+@dataclass
+class StubUsage:
+    input_tokens: int
+    output_tokens: int
+
+
+@dataclass
+class StubText:
+    text: str
+
+
+@dataclass
+class StubResponse:
+    content: list[StubText]
+    usage: StubUsage
+
+
+def _agent_result(round_number: int) -> dict:
+    return {
+        "position": round(3.0 + 1.0 / round_number + random.uniform(-0.1, 0.1), 2),
+        "willingness_to_settle": min(100, 40 + 12 * round_number + random.randint(0, 5)),
+        "reasoning": "Stub reasoning. " * 8,
+        "public_statement": "Stub statement. " * 4,
+    }
+
+
+def _latency() -> float:
+    jitter = settings.llm_stub_jitter
+    return max(0.0, settings.llm_stub_latency * random.uniform(1 - jitter, 1 + jitter))
+
+
+async def stub_message(kind: str, model: str, messages: list[dict], system: str = "", max_tokens: int = 1024, **_) -> StubResponse:
+    await asyncio.sleep(_latency())
+    return _respond(kind, messages, system, max_tokens)
+
+
+async def stub_stream(
+    kind: str, model: str, on_text: Callable[[str], None], messages: list[dict], system: str = "", max_tokens: int = 1024, **_
+) -> StubResponse:
+    """Like `stub_message`, but delivers the text in chunks: a fifth of the latency to the first, the rest spread out."""
+    latency = _latency()
+    response = _respond(kind, messages, system, max_tokens)
+    text = response.content[0].text
+    chunks = [text[i:i + STREAM_CHUNK] for i in range(0, len(text), STREAM_CHUNK)]
+    await asyncio.sleep(latency * 0.2)
+    for chunk in chunks:
+        on_text(chunk)
+        await asyncio.sleep(latency * 0.8 / len(chunks))
+    return response
+
+
+def _respond(kind: str, messages: list[dict], system: str, max_tokens: int) -> StubResponse:
+    prompt = messages[-1]["content"]
+    match = ROUND_RE.search(prompt)
+    round_number = int(match.group(1)) if match else 1
+    if kind == "summary":
+        text = "Stub summary of the negotiation round."
+    elif kind == "panel":
+        text = json.dumps([{"agent_id": aid, **_agent_result(round_number)} for aid in MEMBER_RE.findall(system)])
+    else:
+        text = json.dumps(_agent_result(round_number))
+    # Roughly four characters per token, like the real tokenizer on English text
+    usage = StubUsage((len(system) + len(prompt)) // 4, min(len(text) // 4, max_tokens))
+    return StubResponse([StubText(text)], usage)
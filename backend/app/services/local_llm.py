@@ -0,0 +1,154 @@
+"""Micro-batching client for a local OpenAI-compatible server (LLM_BACKEND=openai).
+
+Calls that arrive within ``local_llm_batch_window`` of each other, from any
+simulation, are sent as one ``/v1/completions`` request with a list of
+prompts and the choices are handed back to their callers by index. Only
+calls with the same model and answer budget can share a request.
+"""
+import asyncio
+import logging
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING
+
+from app.config import settings
+from app.services.llm_stub import StubResponse, StubText, StubUsage
+
+if TYPE_CHECKING:
+    import httpx
+
+logger = logging.getLogger(__name__)
+
+
+def render_prompt(messages: list[dict], system: str = "") -> str:
+    user = "\n\n".join(m["content"] for m in messages if m["role"] == "user")
+    return settings.local_llm_prompt_template.format(system=system, user=user)
+
+
+@dataclass
+class _Batch:
+    model: str
+    max_tokens: int
+    prompts: list[str] = field(default_factory=list)
+    futures: list[asyncio.Future] = field(default_factory=list)
+    timer: asyncio.TimerHandle | None = None
+
+
+class MicroBatcher:
+    def __init__(self):
+        self._client: "httpx.AsyncClient | None" = None
+        self._open: dict[tuple[str, int], _Batch] = {}
+        self._in_flight: set[asyncio.Task] = set()
+        self._slots: asyncio.Semaphore | None = None
+        self.requests = 0
+        self.calls = 0
+        self.failures = 0
+        self.max_batch = 0
+
+    def _http(self) -> "httpx.AsyncClient":
+        if self._client is None:
+            import httpx
+
+            headers = {"Authorization": f"Bearer {settings.local_llm_api_key}"} if settings.local_llm_api_key else {}
+            self._client = httpx.AsyncClient(
+                base_url=settings.local_llm_url,
+                headers=headers,
+                timeout=httpx.Timeout(settings.llm_timeout, connect=settings.llm_connect_timeout),
+                limits=httpx.Limits(max_connections=settings.local_llm_max_requests),
+                trust_env=False,
+            )
+        return self._client
+
+    def model_for(self, model: str) -> str:
+        """The served model standing in for a Claude model; haiku calls go to the fast one if set."""
+        if model == settings.haiku_model and settings.local_llm_fast_model:
+            return settings.local_llm_fast_model
+        return settings.local_llm_model
+
+    async def create(self, model: str, messages: list[dict], system: str = "", max_tokens: int = 1024, **_) -> StubResponse:
+        """Same shape of result as `messages.create`, so callers need not know the backend."""
+        key = (self.model_for(model), max_tokens)
+        batch = self._open.get(key)
+        if batch is None:
+            batch = self._open[key] = _Batch(*key)
+            batch.timer = asyncio.get_running_loop().call_later(settings.local_llm_batch_window, self._flush, key)
+        future = asyncio.get_running_loop().create_future()
+        batch.prompts.append(render_prompt(messages, system))
+        batch.futures.append(future)
+        if len(batch.prompts) >= settings.local_llm_max_batch:
+            self._flush(key)
+        return await future
+
+    def _flush(self, key: tuple[str, int]):
+        batch = self._open.pop(key, None)
+        if batch is None:
+            return
+        batch.timer.cancel()
+        task = asyncio.create_task(self._submit(batch))
+        self._in_flight.add(task)
+        task.add_done_callback(self._in_flight.discard)
+
+    async def _submit(self, batch: _Batch):
+        # Callers cancelled while the window was open are left out of the request
+        live = [(p, f) for p, f in zip(batch.prompts, batch.futures) if not f.done()]
+        if not live:
+            return
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(settings.local_llm_max_requests)
+        self.requests += 1
+        self.calls += len(live)
+        self.max_batch = max(self.max_batch, len(live))
+        try:
+            async with self._slots:
+                response = await self._http().post(
+                    "/completions",
+                    json={"model": batch.model, "prompt": [p for p, _ in live], "max_tokens": batch.max_tokens},
+                )
+                response.raise_for_status()
+                body = response.json()
+            texts = {choice["index"]: choice["text"] for choice in body["choices"]}
+            missing = set(range(len(live))) - texts.keys()
+            if missing:
+                raise ValueError(f"Batch response is missing {len(missing)} of {len(live)} choices")
+        except Exception as e:
+            self.failures += 1
+            logger.warning(f"Batch of {len(live)} to {batch.model} failed: {e!r}")
+            for _, future in live:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        usage = body.get("usage", {})
+        prompt_chars = sum(len(p) for p, _ in live) or 1
+        text_chars = sum(len(t) for t in texts.values()) or 1
+        for i, (prompt, future) in enumerate(live):
+            if future.done():
+                continue
+            text = texts[i]
+            # The server reports usage for the whole batch; split it by each prompt's and answer's share
+            future.set_result(StubResponse([StubText(text)], StubUsage(
+                round(usage.get("prompt_tokens", 0) * len(prompt) / prompt_chars),
+                round(usage.get("completion_tokens", 0) * len(text) / text_chars),
+            )))
+
+    def stats(self) -> dict:
+        return {
+            "requests": self.requests,
+            "calls": self.calls,
+            "failures": self.failures,
+            "mean_batch": self.calls / self.requests if self.requests else None,
+            "max_batch": self.max_batch,
+            "open_batches": len(self._open),
+            "requests_in_flight": len(self._in_flight),
+        }
+
+    async def close(self):
+        for key in list(self._open):
+            self._flush(key)
+        if self._in_flight:
+            await asyncio.gather(*self._in_flight, return_exceptions=True)
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+        self._slots = None
+
+
+local_batcher = MicroBatcher()
@@ -0,0 +1,151 @@
+"""Event-loop health: scheduling lag and callbacks that block the loop.
+
+Off unless ``loop_monitor`` is set. Lag is sampled by a task that sleeps for a
+fixed interval and measures how late it wakes up. Slow callbacks are caught by
+timing ``Handle._run``, which every callback and task step on the default
+asyncio loop goes through. uvloop (what uvicorn picks when it is installed)
+never calls it, so there slow-step tracing is skipped and only lag is
+reported. Synchronous code paths that are suspected of blocking can be
+wrapped in ``section(name)`` so slow-step traces name them.
+"""
+import asyncio
+import logging
+import time
+from collections import deque
+from contextlib import contextmanager
+from pathlib import Path
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+APP_ROOT = str(Path(__file__).resolve().parent.parent)
+
+
+def _percentile(ordered: list[float], q: float) -> float | None:
+    if not ordered:
+        return None
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def _describe(handle: asyncio.Handle) -> tuple[str, list[str]]:
+    """Name a callback and, for task steps, list the app frames the task is now suspended in."""
+    callback = handle._callback
+    task = getattr(callback, "__self__", None)
+    if not isinstance(task, asyncio.Task):
+        return getattr(callback, "__qualname__", repr(callback)), []
+    coro = task.get_coro()
+    frames = []
+    while coro is not None:
+        frame = getattr(coro, "cr_frame", None) or getattr(coro, "ag_frame", None)
+        if frame is not None and frame.f_code.co_filename.startswith(APP_ROOT):
+            frames.append(f"{Path(frame.f_code.co_filename).relative_to(APP_ROOT)}:{frame.f_lineno} {frame.f_code.co_name}")
+        coro = getattr(coro, "cr_await", None) or getattr(coro, "ag_await", None)
+    return getattr(task.get_coro(), "__qualname__", task.get_name()), frames
+
+
+class LoopMonitor:
+    def __init__(self):
+        self.lag: deque[float] = deque(maxlen=settings.loop_lag_window)
+        self.slow_steps: deque[dict] = deque(maxlen=settings.loop_slow_trace_limit)
+        self.slow_count = 0
+        self.sections: dict[str, dict[str, float]] = {}
+        self._step_sections: list[tuple[str, float]] | None = None
+        self._sampler: asyncio.Task | None = None
+        self._original_run = None
+
+    def start(self):
+        if not settings.loop_monitor or self._sampler:
+            return
+        self._sampler = asyncio.create_task(self._sample())
+        loop = asyncio.get_running_loop()
+        if not type(loop).__module__.startswith("asyncio."):
+            logger.info(f"Slow-step tracing needs the asyncio event loop, not {type(loop).__module__}; sampling lag only")
+            return
+        self._original_run = asyncio.Handle._run
+        monitor = self
+
+        def timed_run(handle):
+            monitor._step_sections = []
+            start = time.perf_counter()
+            try:
+                monitor._original_run(handle)
+            finally:
+                elapsed = time.perf_counter() - start
+                if elapsed >= settings.loop_slow_threshold:
+                    monitor._record_slow(handle, elapsed)
+                monitor._step_sections = None
+
+        asyncio.Handle._run = timed_run
+
+    def stop(self):
+        if self._original_run:
+            asyncio.Handle._run = self._original_run
+            self._original_run = None
+        if self._sampler:
+            self._sampler.cancel()
+            self._sampler = None
+
+    async def _sample(self):
+        interval = settings.loop_lag_interval
+        while True:
+            start = time.perf_counter()
+            await asyncio.sleep(interval)
+            self.lag.append(max(0.0, time.perf_counter() - start - interval))
+
+    def _record_slow(self, handle: asyncio.Handle, elapsed: float):
+        callback, frames = _describe(handle)
+        self.slow_count += 1
+        self.slow_steps.append({
+            "at": time.time(),
+            "duration": elapsed,
+            "callback": callback,
+            "suspended_at": frames,
+            "sections": self._summarize_step_sections(),
+        })
+        logger.warning(f"Event loop blocked for {elapsed * 1000:.0f}ms in {callback}")
+
+    def _summarize_step_sections(self) -> dict[str, float]:
+        """Time per section within the current step, largest first."""
+        totals: dict[str, float] = {}
+        for name, elapsed in self._step_sections or []:
+            totals[name] = totals.get(name, 0.0) + elapsed
+        return dict(sorted(totals.items(), key=lambda item: -item[1])[:5])
+
+    @contextmanager
+    def section(self, name: str):
+        """Time a synchronous block and attribute it to `name` in slow-step traces."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            stats = self.sections.get(name)
+            if stats is None:
+                stats = self.sections[name] = {"count": 0, "total": 0.0, "max": 0.0}
+            stats["count"] += 1
+            stats["total"] += elapsed
+            stats["max"] = max(stats["max"], elapsed)
+            if self._step_sections is not None:
+                self._step_sections.append((name, elapsed))
+
+    def as_dict(self) -> dict:
+        ordered = sorted(self.lag)
+        return {
+            "lag": {
+                "samples": len(ordered),
+                "p50": _percentile(ordered, 0.5),
+                "p90": _percentile(ordered, 0.9),
+                "p99": _percentile(ordered, 0.99),
+                "max": ordered[-1] if ordered else None,
+            },
+            "slow_step_tracing": self._original_run is not None,
+            "slow_steps": self.slow_count,
+            "sections": {
+                name: {**stats, "avg": stats["total"] / stats["count"]} for name, stats in self.sections.items()
+            },
+            "recent_slow_steps": list(self.slow_steps),
+        }
+
+
+loop_monitor = LoopMonitor()
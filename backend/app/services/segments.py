@@ -0,0 +1,17 @@
+"""Append-only gzip NDJSON segments for data moved out of memory."""
+import gzip
+from pathlib import Path
+
+
+def append_gzip(path: Path, lines: list[str]):
+    """Append lines to a gzip segment; concatenated gzip members form a valid gzip stream, so this is a cheap append."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "ab") as f:
+        f.write(gzip.compress("".join(line + "\n" for line in lines).encode(), compresslevel=6))
+
+
+def read_gzip(path: Path) -> list[str] | None:
+    if not path.exists():
+        return None
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        return f.read().splitlines()
@@ -0,0 +1,96 @@
+"""Opt-in startup profiling (STARTUP_PROFILING=1).
+
+Installed from app.main before anything else is imported, so it reads the
+environment directly instead of going through Settings.
+"""
+import importlib.machinery
+import logging
+import os
+import sys
+import time
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+
+class StartupProfiler:
+    """Records per-module import time and named initialization steps."""
+
+    def __init__(self, enabled: bool):
+        self.enabled = enabled
+        self.started_at = time.perf_counter()
+        self.imports: dict[str, dict[str, float]] = {}
+        self.steps: dict[str, float] = {}
+        self._stack: list[float] = []
+
+    def install(self):
+        if self.enabled and self not in sys.meta_path:
+            sys.meta_path.insert(0, self)
+
+    def uninstall(self):
+        if self in sys.meta_path:
+            sys.meta_path.remove(self)
+
+    def find_spec(self, fullname, path, target=None):
+        for finder in sys.meta_path:
+            if finder is self or not hasattr(finder, "find_spec"):
+                continue
+            spec = finder.find_spec(fullname, path, target)
+            if spec is not None:
+                break
+        else:
+            return None
+        # Only per-module loader instances can be wrapped safely; builtin and frozen loaders are shared classes
+        loader = spec.loader
+        if isinstance(loader, (importlib.machinery.SourceFileLoader, importlib.machinery.ExtensionFileLoader)):
+            loader.exec_module = self._timed(fullname, loader.exec_module)
+        return spec
+
+    def _timed(self, name: str, exec_module):
+        def exec_timed(module):
+            self._stack.append(0.0)
+            start = time.perf_counter()
+            try:
+                exec_module(module)
+            finally:
+                total = time.perf_counter() - start
+                children = self._stack.pop()
+                if self._stack:
+                    self._stack[-1] += total
+                self.imports[name] = {"total": total, "self": total - children}
+        return exec_timed
+
+    @contextmanager
+    def step(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            if self.enabled:
+                self.steps[name] = time.perf_counter() - start
+
+    def as_dict(self, top: int = 25) -> dict:
+        slowest = sorted(self.imports.items(), key=lambda kv: kv[1]["self"], reverse=True)[:top]
+        return {
+            "enabled": self.enabled,
+            "import_count": len(self.imports),
+            "import_seconds": sum(t["self"] for t in self.imports.values()),
+            "slowest_imports": [
+                {"module": name, "self_ms": t["self"] * 1000, "total_ms": t["total"] * 1000}
+                for name, t in slowest
+            ],
+            "steps_ms": {name: seconds * 1000 for name, seconds in self.steps.items()},
+        }
+
+    def report(self):
+        if not self.enabled:
+            return
+        self.uninstall()
+        data = self.as_dict(top=15)
+        lines = [f"Startup profile: {data['import_count']} modules imported in {data['import_seconds'] * 1000:.0f} ms"]
+        lines += [f"  {i['self_ms']:8.1f} ms  {i['module']}" for i in data["slowest_imports"]]
+        lines += [f"  step {name}: {ms:.1f} ms" for name, ms in data["steps_ms"].items()]
+        logger.info("\n".join(lines))
+
+
+startup_profiler = StartupProfiler(os.environ.get("STARTUP_PROFILING", "").lower() in ("1", "true", "yes"))
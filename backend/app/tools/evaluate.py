@@ -0,0 +1,254 @@
+"""Quality-versus-cost evaluation of engine configurations.
+
+    python -m app.tools.evaluate --presets stabil_tillvaxt inflationschock --seeds 3 \\
+        --config baseline --config haiku:route=haiku --config brief:prompt=brief,max_tokens=400
+
+Runs every preset under every configuration (model route, prompt variant,
+answer budget, panel mode) for several seeds, in process against whichever
+backend ``--backend`` selects (the stub, a local OpenAI-compatible server or
+the Anthropic API). For each configuration it reports cost (wall time, calls,
+tokens) next to quality: märket against the historical or expected level of
+the preset, parse failures, how realistic the settlements are and how much
+märket varies across seeds. Configurations no other one beats on every
+metric form the Pareto front.
+"""
+import argparse
+import asyncio
+import json
+import random
+import statistics
+import time
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
+from pathlib import Path
+
+from app.config import settings
+from app.engine.runner import SimulationRunner
+from app.models.simulation import SimulationOptions, SimulationState
+from app.scenarios.presets import PRESETS
+from app.services.llm import PARSE_FAILURE, TokenMeter, token_meter
+
+# Plausible märket band per preset (% per year). Where the preset mirrors a real
+# round the band spans its annualized outcome: 2017 gave 6.5% over three years,
+# 2020 5.4% over 29 months and 2023 4.1% + 3.3%; the others are expert judgement.
+EXPECTED_MARKE: dict[str, tuple[float, float]] = {
+    "stabil_tillvaxt": (2.0, 2.4),
+    "inflationschock": (3.3, 4.1),
+    "pandemi_aterhamtning": (1.9, 2.5),
+    "90talskrisen": (1.5, 3.0),
+    "hogkonjunktur": (2.8, 4.0),
+    "gron_omstallning": (2.2, 3.0),
+}
+
+# A settlement is realistic if it lands this close to märket (percentage points)
+REALISTIC_GAP = 0.5
+
+# Metrics the Pareto front is taken over, all lower-is-better
+OBJECTIVES = ("wall_time", "tokens", "marke_error", "parse_failure_rate", "unrealistic_rate", "marke_stdev")
+
+
+@dataclass(frozen=True)
+class EngineConfig:
+    name: str
+    route: str = "sonnet"  # model for agent calls: sonnet or haiku
+    prompt: str = "full"  # full, or brief for the short-answer variant
+    max_tokens: int = 1024
+    panel: bool = False
+
+    @classmethod
+    def parse(cls, spec: str) -> "EngineConfig":
+        """``name[:key=value,...]``, e.g. ``fast:route=haiku,prompt=brief,max_tokens=400``."""
+        name, _, rest = spec.partition(":")
+        fields = dict(item.split("=", 1) for item in rest.split(",") if item)
+        if "max_tokens" in fields:
+            fields["max_tokens"] = int(fields["max_tokens"])
+        if "panel" in fields:
+            fields["panel"] = fields["panel"].lower() in ("1", "true", "yes")
+        config = cls(name, **fields)
+        if config.route not in ("sonnet", "haiku") or config.prompt not in ("full", "brief"):
+            raise ValueError(f"Unknown route or prompt in '{spec}'")
+        return config
+
+
+@dataclass
+class RunResult:
+    preset_id: str
+    seed: int
+    wall_time: float
+    calls: int
+    tokens: int
+    actions: int
+    parse_failures: int
+    marke: float | None
+    settlements: int
+    realistic: int
+    mediated: int
+
+
+@contextmanager
+def configured(config: EngineConfig):
+    """Point the settings the agent calls read at `config`, restoring them afterwards."""
+    model = settings.haiku_model if config.route == "haiku" else settings.sonnet_model
+    if config.prompt == "brief":
+        # Brief agents take the deadline fast path, which reads the Haiku model and the fast budget
+        overrides = {"haiku_model": model, "deadline_fast_max_tokens": config.max_tokens}
+    else:
+        overrides = {"sonnet_model": model, "agent_max_tokens": config.max_tokens}
+    saved = {key: getattr(settings, key) for key in overrides}
+    for key, value in overrides.items():
+        setattr(settings, key, value)
+    try:
+        yield
+    finally:
+        for key, value in saved.items():
+            setattr(settings, key, value)
+
+
+def score(sim: SimulationState) -> tuple[int, int, int, int, int]:
+    """Actions, parse failures, settlements, realistic settlements, mediated settlements."""
+    actions = [a for rnd in sim.rounds for a in rnd.actions]
+    failures = sum(a.reasoning == PARSE_FAILURE for a in actions)
+    settled = [p for p in sim.negotiation_pairs if p.is_settled]
+    realistic = sum(
+        sim.marke is not None and abs(p.settlement_level - sim.marke) <= REALISTIC_GAP for p in settled
+    )
+    return len(actions), failures, len(settled), realistic, sum(p.mediated for p in settled)
+
+
+async def run_once(config: EngineConfig, preset_id: str, seed: int) -> RunResult:
+    preset = PRESETS[preset_id]
+    random.seed(seed)
+    runner = SimulationRunner(
+        preset.parameters, preset_id, preset.flavor_text, SimulationOptions(panel_mode=config.panel)
+    )
+    if config.prompt == "brief":
+        for agent in runner.runners.values():
+            agent.fast = True
+    meter = TokenMeter()
+    reset = token_meter.set(meter)
+    start = time.perf_counter()
+    try:
+        async for _ in runner.run():
+            pass
+    finally:
+        token_meter.reset(reset)
+    actions, failures, settlements, realistic, mediated = score(runner.sim)
+    return RunResult(
+        preset_id, seed, time.perf_counter() - start, meter.calls, meter.total, actions, failures,
+        runner.sim.marke, settlements, realistic, mediated,
+    )
+
+
+def marke_error(preset_id: str, marke: float | None) -> float | None:
+    """Distance from märket to the preset's expected band; 0 inside it."""
+    if marke is None or preset_id not in EXPECTED_MARKE:
+        return None
+    low, high = EXPECTED_MARKE[preset_id]
+    return max(low - marke, marke - high, 0.0)
+
+
+def _mean(values: list[float]) -> float | None:
+    values = [v for v in values if v is not None]
+    return statistics.fmean(values) if values else None
+
+
+def summarize(runs: list[RunResult]) -> dict:
+    actions = sum(r.actions for r in runs)
+    settlements = sum(r.settlements for r in runs)
+    # Spread across seeds within each preset, averaged over presets
+    stdevs = []
+    for preset_id in {r.preset_id for r in runs}:
+        markes = [r.marke for r in runs if r.preset_id == preset_id and r.marke is not None]
+        if len(markes) > 1:
+            stdevs.append(statistics.stdev(markes))
+    return {
+        "runs": len(runs),
+        "wall_time": _mean([r.wall_time for r in runs]),
+        "calls": _mean([r.calls for r in runs]),
+        "tokens": _mean([r.tokens for r in runs]),
+        "marke_error": _mean([marke_error(r.preset_id, r.marke) for r in runs]),
+        "parse_failure_rate": sum(r.parse_failures for r in runs) / actions if actions else None,
+        "unrealistic_rate": 1 - sum(r.realistic for r in runs) / settlements if settlements else None,
+        "mediated_rate": sum(r.mediated for r in runs) / settlements if settlements else None,
+        "marke_stdev": _mean(stdevs),
+        "no_marke": sum(r.marke is None for r in runs),
+    }
+
+
+def pareto_front(summaries: dict[str, dict]) -> list[str]:
+    def dominates(a: dict, b: dict) -> bool:
+        pairs = [(a[k], b[k]) for k in OBJECTIVES if a[k] is not None and b[k] is not None]
+        return all(x <= y for x, y in pairs) and any(x < y for x, y in pairs)
+
+    return [
+        name for name, summary in summaries.items()
+        if not any(dominates(other, summary) for o, other in summaries.items() if o != name)
+    ]
+
+
+async def evaluate(configs: list[EngineConfig], presets: list[str], seeds: int, concurrency: int) -> dict:
+    results = {}
+    limit = asyncio.Semaphore(concurrency)
+
+    async def bounded(config: EngineConfig, preset_id: str, seed: int) -> RunResult:
+        async with limit:
+            return await run_once(config, preset_id, seed)
+
+    # Configurations change process-wide settings, so they run one after another
+    for config in configs:
+        with configured(config):
+            runs = await asyncio.gather(*(bounded(config, p, s) for p in presets for s in range(seeds)))
+        results[config.name] = {"config": asdict(config), "summary": summarize(runs), "runs": [asdict(r) for r in runs]}
+        print(f"{config.name}: {len(runs)} runs done", flush=True)
+    front = pareto_front({name: r["summary"] for name, r in results.items()})
+    return {"configs": results, "pareto_front": front}
+
+
+def print_report(report: dict):
+    columns = ("wall_time", "calls", "tokens", "marke_error", "parse_failure_rate", "unrealistic_rate", "marke_stdev")
+    print(f"{'config':<16}" + "".join(f"{c:>20}" for c in columns) + "  pareto")
+    for name, result in report["configs"].items():
+        summary = result["summary"]
+        cells = "".join(f"{'-' if summary[c] is None else f'{summary[c]:.4g}':>20}" for c in columns)
+        print(f"{name:<16}{cells}  {'*' if name in report['pareto_front'] else ''}")
+
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--config", action="append", dest="configs", metavar="NAME[:KEY=VALUE,...]",
+                        help="configuration to evaluate, repeatable (default: baseline, haiku, brief, panel)")
+    parser.add_argument("--presets", nargs="+", default=list(EXPECTED_MARKE))
+    parser.add_argument("--seeds", type=int, default=3, help="runs per preset and configuration")
+    parser.add_argument("--concurrency", type=int, default=1, help="runs in flight within a configuration")
+    parser.add_argument("--backend", choices=["stub", "openai", "anthropic"], default="stub")
+    parser.add_argument("--output", type=Path, help="report file (default: evaluation-results/<time>.json)")
+    return parser.parse_args(argv)
+
+
+DEFAULT_CONFIGS = ["baseline", "haiku:route=haiku", "brief:prompt=brief,max_tokens=400", "panel:panel=1"]
+
+
+def main(argv: list[str] | None = None):
+    args = parse_args(argv)
+    settings.llm_backend = args.backend
+    configs = [EngineConfig.parse(spec) for spec in args.configs or DEFAULT_CONFIGS]
+    unknown = set(args.presets) - PRESETS.keys()
+    if unknown:
+        raise SystemExit(f"Unknown preset(s): {', '.join(sorted(unknown))}")
+    report = asyncio.run(evaluate(configs, args.presets, args.seeds, args.concurrency))
+    record = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "backend": args.backend,
+        "presets": args.presets,
+        "seeds": args.seeds,
+        **report,
+    }
+    output = args.output or Path("evaluation-results") / f"{time.strftime('%Y%m%d-%H%M%S')}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(record, indent=2))
+    print_report(record)
+    print(f"Report written to {output}")
+
+
+if __name__ == "__main__":
+    main()
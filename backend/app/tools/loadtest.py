@@ -0,0 +1,369 @@
+"""Load test: many concurrent /api/simulate SSE clients against one instance.
+
+    python -m app.tools.loadtest --clients 500 --arrival poisson --rate 50
+
+By default the app is started in a subprocess (uvicorn, LLM_BACKEND=stub) so
+the clients do not share its event loop or memory; ``--inprocess`` runs it in
+a thread of this process instead, and ``--url`` targets a running server.
+``--backend openai`` also starts the OpenAI-compatible stand-in and points
+the app at it, to measure micro-batching.
+Results are written as JSON; ``--compare`` prints them next to an earlier run.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import threading
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+
+import httpx
+
+BACKEND_ROOT = Path(__file__).resolve().parent.parent.parent
+
+# Metrics shown by --compare, with whether higher is better
+COMPARED = {
+    "completed": True,
+    "error_rate": False,
+    "rejected": False,
+    "events_per_second": True,
+    "ttfe_p50": False,
+    "ttfe_p99": False,
+    "gap_p50": False,
+    "gap_p99": False,
+    "memory_per_connection": False,
+}
+
+
+@dataclass
+class ClientResult:
+    status: int | None = None
+    error: str | None = None
+    events: int = 0
+    completed: bool = False
+    ttfe: float | None = None  # time to the first agent_action, the first output a user can read
+    gaps: list[float] = field(default_factory=list)
+
+
+def percentile(values: list[float], q: float) -> float | None:
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def arrival_offsets(pattern: str, clients: int, rate: float) -> list[float]:
+    """Seconds after the start at which each client connects."""
+    if pattern == "burst":
+        return [0.0] * clients
+    if pattern == "constant":
+        return [i / rate for i in range(clients)]
+    if pattern == "poisson":
+        offsets, t = [], 0.0
+        for _ in range(clients):
+            offsets.append(t)
+            t += random.expovariate(rate)
+        return offsets
+    if pattern == "ramp":
+        # Rate grows linearly from zero and reaches `rate` with the last client
+        duration = 2 * clients / rate
+        return [duration * (i / clients) ** 0.5 for i in range(clients)]
+    raise ValueError(f"Unknown arrival pattern '{pattern}'")
+
+
+async def read_stream(response: httpx.Response, result: ClientResult, started: float, read_delay: float):
+    last = None
+    async for line in response.aiter_lines():
+        if not line.startswith("event:"):
+            continue
+        now = time.perf_counter()
+        event = line[6:].strip()
+        # simulation_start and the first snapshot are sent at once, so they say nothing about the LLM path
+        if result.ttfe is None and event == "agent_action":
+            result.ttfe = now - started
+        if last is not None:
+            result.gaps.append(now - last)
+        last = now
+        result.events += 1
+        if event == "simulation_end":
+            result.completed = True
+        if read_delay:
+            await asyncio.sleep(read_delay)
+
+
+class LoadTest:
+    def __init__(self, args: argparse.Namespace, base_url: str, server_pid: int | None):
+        self.args = args
+        self.base_url = base_url
+        self.server_pid = server_pid
+        self.results: list[ClientResult] = []
+        self.connections = 0
+        self.peak_connections = 0
+        self.rss_samples: list[tuple[int, int]] = []  # (open connections, server RSS bytes)
+
+    def _connected(self, delta: int):
+        self.connections += delta
+        self.peak_connections = max(self.peak_connections, self.connections)
+
+    async def _viewer(self, client: httpx.AsyncClient, sim_id: str, read_delay: float):
+        result = ClientResult()
+        self.results.append(result)
+        started = time.perf_counter()
+        try:
+            async with client.stream("GET", f"/api/simulations/{sim_id}/events") as response:
+                result.status = response.status_code
+                self._connected(1)
+                try:
+                    await read_stream(response, result, started, read_delay)
+                finally:
+                    self._connected(-1)
+        except httpx.HTTPError as e:
+            result.error = type(e).__name__
+
+    async def _client(self, client: httpx.AsyncClient, offset: float):
+        await asyncio.sleep(offset)
+        result = ClientResult()
+        self.results.append(result)
+        read_delay = self.args.read_delay if random.random() < self.args.slow_fraction else 0.0
+        body = {"preset_id": random.choice(self.args.presets), "priority": self.args.priority}
+        viewers = []
+        started = time.perf_counter()
+        try:
+            async with client.stream("POST", "/api/simulate", json=body) as response:
+                result.status = response.status_code
+                if response.status_code != 200:
+                    return
+                self._connected(1)
+                sim_id = response.headers.get("x-simulation-id")
+                viewers = [
+                    asyncio.create_task(self._viewer(client, sim_id, read_delay)) for _ in range(self.args.viewers)
+                ]
+                try:
+                    await read_stream(response, result, started, read_delay)
+                finally:
+                    self._connected(-1)
+        except httpx.HTTPError as e:
+            result.error = type(e).__name__
+        await asyncio.gather(*viewers)
+
+    async def _sample_memory(self):
+        while True:
+            rss = server_rss(self.server_pid)
+            if rss is not None:
+                self.rss_samples.append((self.connections, rss))
+            await asyncio.sleep(0.5)
+
+    async def run(self) -> dict:
+        offsets = arrival_offsets(self.args.arrival, self.args.clients, self.args.rate)
+        limits = httpx.Limits(max_connections=None, max_keepalive_connections=None)
+        timeout = httpx.Timeout(self.args.timeout, connect=30.0)
+        baseline = server_rss(self.server_pid)
+        sampler = asyncio.create_task(self._sample_memory())
+        started = time.perf_counter()
+        async with httpx.AsyncClient(base_url=self.base_url, limits=limits, timeout=timeout, trust_env=False) as client:
+            await asyncio.gather(*(self._client(client, offset) for offset in offsets))
+            server_metrics = (await client.get("/api/metrics")).json()
+        elapsed = time.perf_counter() - started
+        sampler.cancel()
+        return self.report(elapsed, baseline, server_metrics)
+
+    def report(self, elapsed: float, baseline: int | None, server_metrics: dict) -> dict:
+        results = self.results
+        gaps = [g for r in results for g in r.gaps]
+        ttfe = [r.ttfe for r in results if r.ttfe is not None]
+        rejected = sum(1 for r in results if r.status == 429)
+        errors = sum(1 for r in results if r.error or (r.status not in (200, 429)) or (r.status == 200 and not r.completed))
+        peak_rss = max((rss for _, rss in self.rss_samples), default=None)
+        memory_per_connection = None
+        if baseline is not None and peak_rss is not None and self.peak_connections:
+            memory_per_connection = (peak_rss - baseline) / self.peak_connections
+        return {
+            "clients": len(results),
+            "completed": sum(1 for r in results if r.completed),
+            "rejected": rejected,
+            "errors": errors,
+            "error_rate": errors / len(results) if results else None,
+            "elapsed": elapsed,
+            "events": sum(r.events for r in results),
+            "events_per_second": sum(r.events for r in results) / elapsed,
+            "peak_connections": self.peak_connections,
+            "ttfe_p50": percentile(ttfe, 0.5),
+            "ttfe_p99": percentile(ttfe, 0.99),
+            "gap_p50": percentile(gaps, 0.5),
+            "gap_p99": percentile(gaps, 0.99),
+            "baseline_rss": baseline,
+            "peak_rss": peak_rss,
+            "memory_per_connection": memory_per_connection,
+            "error_kinds": sorted({r.error for r in results if r.error}),
+            "server": {key: server_metrics.get(key) for key in ("admission", "event_loop", "memory", "warm_pool", "local_llm")},
+        }
+
+
+def server_rss(pid: int | None) -> int | None:
+    if pid is None:
+        return None
+    try:
+        for line in Path(f"/proc/{pid}/status").read_text().splitlines():
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) * 1024
+    except OSError:
+        return None
+    return None
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def server_env(args: argparse.Namespace) -> dict[str, str]:
+    env = {"LLM_BACKEND": args.backend, "LLM_STUB_LATENCY": str(args.stub_latency), "WARM_POOL_SIZE": "0"}
+    if args.backend == "openai":
+        env["LOCAL_LLM_URL"] = f"{args.standin_url}/v1"
+    for item in args.server_env:
+        key, _, value = item.partition("=")
+        env[key] = value
+    return env
+
+
+def start_subprocess(args: argparse.Namespace, port: int) -> subprocess.Popen:
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=BACKEND_ROOT,
+        env={**os.environ, **server_env(args)},
+    )
+
+
+def start_standin(args: argparse.Namespace, port: int) -> subprocess.Popen:
+    return subprocess.Popen(
+        [sys.executable, "-m", "app.tools.openai_standin", "--port", str(port), "--latency", str(args.stub_latency)],
+        cwd=BACKEND_ROOT,
+    )
+
+
+def start_inprocess(args: argparse.Namespace, port: int):
+    os.environ.update(server_env(args))
+    import uvicorn
+
+    from app.main import app
+
+    server = uvicorn.Server(uvicorn.Config(app, port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    return server
+
+
+def wait_until_healthy(base_url: str, timeout: float = 30.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(f"{base_url}/health", timeout=1.0, trust_env=False).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"Server at {base_url} did not become healthy")
+
+
+def git_revision() -> str | None:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_ROOT, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(current: dict, previous: dict):
+    print(f"{'metric':<24}{'previous':>14}{'current':>14}{'change':>10}")
+    for key, higher_is_better in COMPARED.items():
+        old, new = previous["results"].get(key), current["results"].get(key)
+        change = ""
+        if isinstance(old, (int, float)) and isinstance(new, (int, float)) and old:
+            pct = (new - old) / abs(old) * 100
+            better = (pct > 0) == higher_is_better
+            change = f"{pct:+.1f}%{'' if abs(pct) < 1 else (' ✓' if better else ' ✗')}"
+        print(f"{key:<24}{_fmt(old):>14}{_fmt(new):>14}{change:>10}")
+
+
+def _fmt(value) -> str:
+    if isinstance(value, float):
+        return f"{value:.4g}"
+    return "-" if value is None else str(value)
+
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--clients", type=int, default=100, help="simulations started, one client each")
+    parser.add_argument("--viewers", type=int, default=0, help="extra viewers attached to each simulation")
+    parser.add_argument("--arrival", choices=["burst", "constant", "poisson", "ramp"], default="poisson")
+    parser.add_argument("--rate", type=float, default=20.0, help="client arrivals per second")
+    parser.add_argument("--read-delay", type=float, default=0.0, help="pause after each event for slow clients")
+    parser.add_argument("--slow-fraction", type=float, default=1.0, help="share of clients that read slowly")
+    parser.add_argument("--presets", nargs="+", default=["stabil_tillvaxt"])
+    parser.add_argument("--priority", choices=["interactive", "batch"], default="interactive")
+    parser.add_argument("--timeout", type=float, default=600.0, help="read timeout per stream")
+    parser.add_argument("--stub-latency", type=float, default=1.0, help="seconds per stub LLM call")
+    parser.add_argument("--backend", choices=["stub", "openai"], default="stub",
+                        help="LLM backend of the server; openai runs against the batching stand-in")
+    parser.add_argument("--server-env", action="append", default=[], metavar="KEY=VALUE",
+                        help="setting for the server under test, e.g. ADMISSION_MAX_CONCURRENT=64")
+    server = parser.add_mutually_exclusive_group()
+    server.add_argument("--url", help="test a running server instead of starting one")
+    server.add_argument("--inprocess", action="store_true", help="run the server in a thread of this process")
+    parser.add_argument("--output", type=Path, help="results file (default: loadtest-results/<time>.json)")
+    parser.add_argument("--compare", type=Path, help="earlier results file to compare against")
+    return parser.parse_args(argv)
+
+
+def main(argv: list[str] | None = None):
+    args = parse_args(argv)
+    process = None
+    standin = None
+    server_pid = None
+    if args.backend == "openai" and not args.url:
+        standin_port = free_port()
+        args.standin_url = f"http://127.0.0.1:{standin_port}"
+        standin = start_standin(args, standin_port)
+        wait_until_healthy(args.standin_url)
+    if args.url:
+        base_url = args.url.rstrip("/")
+    else:
+        port = free_port()
+        base_url = f"http://127.0.0.1:{port}"
+        if args.inprocess:
+            start_inprocess(args, port)
+            server_pid = os.getpid()
+        else:
+            process = start_subprocess(args, port)
+            server_pid = process.pid
+        wait_until_healthy(base_url)
+
+    try:
+        results = asyncio.run(LoadTest(args, base_url, server_pid).run())
+    finally:
+        for child in (process, standin):
+            if child:
+                child.terminate()
+                child.wait(timeout=30)
+
+    record = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "revision": git_revision(),
+        "config": {key: str(value) if isinstance(value, Path) else value for key, value in vars(args).items()},
+        "results": results,
+    }
+    output = args.output or Path("loadtest-results") / f"{time.strftime('%Y%m%d-%H%M%S')}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(record, indent=2))
+    print(json.dumps({k: v for k, v in results.items() if k != "server"}, indent=2))
+    print(f"Results written to {output}")
+    if args.compare:
+        compare(record, json.loads(args.compare.read_text()))
+
+
+if __name__ == "__main__":
+    main()
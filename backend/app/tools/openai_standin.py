@@ -0,0 +1,81 @@
+"""Stand-in for a local OpenAI-compatible inference server, for LLM_BACKEND=openai.
+
+    python -m app.tools.openai_standin --port 8001 --latency 1.0 --per-prompt 0.02
+
+Serves ``/v1/completions`` with the stub backend's answers. A request takes
+``latency`` plus ``per-prompt`` for each prompt in it, like a GPU whose cost
+grows slowly with batch size, so batching pays off as it would on real
+hardware. Requests beyond ``--slots`` wait for a free one.
+"""
+import argparse
+import asyncio
+import time
+
+import uvicorn
+from fastapi import FastAPI
+from pydantic import BaseModel
+
+from app.services.llm_stub import MEMBER_RE, _respond
+
+
+class CompletionRequest(BaseModel):
+    model: str
+    prompt: str | list[str]
+    max_tokens: int = 16
+
+
+def _kind(prompt: str) -> str:
+    if MEMBER_RE.search(prompt):
+        return "panel"
+    return "agent" if '"position"' in prompt else "summary"
+
+
+def create_app(latency: float, per_prompt: float, slots: int) -> FastAPI:
+    app = FastAPI(title="OpenAI-compatible stand-in")
+    stats = {"requests": 0, "prompts": 0}
+    busy = asyncio.Semaphore(slots)
+
+    @app.get("/health")
+    async def health():
+        return {"status": "ok", **stats}
+
+    @app.post("/v1/completions")
+    async def completions(request: CompletionRequest):
+        prompts = [request.prompt] if isinstance(request.prompt, str) else request.prompt
+        stats["requests"] += 1
+        stats["prompts"] += len(prompts)
+        async with busy:
+            await asyncio.sleep(latency + per_prompt * len(prompts))
+        responses = [
+            _respond(_kind(p), [{"content": p}], p, request.max_tokens).content[0].text for p in prompts
+        ]
+        return {
+            "id": f"cmpl-{stats['requests']}",
+            "object": "text_completion",
+            "created": int(time.time()),
+            "model": request.model,
+            "choices": [
+                {"index": i, "text": text, "finish_reason": "stop"} for i, text in enumerate(responses)
+            ],
+            "usage": {
+                "prompt_tokens": sum(len(p) for p in prompts) // 4,
+                "completion_tokens": sum(len(t) for t in responses) // 4,
+                "total_tokens": (sum(len(p) for p in prompts) + sum(len(t) for t in responses)) // 4,
+            },
+        }
+
+    return app
+
+
+def main(argv: list[str] | None = None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--latency", type=float, default=1.0, help="seconds per request")
+    parser.add_argument("--per-prompt", type=float, default=0.02, help="extra seconds per prompt in a request")
+    parser.add_argument("--slots", type=int, default=4, help="requests processed at once")
+    args = parser.parse_args(argv)
+    uvicorn.run(create_app(args.latency, args.per_prompt, args.slots), port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
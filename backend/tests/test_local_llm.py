@@ -0,0 +1,162 @@
+"""MicroBatcher against the OpenAI-compatible stand-in (and a scripted transport for edge cases).
+
+    python -m unittest discover tests
+"""
+import asyncio
+import json
+import unittest
+from unittest import mock
+
+import httpx
+
+from app.config import settings
+from app.services.local_llm import MicroBatcher
+from app.tools.openai_standin import create_app
+
+MESSAGES = [{"role": "user", "content": "Round 1. Reply with JSON."}]
+AGENT_SYSTEM = 'Answer as JSON with "position" and "willingness_to_settle".'
+
+
+class BatcherTestCase(unittest.IsolatedAsyncioTestCase):
+    batch_window = 0.05
+    max_batch = 64
+
+    async def asyncSetUp(self):
+        patcher = mock.patch.multiple(
+            settings, local_llm_batch_window=self.batch_window, local_llm_max_batch=self.max_batch
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.batcher = MicroBatcher()
+
+    async def asyncTearDown(self):
+        await self.batcher.close()
+
+    def use_transport(self, transport: httpx.AsyncBaseTransport):
+        self.batcher._client = httpx.AsyncClient(transport=transport, base_url="http://standin/v1")
+
+    def scripted(self, respond) -> list[dict]:
+        """Route requests to `respond(body) -> httpx.Response` and return the request bodies seen."""
+        seen = []
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            body = json.loads(request.content)
+            seen.append(body)
+            return respond(body)
+
+        self.use_transport(httpx.MockTransport(handler))
+        return seen
+
+
+class StandInTest(BatcherTestCase):
+    async def asyncSetUp(self):
+        await super().asyncSetUp()
+        self.standin = create_app(latency=0.0, per_prompt=0.0, slots=4)
+        self.use_transport(httpx.ASGITransport(app=self.standin))
+
+    async def standin_stats(self) -> dict:
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=self.standin), base_url="http://standin") as c:
+            return (await c.get("/health")).json()
+
+    async def test_calls_within_the_window_share_one_request(self):
+        results = await asyncio.gather(*(
+            self.batcher.create("model", MESSAGES, system=AGENT_SYSTEM) for _ in range(5)
+        ))
+        stats = await self.standin_stats()
+        self.assertEqual((stats["requests"], stats["prompts"]), (1, 5))
+        for response in results:
+            self.assertIn("position", json.loads(response.content[0].text))
+        self.assertEqual(self.batcher.stats()["mean_batch"], 5)
+
+    async def test_calls_after_the_window_get_a_new_request(self):
+        await self.batcher.create("model", MESSAGES, system=AGENT_SYSTEM)
+        await self.batcher.create("model", MESSAGES, system=AGENT_SYSTEM)
+        self.assertEqual((await self.standin_stats())["requests"], 2)
+
+    async def test_different_answer_budgets_are_not_mixed(self):
+        await asyncio.gather(
+            self.batcher.create("model", MESSAGES, system=AGENT_SYSTEM, max_tokens=1024),
+            self.batcher.create("model", MESSAGES, system=AGENT_SYSTEM, max_tokens=400),
+        )
+        self.assertEqual((await self.standin_stats())["requests"], 2)
+
+
+class MaxBatchTest(BatcherTestCase):
+    batch_window = 5.0  # long enough that only max_batch can flush
+    max_batch = 3
+
+    async def test_full_batches_flush_without_waiting_for_the_window(self):
+        seen = self.scripted(lambda body: httpx.Response(200, json={
+            "choices": [{"index": i, "text": "{}"} for i in range(len(body["prompt"]))],
+        }))
+        calls = [asyncio.create_task(self.batcher.create("model", MESSAGES)) for _ in range(7)]
+        done, pending = await asyncio.wait(calls, timeout=1.0)
+        self.assertEqual((len(done), len(pending)), (6, 1))
+        self.assertEqual([len(body["prompt"]) for body in seen], [3, 3])
+        await self.batcher.close()  # flushes the open remainder
+        await asyncio.wait_for(pending.pop(), 1.0)
+        self.assertEqual([len(body["prompt"]) for body in seen], [3, 3, 1])
+        self.assertEqual(self.batcher.stats()["max_batch"], 3)
+
+
+class ScriptedTest(BatcherTestCase):
+    async def test_choices_are_matched_to_callers_by_index(self):
+        # Answer each prompt with itself, listing the choices in reverse order
+        self.scripted(lambda body: httpx.Response(200, json={
+            "choices": [{"index": i, "text": p} for i, p in reversed(list(enumerate(body["prompt"])))],
+        }))
+        prompts = [f"question {i}" for i in range(4)]
+        results = await asyncio.gather(*(
+            self.batcher.create("model", [{"role": "user", "content": p}]) for p in prompts
+        ))
+        for prompt, response in zip(prompts, results):
+            self.assertIn(prompt, response.content[0].text)
+
+    async def test_cancelled_callers_are_left_out(self):
+        seen = self.scripted(lambda body: httpx.Response(200, json={
+            "choices": [{"index": i, "text": p} for i, p in enumerate(body["prompt"])],
+        }))
+        calls = [
+            asyncio.create_task(self.batcher.create("model", [{"role": "user", "content": f"q{i}"}]))
+            for i in range(3)
+        ]
+        await asyncio.sleep(0)
+        calls[1].cancel()
+        results = await asyncio.gather(*calls, return_exceptions=True)
+        self.assertIsInstance(results[1], asyncio.CancelledError)
+        self.assertEqual(len(seen), 1)
+        self.assertEqual(len(seen[0]["prompt"]), 2)
+        self.assertNotIn("q1", " ".join(seen[0]["prompt"]))
+        self.assertIn("q2", results[2].content[0].text)
+
+    async def test_a_failed_request_fails_every_caller(self):
+        self.scripted(lambda body: httpx.Response(500, json={"error": "out of memory"}))
+        results = await asyncio.gather(
+            *(self.batcher.create("model", MESSAGES) for _ in range(3)), return_exceptions=True
+        )
+        self.assertTrue(all(isinstance(r, httpx.HTTPStatusError) for r in results))
+        self.assertEqual(self.batcher.stats()["failures"], 1)
+
+    async def test_missing_choices_fail_the_batch(self):
+        self.scripted(lambda body: httpx.Response(200, json={"choices": [{"index": 0, "text": "{}"}]}))
+        results = await asyncio.gather(
+            *(self.batcher.create("model", MESSAGES) for _ in range(2)), return_exceptions=True
+        )
+        self.assertTrue(all(isinstance(r, ValueError) for r in results))
+
+    async def test_batch_usage_is_split_by_prompt_and_answer_length(self):
+        self.scripted(lambda body: httpx.Response(200, json={
+            "choices": [{"index": 0, "text": "a" * 10}, {"index": 1, "text": "b" * 30}],
+            "usage": {"prompt_tokens": 300, "completion_tokens": 40},
+        }))
+        with mock.patch.object(settings, "local_llm_prompt_template", "{user}"):
+            short, long = await asyncio.gather(
+                self.batcher.create("model", [{"role": "user", "content": "x" * 100}]),
+                self.batcher.create("model", [{"role": "user", "content": "y" * 200}]),
+            )
+        self.assertEqual((short.usage.input_tokens, short.usage.output_tokens), (100, 10))
+        self.assertEqual((long.usage.input_tokens, long.usage.output_tokens), (200, 30))
+
+
+if __name__ == "__main__":
+    unittest.main()
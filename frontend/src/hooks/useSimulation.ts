@@ -42,6 +42,20 @@ const initialState: SimulationState = {
   outcomes: [],
 };
 
+function isSameMove(a: AgentAction, b: AgentAction): boolean {
+  return a.agent_id === b.agent_id && a.round_number === b.round_number && a.phase === b.phase;
+}
+
+// Swap a provisional action for its completed version, keeping its place in the list
+function replaceProvisional(actions: AgentAction[], action: AgentAction): AgentAction[] {
+  for (let i = actions.length - 1; i >= 0; i--) {
+    if (isSameMove(actions[i], action)) {
+      return [...actions.slice(0, i), action, ...actions.slice(i + 1)];
+    }
+  }
+  return [...actions, action];
+}
+
 export function useSimulation() {
   const [state, setState] = useState<SimulationState>(initialState);
 
@@ -93,6 +107,29 @@ export function useSimulation() {
               break;
             }
 
+            case "agent_action_update": {
+              const action = data as AgentAction;
+              setState((prev) => {
+                const agentState = prev.agentStates[action.agent_id];
+                return {
+                  ...prev,
+                  agentStates: agentState
+                    ? {
+                        ...prev.agentStates,
+                        [action.agent_id]: {
+                          ...agentState,
+                          current_position: action.position,
+                          willingness_to_settle: action.willingness_to_settle,
+                          actions: replaceProvisional(agentState.actions, action),
+                        },
+                      }
+                    : prev.agentStates,
+                  actionFeed: replaceProvisional(prev.actionFeed, action),
+                };
+              });
+              break;
+            }
+
             case "settlement": {
               const s = data as Settlement;
               setState((prev) => {
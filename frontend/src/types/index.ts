@@ -41,6 +41,9 @@ export interface AgentAction {
   reasoning: string;
   public_statement: string;
   willingness_to_settle: number;
+  // Streamed runs send the numbers first with empty prose, then the full action as agent_action_update
+  provisional?: boolean;
+  reused?: boolean;
 }
 
 export interface Settlement {